@@ -0,0 +1,106 @@
+"""Benchmarks for barrier insertion (:func:`loopy.schedule.insert_barriers`)
+on kernels with many instructions.
+
+These follow the conventions of `asv <https://asv.readthedocs.io>`_, but
+may also be run directly::
+
+    python benchmarks/barrier_insertion.py
+"""
+
+from __future__ import division, absolute_import, print_function
+
+__copyright__ = "Copyright (C) 2017 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+import loopy as lp
+
+
+def make_local_chain_kernel(ninsns):
+    """Return a kernel with *ninsns* instructions, each of which reads a local
+    temporary written by its predecessor in a different work item, so that
+    each needs a local barrier.
+    """
+    insns = ["<> t0[i] = a[i] {id=insn0}"]
+    for k in range(1, ninsns - 1):
+        insns.append("<> t%d[i] = 2*t%d[(i+1) %% 16] {id=insn%d, dep=insn%d}"
+                % (k, k-1, k, k-1))
+    insns.append("out[i] = t%d[i] {dep=insn%d}" % (ninsns - 2, ninsns - 2))
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<16}",
+            "\n".join(insns),
+            [
+                lp.GlobalArg("a,out", np.float32, shape=16),
+                ],
+            name="local_chain_%d" % ninsns)
+
+    knl = lp.tag_inames(knl, {"i": "l.0"})
+    for k in range(ninsns - 1):
+        knl = lp.set_temporary_scope(knl, "t%d" % k, "local")
+
+    return knl
+
+
+class BarrierInsertion(object):
+    params = [100, 1000, 3000]
+    param_names = ["ninsns"]
+    timeout = 600
+
+    def setup(self, ninsns):
+        knl = lp.preprocess_kernel(make_local_chain_kernel(ninsns))
+
+        # A schedule without barriers
+        with lp.CacheMode(False):
+            sched_knl = lp.get_one_scheduled_kernel(knl)
+
+        from loopy.schedule import Barrier
+        self.kernel = sched_knl
+        self.schedule = [
+                sched_item for sched_item in sched_knl.schedule
+                if not isinstance(sched_item, Barrier)]
+
+    def time_insert_barriers(self, ninsns):
+        from loopy.schedule import insert_barriers
+        # Use a fresh copy, so that per-kernel data is not reused between
+        # runs.
+        insert_barriers(self.kernel.copy(), self.schedule, kind="local",
+                verify_only=False)
+
+
+def main():
+    from time import time
+
+    bench = BarrierInsertion()
+    for ninsns in BarrierInsertion.params:
+        bench.setup(ninsns)
+
+        start = time()
+        bench.time_insert_barriers(ninsns)
+        print("%-36s ninsns=%-6d %.6f s" % (
+            "time_insert_barriers", ninsns, time() - start))
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: foldmethod=marker
@@ -0,0 +1,229 @@
+"""Benchmarks for the stages of turning a kernel into code, on synthetic
+kernels of tunable size and structure.
+
+These follow the conventions of `asv <https://asv.readthedocs.io>`_, but
+may also be run directly, in which case timings are printed as one JSON
+object per line::
+
+    python benchmarks/compile_pipeline.py
+    python benchmarks/compile_pipeline.py --ninsns 200 --depth 3
+
+All caching is disabled while timing, using :class:`loopy.CacheMode`.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+__copyright__ = "Copyright (C) 2017 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+import loopy as lp
+
+
+def make_synthetic_kernel(ninsns, ninames=2, depth=1, nreductions=0,
+        nglobal_barriers=0):
+    """Return a kernel with *ninsns* instructions that each depend on their
+    predecessor, parallel over a work-item/group iname ``i``.
+
+    Instruction *k* lies in *depth* of *ninames* sequential inames, starting
+    at iname number *k* modulo *ninames*, so that consecutive instructions
+    lie in different loop nests. *nreductions* sequential sum reductions
+    (each over its own iname) are added, and the instructions are separated
+    into *nglobal_barriers* + 1 equally long stretches by global barriers.
+    """
+    if not 1 <= depth <= ninames:
+        raise ValueError("depth must be between 1 and ninames")
+
+    seq_inames = ["j%d" % k for k in range(ninames)]
+    red_inames = ["r%d" % k for k in range(nreductions)]
+
+    insns = ["for i"]
+    last_id = None
+
+    def dep_opt():
+        return ", dep=%s" % last_id if last_id is not None else ""
+
+    barrier_every = max(1, ninsns // (nglobal_barriers + 1))
+    nbarriers = 0
+
+    for k in range(ninsns):
+        if (k and k % barrier_every == 0
+                and nbarriers < nglobal_barriers):
+            insns.append("... gbarrier {id=gbarrier%d%s}"
+                    % (nbarriers, dep_opt()))
+            last_id = "gbarrier%d" % nbarriers
+            nbarriers += 1
+
+        insn_inames = sorted(
+                seq_inames[(k + d) % ninames] for d in range(depth))
+        insns.append("out[i, %d] = out[i, %d] + a[i]*(%s) {id=insn%d%s}"
+                % (k, k, " + ".join(insn_inames), k, dep_opt()))
+        last_id = "insn%d" % k
+
+    for k, red_iname in enumerate(red_inames):
+        insns.append("red[i, %d] = sum(%s, a[i]*%s) {id=red%d%s}"
+                % (k, red_iname, red_iname, k, dep_opt()))
+        last_id = "red%d" % k
+
+    insns.append("end")
+
+    knl = lp.make_kernel(
+            "{[%s]: 0<=i<n and %s}" % (
+                ",".join(["i"] + seq_inames + red_inames),
+                " and ".join(
+                    "0<=%s<8" % iname for iname in seq_inames + red_inames)),
+            "\n".join(insns),
+            [
+                lp.GlobalArg("out", np.float64, shape=("n", ninsns)),
+                lp.GlobalArg("a", np.float64, shape="n"),
+                ]
+            + ([lp.GlobalArg("red", np.float64, shape=("n", nreductions))]
+                if nreductions else [])
+            + [lp.ValueArg("n", np.int32)],
+            assumptions="n>=1",
+            name="synthetic_%d" % ninsns)
+
+    return lp.split_iname(knl, "i", 64, outer_tag="g.0", inner_tag="l.0")
+
+
+CONFIGS = {
+        "flat": dict(ninames=1, depth=1),
+        "nested": dict(ninames=4, depth=3),
+        "reductions": dict(ninames=2, depth=1, nreductions=8),
+        "global_barriers": dict(ninames=2, depth=1, nglobal_barriers=4),
+        }
+
+
+class CompilePipeline(object):
+    params = [[25, 100, 400], sorted(CONFIGS)]
+    param_names = ["ninsns", "config"]
+    timeout = 600
+
+    def setup(self, ninsns, config):
+        self.setup_kernel(make_synthetic_kernel(ninsns, **CONFIGS[config]))
+
+    def setup_kernel(self, kernel):
+        from loopy.schedule import Barrier
+
+        self.kernel = kernel
+        with lp.CacheMode(False):
+            self.preprocessed_kernel = lp.preprocess_kernel(kernel)
+            self.scheduled_kernel = lp.get_one_scheduled_kernel(
+                    self.preprocessed_kernel)
+
+        self.schedule_without_barriers = [
+                sched_item for sched_item in self.scheduled_kernel.schedule
+                if not isinstance(sched_item, Barrier)]
+
+    # Fresh copies are used in each run so that data memoized on the
+    # kernels is not reused between runs.
+
+    def time_preprocess_kernel(self, *args):
+        with lp.CacheMode(False):
+            lp.preprocess_kernel(self.kernel.copy())
+
+    def time_get_one_scheduled_kernel(self, *args):
+        with lp.CacheMode(False):
+            lp.get_one_scheduled_kernel(self.preprocessed_kernel.copy())
+
+    def time_insert_barriers(self, *args):
+        from loopy.schedule import insert_barriers
+        insert_barriers(self.scheduled_kernel.copy(),
+                self.schedule_without_barriers, kind="local",
+                verify_only=False)
+
+    def time_generate_code_v2(self, *args):
+        with lp.CacheMode(False):
+            lp.generate_code_v2(self.scheduled_kernel.copy())
+
+    def time_check_bounds(self, *args):
+        from loopy.check import check_bounds
+        check_bounds(self.preprocessed_kernel.copy())
+
+
+STAGES = [
+        "preprocess_kernel",
+        "get_one_scheduled_kernel",
+        "insert_barriers",
+        "generate_code_v2",
+        "check_bounds",
+        ]
+
+
+def run_stages(bench, record, repeat):
+    import json
+    from time import time
+
+    for stage in STAGES:
+        method = getattr(bench, "time_" + stage)
+
+        timings = []
+        for i in range(repeat):
+            start = time()
+            method()
+            timings.append(time() - start)
+
+        result = dict(record, stage=stage, time=min(timings), timings=timings)
+        print(json.dumps(result, sort_keys=True))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+            description="Time the stages of code generation for synthetic "
+            "kernels. Without kernel parameters, run all configurations "
+            "of the benchmark suite.")
+    parser.add_argument("--ninsns", type=int)
+    parser.add_argument("--ninames", type=int, default=2)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--nreductions", type=int, default=0)
+    parser.add_argument("--nglobal-barriers", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bench = CompilePipeline()
+
+    if args.ninsns is not None:
+        kernel_args = dict(
+                ninsns=args.ninsns,
+                ninames=args.ninames,
+                depth=args.depth,
+                nreductions=args.nreductions,
+                nglobal_barriers=args.nglobal_barriers)
+
+        bench.setup_kernel(make_synthetic_kernel(**kernel_args))
+        run_stages(bench, kernel_args, args.repeat)
+        return
+
+    for ninsns in CompilePipeline.params[0]:
+        for config in CompilePipeline.params[1]:
+            bench.setup(ninsns, config)
+            run_stages(bench,
+                    dict(CONFIGS[config], ninsns=ninsns, config=config),
+                    args.repeat)
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: foldmethod=marker
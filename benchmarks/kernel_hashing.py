@@ -0,0 +1,111 @@
+"""Benchmarks for hashing :class:`loopy.LoopKernel` objects.
+
+These follow the conventions of `asv <https://asv.readthedocs.io>`_, but
+may also be run directly::
+
+    python benchmarks/kernel_hashing.py
+"""
+
+from __future__ import division, absolute_import, print_function
+
+__copyright__ = "Copyright (C) 2017 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+import loopy as lp
+
+
+def make_chain_kernel(ninsns):
+    """Return a kernel with *ninsns* instructions, each of which computes a
+    temporary from its predecessor.
+    """
+    insns = ["for i", "<> t0 = a[i]"]
+    for k in range(1, ninsns - 1):
+        insns.append("<> t%d = 2*t%d + %d" % (k, k-1, k))
+    insns.extend(["out[i] = t%d" % (ninsns - 2), "end"])
+
+    return lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "\n".join(insns),
+            [
+                lp.GlobalArg("a,out", np.float64, shape="n"),
+                lp.ValueArg("n", np.int32),
+                ],
+            name="chain_%d" % ninsns)
+
+
+class KernelHashing(object):
+    params = [100, 1000, 3000]
+    param_names = ["ninsns"]
+
+    def setup(self, ninsns):
+        self.kernel = make_chain_kernel(ninsns)
+
+        # Populate the digests of the kernel's components, as would be the
+        # case after any cache lookup.
+        hash(self.kernel)
+
+    def time_hash_first(self, ninsns):
+        # A fresh copy has to compute its own kernel-level digest, but can
+        # reuse the digests of all its fields.
+        hash(self.kernel.copy())
+
+    def time_hash_after_instruction_change(self, ninsns):
+        # Only the changed instruction and the fields containing it are
+        # rehashed.
+        insns = self.kernel.instructions[:]
+        insns[-1] = insns[-1].copy(priority=1)
+        hash(self.kernel.copy(instructions=insns))
+
+    def time_hash_repeated(self, ninsns):
+        for i in range(100):
+            hash(self.kernel)
+
+    def time_dict_lookup(self, ninsns):
+        d = {self.kernel: None}
+        for i in range(100):
+            self.kernel in d
+
+
+def main():
+    from time import time
+
+    bench = KernelHashing()
+    for ninsns in KernelHashing.params:
+        bench.setup(ninsns)
+
+        for method_name in sorted(dir(bench)):
+            if not method_name.startswith("time_"):
+                continue
+
+            method = getattr(bench, method_name)
+
+            start = time()
+            method(ninsns)
+            print("%-36s ninsns=%-6d %.6f s" % (
+                method_name, ninsns, time() - start))
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: foldmethod=marker
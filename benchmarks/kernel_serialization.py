@@ -0,0 +1,129 @@
+"""Benchmarks comparing the formats in which :class:`loopy.LoopKernel` objects
+may be stored in :mod:`loopy`'s on-disk caches (see
+:func:`loopy.set_cache_serialization`).
+
+These follow the conventions of `asv <https://asv.readthedocs.io>`_, but
+may also be run directly::
+
+    python benchmarks/kernel_serialization.py
+"""
+
+from __future__ import division, absolute_import, print_function
+
+__copyright__ = "Copyright (C) 2017 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+import loopy as lp
+
+
+# (compression, compact)
+FORMATS = {
+        "pickle": ("none", False),
+        "compact": ("none", True),
+        "compact-zlib": ("zlib", True),
+        "compact-lzma": ("lzma", True),
+        }
+
+
+def make_scheduled_kernel(ninsns):
+    """Return a scheduled kernel with *ninsns* instructions, each of which
+    computes a temporary from its predecessor, as it would be stored in the
+    scheduling cache.
+    """
+    insns = ["for i", "<> t0 = a[i]"]
+    for k in range(1, ninsns - 1):
+        insns.append("<> t%d = 2*t%d + %d" % (k, k-1, k))
+    insns.extend(["out[i] = t%d" % (ninsns - 2), "end"])
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "\n".join(insns),
+            [
+                lp.GlobalArg("a,out", np.float64, shape="n"),
+                lp.ValueArg("n", np.int32),
+                ],
+            name="chain_%d" % ninsns)
+
+    with lp.CacheMode(False):
+        return lp.get_one_scheduled_kernel(lp.preprocess_kernel(knl))
+
+
+class KernelSerialization(object):
+    params = [[100, 1000], sorted(FORMATS)]
+    param_names = ["ninsns", "format"]
+
+    def setup(self, ninsns, format):
+        from loopy.caching import (
+                _CacheSerializationSettings, _serialize_cache_entry)
+
+        compression, compact = FORMATS[format]
+        self.kernel = make_scheduled_kernel(ninsns)
+        self.data = _serialize_cache_entry(self.kernel,
+                _CacheSerializationSettings(
+                    compression=compression, compact=compact),
+                compact=True)
+
+    def track_size(self, ninsns, format):
+        return len(self.data)
+
+    def time_load(self, ninsns, format):
+        from loopy.caching import _deserialize_cache_entry
+        _deserialize_cache_entry(self.data)
+
+    def time_load_and_hash(self, ninsns, format):
+        # What a cache lookup keyed on the loaded kernel has to do.
+        from loopy.caching import _deserialize_cache_entry
+        hash(_deserialize_cache_entry(self.data))
+
+    def time_load_and_use(self, ninsns, format):
+        from loopy.caching import _deserialize_cache_entry
+        len(_deserialize_cache_entry(self.data).instructions)
+
+
+def main():
+    from time import time
+
+    bench = KernelSerialization()
+    for ninsns in KernelSerialization.params[0]:
+        for format in KernelSerialization.params[1]:
+            bench.setup(ninsns, format)
+
+            print("%-36s ninsns=%-6d %-14s %d bytes" % (
+                "track_size", ninsns, format, bench.track_size(ninsns, format)))
+
+            for method_name in sorted(dir(bench)):
+                if not method_name.startswith("time_"):
+                    continue
+
+                method = getattr(bench, method_name)
+
+                start = time()
+                method(ninsns, format)
+                print("%-36s ninsns=%-6d %-14s %.6f s" % (
+                    method_name, ninsns, format, time() - start))
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: foldmethod=marker
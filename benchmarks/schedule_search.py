@@ -0,0 +1,133 @@
+"""Benchmarks for the loop scheduler's search on kernels with many
+instructions.
+
+These follow the conventions of `asv <https://asv.readthedocs.io>`_, but
+may also be run directly::
+
+    python benchmarks/schedule_search.py
+"""
+
+from __future__ import division, absolute_import, print_function
+
+__copyright__ = "Copyright (C) 2017 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+import loopy as lp
+
+
+def make_grouped_kernel(ninsns, ngroups=4):
+    """Return a kernel with *ninsns* independent instructions in a single
+    loop, split into *ngroups* mutually conflicting instruction groups.
+    Instruction groups disable the scheduler's shortcut of not backtracking
+    over instruction choices, so the search may reach the same state along
+    many orderings.
+    """
+    insns = ["for i"]
+    for k in range(ninsns):
+        grp = k % ngroups
+        insns.append(
+                "out%d[i] = %d*a[i] {id=insn%d, groups=g%d, conflicts=%s}"
+                % (k, k, k, grp, ":".join(
+                    "g%d" % other for other in range(ngroups)
+                    if other != grp)))
+    insns.append("end")
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "\n".join(insns),
+            [lp.GlobalArg("out%d" % k, np.float64, shape="n")
+                for k in range(ninsns)]
+            + [
+                lp.GlobalArg("a", np.float64, shape="n"),
+                lp.ValueArg("n", np.int32),
+                ],
+            name="grouped_%d" % ninsns)
+
+    return lp.preprocess_kernel(knl)
+
+
+def make_alternating_kernel(ninsns):
+    """Return a kernel with *ninsns* instructions that alternate between two
+    loops and each depend on their predecessor.
+    """
+    insns = ["<> t0[0] = 0 {id=insn0}"]
+    for k in range(1, ninsns):
+        iname = "ij"[k % 2]
+        insns.append(
+                "<> t%d[%s] = 2*t%d[0] + %s {id=insn%d, dep=insn%d}"
+                % (k, iname, k-1, iname, k, k-1))
+
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i,j<16}",
+            "\n".join(insns),
+            name="alternating_%d" % ninsns)
+
+    return lp.preprocess_kernel(knl)
+
+
+KERNEL_MAKERS = {
+        "grouped": make_grouped_kernel,
+        "alternating": make_alternating_kernel,
+        }
+
+
+class ScheduleSearch(object):
+    params = [[50, 200, 400], sorted(KERNEL_MAKERS)]
+    param_names = ["ninsns", "kind"]
+    timeout = 600
+
+    def setup(self, ninsns, kind):
+        self.kernel = KERNEL_MAKERS[kind](ninsns)
+
+    def _schedule(self):
+        profile = lp.ScheduleProfile()
+        with lp.CacheMode(False):
+            lp.get_one_scheduled_kernel(self.kernel, profile=profile)
+        return profile
+
+    def time_schedule(self, ninsns, kind):
+        self._schedule()
+
+    def track_nodes_visited(self, ninsns, kind):
+        return self._schedule().nodes_visited
+
+    def track_pruned_dead_ends(self, ninsns, kind):
+        return self._schedule().pruned_dead_ends
+
+
+def main():
+    bench = ScheduleSearch()
+    for ninsns in ScheduleSearch.params[0]:
+        for kind in ScheduleSearch.params[1]:
+            bench.setup(ninsns, kind)
+
+            profile = bench._schedule()
+            print("%-12s ninsns=%-6d" % (kind, ninsns))
+            print(profile)
+            print()
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: foldmethod=marker
@@ -65,7 +65,7 @@ from loopy.library.reduction import register_reduction_parser
 # {{{ import transforms
 
 from loopy.transform.iname import (
-        set_loop_priority, prioritize_loops,
+        set_loop_priority, prioritize_loops, prioritize_loops_by_stride,
         split_iname, chunk_iname, join_inames, tag_inames, duplicate_inames,
         rename_iname, remove_unused_inames,
         split_reduction_inward, split_reduction_outward,
@@ -116,12 +116,15 @@ from loopy.transform.save import save_and_reload_temporaries
 # }}}
 
 from loopy.type_inference import infer_unknown_types
-from loopy.preprocess import preprocess_kernel, realize_reduction
-from loopy.schedule import generate_loop_schedules, get_one_scheduled_kernel
+from loopy.preprocess import (preprocess_kernel, realize_reduction,
+        PreprocessProfile)
+from loopy.schedule import (generate_loop_schedules, get_one_scheduled_kernel,
+        get_one_rescheduled_kernel, ScheduleProfile)
 from loopy.statistics import (ToCountMap, stringify_stats_mapping, Op,
         MemAccess, get_op_poly, get_op_map, get_lmem_access_poly,
         get_DRAM_access_poly, get_gmem_access_poly, get_mem_access_map,
         get_synchronization_poly, get_synchronization_map,
+        get_barrier_placement_stats,
         gather_access_footprints, gather_access_footprint_bytes)
 from loopy.codegen import (
         PreambleInfo,
@@ -130,6 +133,11 @@ from loopy.codegen.result import (
         GeneratedProgram,
         CodeGenerationResult)
 from loopy.compiled import CompiledKernel
+from loopy.caching import (
+        CacheStatistics, get_cache_statistics, reset_cache_statistics,
+        CacheEvictionPolicy, set_cache_eviction_policy, prune_caches,
+        set_cache_serialization,
+        warm_caches, export_cache_bundle, import_cache_bundle)
 from loopy.options import Options
 from loopy.auto_test import auto_test_vs_ref
 from loopy.frontend.fortran import (c_preprocess, parse_transformed_fortran,
@@ -172,7 +180,7 @@ __all__ = [
 
         # {{{ transforms
 
-        "set_loop_priority", "prioritize_loops",
+        "set_loop_priority", "prioritize_loops", "prioritize_loops_by_stride",
         "split_iname", "chunk_iname", "join_inames", "tag_inames",
         "duplicate_inames",
         "rename_iname", "remove_unused_inames",
@@ -228,8 +236,10 @@ __all__ = [
 
         "infer_unknown_types",
 
-        "preprocess_kernel", "realize_reduction",
+        "preprocess_kernel", "realize_reduction", "PreprocessProfile",
         "generate_loop_schedules", "get_one_scheduled_kernel",
+        "get_one_rescheduled_kernel",
+        "ScheduleProfile",
         "GeneratedProgram", "CodeGenerationResult",
         "PreambleInfo",
         "generate_code", "generate_code_v2", "generate_body",
@@ -238,10 +248,16 @@ __all__ = [
         "get_op_poly", "get_op_map", "get_lmem_access_poly",
         "get_DRAM_access_poly", "get_gmem_access_poly", "get_mem_access_map",
         "get_synchronization_poly", "get_synchronization_map",
+        "get_barrier_placement_stats",
         "gather_access_footprints", "gather_access_footprint_bytes",
 
         "CompiledKernel",
 
+        "CacheStatistics", "get_cache_statistics", "reset_cache_statistics",
+        "CacheEvictionPolicy", "set_cache_eviction_policy", "prune_caches",
+        "set_cache_serialization",
+        "warm_caches", "export_cache_bundle", "import_cache_bundle",
+
         "auto_test_vs_ref",
 
         "Options",
@@ -0,0 +1,1253 @@
+from __future__ import division, absolute_import, print_function
+
+__copyright__ = "Copyright (C) 2017 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import six
+import os
+from time import time
+
+from pytools import ImmutableRecord
+from pytools.persistent_dict import PersistentDict, NoSuchEntryError
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy
+
+.. autoclass:: CacheStatistics
+
+.. autofunction:: get_cache_statistics
+.. autofunction:: reset_cache_statistics
+
+.. autoclass:: CacheEvictionPolicy
+
+.. autofunction:: set_cache_eviction_policy
+.. autofunction:: prune_caches
+
+.. autofunction:: set_cache_serialization
+
+.. autofunction:: warm_caches
+
+.. autofunction:: export_cache_bundle
+.. autofunction:: import_cache_bundle
+
+.. currentmodule:: loopy.caching
+
+.. autoclass:: CacheEntryInfo
+.. autoclass:: CacheWarmupResult
+.. autoclass:: LoopyPersistentDict
+
+.. envvar:: LOOPY_IN_MEMORY_CACHE_SIZE
+
+    The number of entries retained in the in-memory tier of each of
+    :mod:`loopy`'s caches. Defaults to 64. Set to 0 to disable the in-memory
+    tier.
+
+.. envvar:: LOOPY_CACHE_MAX_BYTES
+
+    If set, the default value of :attr:`CacheEvictionPolicy.max_bytes` for
+    the budget shared by all caches. Accepts suffixes ``K``, ``M`` and
+    ``G``, e.g. ``LOOPY_CACHE_MAX_BYTES=20G``.
+
+.. envvar:: LOOPY_CACHE_MAX_ENTRIES
+
+    If set, the default value of :attr:`CacheEvictionPolicy.max_entries` for
+    the budget shared by all caches.
+
+.. envvar:: LOOPY_CACHE_EVICTION_STRATEGY
+
+    ``lru`` (the default) or ``lfu``.
+
+.. envvar:: LOOPY_CACHE_COMPRESSION
+
+    The default value of the *compression* argument of
+    :func:`set_cache_serialization`. Defaults to ``none``.
+
+.. envvar:: LOOPY_CACHE_COMPACT_KERNELS
+
+    If set to ``1``, the default value of the *compact* argument of
+    :func:`set_cache_serialization` is *True*.
+"""
+
+
+# {{{ cache statistics
+
+class CacheStatistics(object):
+    """Counters describing the use of one of :mod:`loopy`'s on-disk caches
+    within the current process.
+
+    .. attribute:: name
+
+        The short name of the cache, e.g. ``"preprocess"``.
+
+    .. attribute:: hits
+
+        The number of lookups that found an entry, including those counted
+        in :attr:`memory_hits`.
+
+    .. attribute:: memory_hits
+
+        The number of hits that were served from the in-memory tier,
+        without reading from disk.
+
+    .. attribute:: misses
+    .. attribute:: stores
+
+    .. attribute:: key_hashing_time
+
+        Time (in seconds) spent computing persistent hash keys.
+
+    .. attribute:: load_time
+
+        Time (in seconds) spent reading and unpickling cache entries.
+
+    .. attribute:: store_time
+
+        Time (in seconds) spent pickling and writing cache entries.
+
+    .. attribute:: bytes_read
+    .. attribute:: bytes_written
+
+    .. attribute:: lookups
+    .. attribute:: hit_rate
+
+        The fraction of lookups that were hits, or *None* if no lookups
+        have occurred.
+
+    .. automethod:: copy
+    .. automethod:: reset
+    """
+
+    counter_fields = ("hits", "memory_hits", "misses", "stores",
+            "key_hashing_time", "load_time", "store_time",
+            "bytes_read", "bytes_written")
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        self.key_hashing_time = 0
+        self.load_time = 0
+        self.store_time = 0
+
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def copy(self):
+        result = CacheStatistics(self.name)
+        for field_name in self.counter_fields:
+            setattr(result, field_name, getattr(self, field_name))
+        return result
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        if not self.lookups:
+            return None
+        return self.hits / self.lookups
+
+    def __str__(self):
+        return ("%s: %d hits (%d in memory), %d misses, %d stores, "
+                "hashing %.3f s, loading %.3f s (%d bytes), "
+                "storing %.3f s (%d bytes)" % (
+                    self.name, self.hits, self.memory_hits, self.misses,
+                    self.stores,
+                    self.key_hashing_time,
+                    self.load_time, self.bytes_read,
+                    self.store_time, self.bytes_written))
+
+    def __repr__(self):
+        return "CacheStatistics(%s)" % ", ".join(
+                "%s=%r" % (field_name, getattr(self, field_name))
+                for field_name in ("name",) + self.counter_fields)
+
+# }}}
+
+
+# {{{ serialization
+
+# Entries written in the current format start with this, followed by a byte
+# identifying the compression. (Pickles never start with a zero byte, so
+# entries written by earlier versions remain readable.)
+_CACHE_ENTRY_MAGIC = b"\x00lpy"
+
+_COMPRESSIONS = ["none", "zlib", "lzma"]
+
+
+def _get_compressor(compression):
+    if compression == "none":
+        return None, None
+    elif compression == "zlib":
+        import zlib
+        return zlib.compress, zlib.decompress
+    elif compression == "lzma":
+        try:
+            import lzma
+        except ImportError:
+            from loopy.diagnostic import LoopyError
+            raise LoopyError("lzma compression is not available "
+                    "in this version of Python")
+        return lzma.compress, lzma.decompress
+    else:
+        raise ValueError("unknown cache compression: '%s' (known: %s)"
+                % (compression, ", ".join(_COMPRESSIONS)))
+
+
+class _CacheSerializationSettings(object):
+    def __init__(self, compression, compact):
+        _get_compressor(compression)
+
+        self.compression = compression
+        self.compact = compact
+
+
+_SERIALIZATION_SETTINGS = _CacheSerializationSettings(
+        compression=os.environ.get("LOOPY_CACHE_COMPRESSION", "none"),
+        compact=bool(int(os.environ.get("LOOPY_CACHE_COMPACT_KERNELS", "0"))))
+
+
+def set_cache_serialization(compression=None, compact=None):
+    """Set the format in which entries are written to :mod:`loopy`'s on-disk
+    caches. Entries are readable regardless of the format they were written
+    in.
+
+    :arg compression: ``"none"``, ``"zlib"``, or ``"lzma"``.
+        *None* leaves the setting unchanged.
+    :arg compact: If *True*, :class:`loopy.LoopKernel` objects are written in a
+        format in which their larger fields, such as the instructions and the
+        domains, are pickled individually and only unpickled on first access.
+        Kernels retrieved from the cache and only passed on to another lookup
+        (or whose generated code is retrieved from the cache) are then never
+        fully unpickled. (Only supported on Python 3.) *None* leaves the
+        setting unchanged.
+    """
+    global _SERIALIZATION_SETTINGS
+
+    if compression is None:
+        compression = _SERIALIZATION_SETTINGS.compression
+    if compact is None:
+        compact = _SERIALIZATION_SETTINGS.compact
+
+    _SERIALIZATION_SETTINGS = _CacheSerializationSettings(
+            compression=compression, compact=compact)
+
+
+def _dumps_compactly(value, protocol):
+    import copyreg
+    from io import BytesIO
+    from pickle import Pickler
+    from loopy.kernel import LoopKernel
+
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[LoopKernel] = LoopKernel._reduce_compactly
+
+    buf = BytesIO()
+    pickler = Pickler(buf, protocol=protocol)
+    pickler.dispatch_table = dispatch_table
+    pickler.dump(value)
+    return buf.getvalue()
+
+
+def _serialize_cache_entry(value, settings, compact):
+    from six.moves.cPickle import dumps, HIGHEST_PROTOCOL
+
+    if compact and settings.compact and six.PY3:
+        data = _dumps_compactly(value, HIGHEST_PROTOCOL)
+    else:
+        data = dumps(value, protocol=HIGHEST_PROTOCOL)
+
+    compress, _ = _get_compressor(settings.compression)
+    if compress is not None:
+        data = compress(data)
+
+    return b"".join([
+            _CACHE_ENTRY_MAGIC,
+            six.int2byte(_COMPRESSIONS.index(settings.compression)),
+            data])
+
+
+def _deserialize_cache_entry(data):
+    from six.moves.cPickle import loads
+
+    if data.startswith(_CACHE_ENTRY_MAGIC):
+        compression = _COMPRESSIONS[six.indexbytes(data, len(_CACHE_ENTRY_MAGIC))]
+        data = data[len(_CACHE_ENTRY_MAGIC)+1:]
+
+        _, decompress = _get_compressor(compression)
+        if decompress is not None:
+            data = decompress(data)
+
+    return loads(data)
+
+# }}}
+
+
+# {{{ instrumented persistent dictionary
+
+_NAME_TO_CACHE = {}
+
+
+class _TimingKeyBuilder(object):
+    """Wraps a :class:`pytools.persistent_dict.KeyBuilder`, accounting the
+    time spent in computing hash keys to a :class:`CacheStatistics` instance.
+
+    The most recently computed key is remembered until :meth:`forget` is
+    called, so that :class:`LoopyPersistentDict` can find out the hash key
+    of an entry without paying for computing it twice.
+    """
+
+    def __init__(self, key_builder, statistics):
+        self.key_builder = key_builder
+        self.statistics = statistics
+        self.forget()
+
+    def __call__(self, key):
+        if key is self._last_key:
+            return self._last_hexdigest
+
+        start_time = time()
+        try:
+            hexdigest = self.key_builder(key)
+        finally:
+            self.statistics.key_hashing_time += time() - start_time
+
+        self._last_key = key
+        self._last_hexdigest = hexdigest
+        return hexdigest
+
+    def forget(self):
+        self._last_key = None
+        self._last_hexdigest = None
+
+    def __getattr__(self, name):
+        return getattr(self.key_builder, name)
+
+
+ACCESS_COUNT_FILE_NAME = "access-count"
+
+
+class LoopyPersistentDict(PersistentDict):
+    """A :class:`pytools.persistent_dict.PersistentDict` that keeps
+    :class:`loopy.CacheStatistics` for its use and registers itself
+    under a short *name* so that those statistics may be queried via
+    :func:`loopy.get_cache_statistics`.
+
+    Up to *in_mem_cache_size* recently used entries are also retained in
+    memory, keyed by their persistent hash. Lookups of these return the
+    previously stored (or loaded) object itself, without any disk access or
+    unpickling. This relies on the values stored being immutable, as is the
+    case for :class:`loopy.LoopKernel` and
+    :class:`loopy.CodeGenerationResult`.
+
+    In addition, the time of the last access and the number of accesses
+    are recorded for each entry on disk, and the
+    :class:`loopy.CacheEvictionPolicy` in effect is enforced every
+    :attr:`prune_interval` stores.
+
+    .. automethod:: get_entries
+    .. automethod:: remove_entry
+    .. automethod:: clear_in_memory_tier
+    """
+
+    prune_interval = 16
+
+    def __init__(self, name, identifier, key_builder=None, container_dir=None,
+            in_mem_cache_size=None):
+        if in_mem_cache_size is None:
+            in_mem_cache_size = int(
+                    os.environ.get("LOOPY_IN_MEMORY_CACHE_SIZE", 64))
+
+        self.name = name
+        self.statistics = CacheStatistics(name)
+        self._stores_since_prune = 0
+
+        self.in_mem_cache_size = in_mem_cache_size
+        # maps hexdigest keys to tuples (last_use, key, value), where
+        # *last_use* is a value of :attr:`_in_mem_cache_clock`
+        self._in_mem_cache = {}
+        self._in_mem_cache_clock = 0
+
+        PersistentDict.__init__(self, identifier,
+                key_builder=key_builder, container_dir=container_dir)
+
+        self.key_builder = _TimingKeyBuilder(self.key_builder, self.statistics)
+
+        _NAME_TO_CACHE[name] = self
+
+    def fetch(self, key):
+        try:
+            hexdigest_key = self.key_builder(key)
+
+            # {{{ in-memory tier
+
+            try:
+                _, stored_key, stored_value = self._in_mem_cache.pop(
+                        hexdigest_key)
+            except KeyError:
+                pass
+            else:
+                if stored_key is key or stored_key == key:
+                    # mark as most recently used
+                    self._in_mem_cache_clock += 1
+                    self._in_mem_cache[hexdigest_key] = (
+                            self._in_mem_cache_clock, stored_key, stored_value)
+
+                    self.statistics.hits += 1
+                    self.statistics.memory_hits += 1
+                    return stored_value
+
+            # }}}
+
+            try:
+                result = PersistentDict.fetch(self, key)
+            except NoSuchEntryError:
+                self.statistics.misses += 1
+                raise
+
+            self.statistics.hits += 1
+            self._record_access(hexdigest_key)
+            self._add_to_in_mem_cache(hexdigest_key, key, result)
+            return result
+        finally:
+            self.key_builder.forget()
+
+    def store(self, key, value, _skip_if_present=False):
+        try:
+            hexdigest_key = self.key_builder(key)
+            PersistentDict.store(self, key, value,
+                    _skip_if_present=_skip_if_present)
+        finally:
+            self.key_builder.forget()
+
+        self.statistics.stores += 1
+        self._add_to_in_mem_cache(hexdigest_key, key, value)
+
+        self._stores_since_prune += 1
+        if self._stores_since_prune >= self.prune_interval:
+            self._stores_since_prune = 0
+            _enforce_eviction_policies(self)
+
+    def remove(self, key):
+        try:
+            self._in_mem_cache.pop(self.key_builder(key), None)
+            PersistentDict.remove(self, key)
+        finally:
+            self.key_builder.forget()
+
+    def clear(self):
+        PersistentDict.clear(self)
+        self.clear_in_memory_tier()
+
+    # {{{ in-memory tier
+
+    def _add_to_in_mem_cache(self, hexdigest_key, key, value):
+        if not self.in_mem_cache_size:
+            return
+
+        self._in_mem_cache_clock += 1
+        self._in_mem_cache[hexdigest_key] = (
+                self._in_mem_cache_clock, key, value)
+
+        while len(self._in_mem_cache) > self.in_mem_cache_size:
+            least_recently_used = min(
+                    self._in_mem_cache,
+                    key=lambda hexdigest_key: self._in_mem_cache[hexdigest_key][0])
+            del self._in_mem_cache[least_recently_used]
+
+    def clear_in_memory_tier(self):
+        """Drop all entries retained in memory. Entries on disk are not
+        affected.
+        """
+        self._in_mem_cache.clear()
+
+    # }}}
+
+    # {{{ entry bookkeeping
+
+    def _record_access(self, hexdigest_key):
+        item_dir = self._item_dir(hexdigest_key)
+        count_file = os.path.join(item_dir, ACCESS_COUNT_FILE_NAME)
+
+        # Races between processes may lose counts. That's OK, the count only
+        # serves as a heuristic for eviction.
+        try:
+            count = _read_access_count(count_file)
+            with open(count_file, "w") as outf:
+                outf.write(str(count + 1))
+
+            os.utime(item_dir, None)
+        except (OSError, IOError):
+            pass
+
+    def get_entries(self):
+        """
+        :returns: a list of :class:`CacheEntryInfo` instances, one for each
+            entry currently stored in this cache.
+        """
+        try:
+            names = os.listdir(self.container_dir)
+        except OSError:
+            return []
+
+        result = []
+        for name in names:
+            if name.startswith("."):
+                # temporary directory of an import in progress
+                continue
+
+            item_dir = os.path.join(self.container_dir, name)
+
+            try:
+                if not os.path.isdir(item_dir):
+                    continue
+
+                size = 0
+                for file_name in os.listdir(item_dir):
+                    size += os.path.getsize(os.path.join(item_dir, file_name))
+
+                last_access = os.path.getmtime(item_dir)
+            except OSError:
+                # removed concurrently
+                continue
+
+            result.append(CacheEntryInfo(
+                cache_name=self.name,
+                hexdigest_key=name,
+                size=size,
+                last_access=last_access,
+                access_count=_read_access_count(
+                    os.path.join(item_dir, ACCESS_COUNT_FILE_NAME))))
+
+        return result
+
+    def remove_entry(self, hexdigest_key):
+        """Remove the entry with the hash key *hexdigest_key*, unless
+        it is currently locked by another user of the cache.
+
+        :returns: *True* if the entry was removed.
+        """
+        lock_fd = self._try_lock_entry(hexdigest_key)
+        if lock_fd is None:
+            return False
+
+        self._in_mem_cache.pop(hexdigest_key, None)
+
+        try:
+            import shutil
+            shutil.rmtree(self._item_dir(hexdigest_key), ignore_errors=True)
+        finally:
+            self._unlock_entry(hexdigest_key, lock_fd)
+
+        return True
+
+    def _try_lock_entry(self, hexdigest_key):
+        """Take the lock that :class:`pytools.persistent_dict.PersistentDict`
+        uses for the entry *hexdigest_key*, without waiting.
+
+        :returns: a file descriptor to pass to :meth:`_unlock_entry`, or *None*
+            if the entry is currently locked.
+        """
+        try:
+            return os.open(self._lock_file(hexdigest_key),
+                    os.O_CREAT | os.O_WRONLY | os.O_EXCL)
+        except OSError:
+            return None
+
+    def _unlock_entry(self, hexdigest_key, lock_fd):
+        os.close(lock_fd)
+        os.unlink(self._lock_file(hexdigest_key))
+
+    # }}}
+
+    def _read(self, path):
+        start_time = time()
+
+        with open(path, "rb") as inf:
+            data = inf.read()
+
+        result = _deserialize_cache_entry(data)
+
+        self.statistics.load_time += time() - start_time
+        self.statistics.bytes_read += len(data)
+
+        return result
+
+    def _write(self, path, value):
+        start_time = time()
+
+        # Keys are always compared against the key being looked up, so there
+        # is nothing to be gained by unpickling them lazily.
+        data = _serialize_cache_entry(value, _SERIALIZATION_SETTINGS,
+                compact=os.path.basename(path) == "contents")
+
+        with open(path, "wb") as outf:
+            outf.write(data)
+
+        self.statistics.store_time += time() - start_time
+        self.statistics.bytes_written += len(data)
+
+# }}}
+
+
+# {{{ eviction
+
+def _read_access_count(count_file):
+    try:
+        with open(count_file, "r") as inf:
+            return int(inf.read())
+    except (OSError, IOError, ValueError):
+        return 0
+
+
+class CacheEntryInfo(ImmutableRecord):
+    """
+    .. attribute:: cache_name
+    .. attribute:: hexdigest_key
+    .. attribute:: size
+
+        The size of the entry on disk, in bytes.
+
+    .. attribute:: last_access
+
+        The time of the last access of the entry, in seconds since the epoch.
+
+    .. attribute:: access_count
+
+        The number of cache hits on this entry.
+    """
+
+
+class CacheEvictionPolicy(ImmutableRecord):
+    """A budget for the disk space used by one or all of :mod:`loopy`'s
+    caches.
+
+    .. attribute:: max_bytes
+
+        The maximum number of bytes to be used, or *None* for no limit.
+
+    .. attribute:: max_entries
+
+        The maximum number of entries to be stored, or *None* for no limit.
+
+    .. attribute:: strategy
+
+        ``"lru"`` to evict the least recently used entries first, or
+        ``"lfu"`` to evict the least frequently used entries first.
+        Ties are broken by time of last access.
+    """
+
+    def __init__(self, max_bytes=None, max_entries=None, strategy="lru"):
+        if strategy not in ["lru", "lfu"]:
+            raise ValueError("unknown eviction strategy: '%s'" % strategy)
+
+        ImmutableRecord.__init__(self,
+                max_bytes=max_bytes,
+                max_entries=max_entries,
+                strategy=strategy)
+
+    def is_unlimited(self):
+        return self.max_bytes is None and self.max_entries is None
+
+    def get_entries_to_evict(self, entries):
+        """
+        :arg entries: a list of :class:`CacheEntryInfo` instances
+        :returns: the sub-list of *entries* that need to be removed to
+            bring the remainder within budget.
+        """
+        if self.strategy == "lru":
+            def sort_key(entry):
+                return entry.last_access
+        else:
+            def sort_key(entry):
+                return (entry.access_count, entry.last_access)
+
+        entries = sorted(entries, key=sort_key)
+
+        nentries = len(entries)
+        nbytes = sum(entry.size for entry in entries)
+
+        result = []
+        for entry in entries:
+            if ((self.max_bytes is None or nbytes <= self.max_bytes)
+                    and (self.max_entries is None
+                        or nentries <= self.max_entries)):
+                break
+
+            result.append(entry)
+            nentries -= 1
+            nbytes -= entry.size
+
+        return result
+
+
+def _parse_size(size_str):
+    size_str = size_str.strip()
+
+    multiplier = 1
+    for suffix, suffix_multiplier in [
+            ("K", 1024), ("M", 1024**2), ("G", 1024**3)]:
+        if size_str.upper().endswith(suffix):
+            size_str = size_str[:-1]
+            multiplier = suffix_multiplier
+            break
+
+    return int(float(size_str) * multiplier)
+
+
+def _get_default_eviction_policy():
+    max_bytes = os.environ.get("LOOPY_CACHE_MAX_BYTES")
+    max_entries = os.environ.get("LOOPY_CACHE_MAX_ENTRIES")
+
+    if max_bytes is None and max_entries is None:
+        return None
+
+    return CacheEvictionPolicy(
+            max_bytes=_parse_size(max_bytes) if max_bytes is not None else None,
+            max_entries=int(max_entries) if max_entries is not None else None,
+            strategy=os.environ.get("LOOPY_CACHE_EVICTION_STRATEGY", "lru"))
+
+
+# maps cache names to policies, *None* maps to the shared policy
+_EVICTION_POLICIES = {None: _get_default_eviction_policy()}
+
+
+def set_cache_eviction_policy(policy, name=None):
+    """Set the :class:`CacheEvictionPolicy` for the cache named *name*, or,
+    if *name* is *None*, the policy for the budget shared by all caches.
+    Pass *None* as *policy* to remove a budget.
+
+    Policies are enforced periodically while entries are being stored,
+    so that a cache may temporarily exceed its budget by a few entries.
+    Use :func:`prune_caches` (or ``loopy cache prune``) to enforce a policy
+    immediately.
+    """
+    if name is not None:
+        _get_caches(name)
+
+    _EVICTION_POLICIES[name] = policy
+
+
+def _evict(caches, policy, dry_run):
+    if policy is None or policy.is_unlimited():
+        return []
+
+    entries = []
+    for cache in caches:
+        entries.extend(cache.get_entries())
+
+    name_to_cache = dict((cache.name, cache) for cache in caches)
+
+    result = []
+    for entry in policy.get_entries_to_evict(entries):
+        if dry_run or name_to_cache[entry.cache_name].remove_entry(
+                entry.hexdigest_key):
+            result.append(entry)
+
+    if result:
+        logger.info("evicted %d entries (%d bytes) from cache(s) %s" % (
+            len(result), sum(entry.size for entry in result),
+            ", ".join(cache.name for cache in caches)))
+
+    return result
+
+
+def _enforce_eviction_policies(cache):
+    _evict([cache], _EVICTION_POLICIES.get(cache.name), dry_run=False)
+    _evict(_get_caches(None), _EVICTION_POLICIES[None], dry_run=False)
+
+
+def prune_caches(policy=None, name=None, dry_run=False):
+    """Remove entries from :mod:`loopy`'s on-disk caches to bring them within
+    budget.
+
+    :arg policy: a :class:`CacheEvictionPolicy` to apply. If *None*, the
+        policies set by :func:`set_cache_eviction_policy` are applied.
+    :arg name: if given, only consider the cache by that name. Otherwise,
+        *policy* applies to the combined contents of all caches.
+    :arg dry_run: if *True*, only report the entries that would be removed.
+    :returns: a list of :class:`loopy.caching.CacheEntryInfo` instances
+        describing the removed entries.
+    """
+    caches = _get_caches(name)
+
+    if policy is not None:
+        return _evict(caches, policy, dry_run)
+
+    result = []
+    for cache in caches:
+        result.extend(
+                _evict([cache], _EVICTION_POLICIES.get(cache.name), dry_run))
+
+    if name is None:
+        result.extend(_evict(caches, _EVICTION_POLICIES[None], dry_run))
+
+    return result
+
+# }}}
+
+
+# {{{ user interface
+
+def _get_caches(name):
+    if name is None:
+        return list(six.itervalues(_NAME_TO_CACHE))
+
+    try:
+        return [_NAME_TO_CACHE[name]]
+    except KeyError:
+        raise ValueError("unknown cache name: '%s' (known names: %s)"
+                % (name, ", ".join(sorted(_NAME_TO_CACHE))))
+
+
+def get_cache_statistics(name=None):
+    """
+    :arg name: the short name of one of :mod:`loopy`'s caches, such as
+        ``"preprocess"``, ``"schedule"``, ``"code-gen"``,
+        ``"typed-and-scheduled"``, ``"cl-program-binary"``, or
+        ``"buffer-array"``.
+    :returns: If *name* is given, a snapshot of the
+        :class:`CacheStatistics` for that cache. Otherwise, a :class:`dict`
+        mapping each cache name to such a snapshot.
+    """
+    result = dict(
+            (cache.name, cache.statistics.copy())
+            for cache in _get_caches(name))
+
+    if name is not None:
+        return result[name]
+
+    return result
+
+
+def reset_cache_statistics(name=None):
+    """Reset the :class:`CacheStatistics` counters of the cache named *name*,
+    or of all caches if *name* is *None*.
+    """
+    for cache in _get_caches(name):
+        cache.statistics.reset()
+
+# }}}
+
+
+# {{{ cache warm-up
+
+class CacheWarmupResult(ImmutableRecord):
+    """The outcome of warming up the caches for one kernel by
+    :func:`warm_caches`.
+
+    .. attribute:: source
+
+        A description of where the kernel came from, e.g. a file name.
+
+    .. attribute:: kernel_name
+
+    .. attribute:: preprocess_time
+
+        Wall time in seconds spent in :func:`loopy.preprocess_kernel`.
+
+    .. attribute:: schedule_time
+
+        Wall time in seconds spent in :func:`loopy.get_one_scheduled_kernel`.
+
+    .. attribute:: codegen_time
+
+        Wall time in seconds spent in :func:`loopy.generate_code_v2`.
+
+    .. attribute:: cache_hits
+
+        The number of cache hits among the three stages.
+
+    .. attribute:: error
+
+        *None* on success, otherwise a string describing the exception
+        that occurred.
+    """
+
+    @property
+    def total_time(self):
+        return sum(
+                t for t in [
+                    self.preprocess_time, self.schedule_time, self.codegen_time]
+                if t is not None)
+
+
+def _load_kernels(source):
+    """Return a list of kernels from *source*, which is either a pickled
+    :class:`loopy.LoopKernel` (or a list of them), identified by a file name
+    ending in ``.pkl`` or ``.pickle``, or a Python script that defines
+    kernels at module level.
+    """
+    from loopy.kernel import LoopKernel
+
+    if source.endswith((".pkl", ".pickle")):
+        from six.moves.cPickle import load
+        with open(source, "rb") as inf:
+            obj = load(inf)
+
+        kernels = obj if isinstance(obj, (list, tuple)) else [obj]
+
+    else:
+        import loopy as lp
+        import numpy as np
+        namespace = {"lp": lp, "np": np,
+                "__file__": source, "__name__": "__loopy_warm__"}
+
+        with open(source, "r") as inf:
+            exec(compile(inf.read(), source, "exec"), namespace)
+
+        # Follow the convention of the stand-alone frontend, if possible.
+        if "lp_knl" in namespace:
+            kernels = namespace["lp_knl"]
+            if isinstance(kernels, LoopKernel):
+                kernels = [kernels]
+        else:
+            kernels = [
+                    value
+                    for _, value in sorted(six.iteritems(namespace))
+                    if isinstance(value, LoopKernel)]
+
+    for kernel in kernels:
+        if not isinstance(kernel, LoopKernel):
+            raise TypeError("'%s' contains a '%s', expected LoopKernel"
+                    % (source, type(kernel).__name__))
+
+    return list(kernels)
+
+
+def _warm_caches_for_kernel(job):
+    source, kernel = job
+
+    import loopy as lp
+
+    times = {}
+    error = None
+
+    stage_cache_names = ["preprocess", "schedule", "code-gen"]
+
+    def get_hits():
+        return sum(
+                get_cache_statistics(name).hits for name in stage_cache_names)
+
+    hits_before = get_hits()
+
+    try:
+        with lp.CacheMode(True):
+            start = time()
+            kernel = lp.preprocess_kernel(kernel)
+            times["preprocess_time"] = time() - start
+
+            start = time()
+            kernel = lp.get_one_scheduled_kernel(kernel)
+            times["schedule_time"] = time() - start
+
+            start = time()
+            lp.generate_code_v2(kernel)
+            times["codegen_time"] = time() - start
+
+    except Exception as e:
+        error = "%s: %s" % (type(e).__name__, e)
+
+    for stage in ["preprocess_time", "schedule_time", "codegen_time"]:
+        times.setdefault(stage, None)
+
+    return CacheWarmupResult(
+            source=source,
+            kernel_name=kernel.name,
+            cache_hits=get_hits() - hits_before,
+            error=error,
+            **times)
+
+
+def warm_caches(kernels_or_sources, nprocs=None):
+    """Fill :mod:`loopy`'s persistent caches by preprocessing, scheduling
+    and generating code for a batch of kernels, in parallel across *nprocs*
+    processes.
+
+    :arg kernels_or_sources: a sequence, each entry of which is a
+        :class:`loopy.LoopKernel`, the file name of a pickled kernel (or list
+        of kernels) ending in ``.pkl`` or ``.pickle``, or the file name of a
+        Python script. A script may define ``lp_knl`` as a kernel or a list of
+        kernels. Otherwise, all :class:`loopy.LoopKernel` instances it defines
+        at module level are used.
+    :arg nprocs: the number of worker processes. Defaults to the number of
+        CPUs. If 1, all work is done in the calling process.
+    :returns: a list of :class:`CacheWarmupResult`, one per kernel, in
+        order.
+
+    Errors in the processing of individual kernels are recorded in
+    :attr:`CacheWarmupResult.error` and do not abort the warm-up.
+    Since argument types are not known, this does not fill the cache of
+    kernels specialized for specific argument types.
+    """
+    from loopy import CACHING_ENABLED
+    if not CACHING_ENABLED:
+        from loopy.diagnostic import LoopyError
+        raise LoopyError("caching is disabled, cannot warm up caches")
+
+    from loopy.kernel import LoopKernel
+
+    jobs = []
+    for item in kernels_or_sources:
+        if isinstance(item, LoopKernel):
+            jobs.append(("<kernel '%s'>" % item.name, item))
+        else:
+            jobs.extend((item, kernel) for kernel in _load_kernels(item))
+
+    if nprocs is None:
+        from multiprocessing import cpu_count
+        nprocs = cpu_count()
+
+    nprocs = min(nprocs, len(jobs))
+
+    logger.info("warming up caches for %d kernels using %d processes"
+            % (len(jobs), nprocs))
+
+    if nprocs <= 1:
+        return [_warm_caches_for_kernel(job) for job in jobs]
+
+    from multiprocessing import Pool
+    pool = Pool(nprocs)
+    try:
+        # Keep the kernels in order, but hand them out one at a time,
+        # since their cost varies widely.
+        return pool.map(_warm_caches_for_kernel, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+# }}}
+
+
+# {{{ cache bundles
+
+CACHE_BUNDLE_FORMAT_VERSION = 1
+
+_BUNDLE_MANIFEST_NAME = "manifest.json"
+_BUNDLE_ENTRY_FILE_NAMES = frozenset(["key", "contents"])
+
+
+def export_cache_bundle(filename, names=None, accessed_since=None):
+    """Write entries of :mod:`loopy`'s on-disk caches into a (gzipped
+    tar) archive at *filename*, to be merged into the caches on another
+    machine by :func:`import_cache_bundle`.
+
+    :arg names: a list of short cache names (see
+        :func:`get_cache_statistics`) to export from. Defaults to all caches.
+    :arg accessed_since: if not *None*, a time stamp (as returned by
+        :func:`time.time`). Only entries stored or accessed after it are
+        exported.
+    :returns: a list of :class:`loopy.caching.CacheEntryInfo` instances
+        describing the exported entries.
+    """
+    import tarfile
+    import json
+    from io import BytesIO
+    from loopy.version import DATA_MODEL_VERSION, VERSION_TEXT
+
+    if names is None:
+        caches = _get_caches(None)
+    else:
+        caches = [cache for name in names for cache in _get_caches(name)]
+
+    manifest = {
+            "format_version": CACHE_BUNDLE_FORMAT_VERSION,
+            "data_model_version": DATA_MODEL_VERSION,
+            "loopy_version": VERSION_TEXT,
+            "caches": {},
+            }
+
+    exported = []
+
+    tar = tarfile.open(filename, "w:gz")
+    try:
+        for cache in caches:
+            exported_keys = []
+
+            for entry in cache.get_entries():
+                if (accessed_since is not None
+                        and entry.last_access < accessed_since):
+                    continue
+
+                # Do not export entries while they are being written.
+                lock_fd = cache._try_lock_entry(entry.hexdigest_key)
+                if lock_fd is None:
+                    continue
+
+                try:
+                    item_dir = cache._item_dir(entry.hexdigest_key)
+                    for file_name in sorted(_BUNDLE_ENTRY_FILE_NAMES):
+                        tar.add(os.path.join(item_dir, file_name),
+                                arcname="/".join([
+                                    cache.name, entry.hexdigest_key, file_name]))
+                except (OSError, IOError):
+                    # Removed concurrently. Files added so far are ignored
+                    # on import, since the entry is not in the manifest.
+                    continue
+                finally:
+                    cache._unlock_entry(entry.hexdigest_key, lock_fd)
+
+                exported_keys.append(entry.hexdigest_key)
+                exported.append(entry)
+
+            manifest["caches"][cache.name] = {
+                    # identifies the cache's version and that of Python
+                    "container_name": os.path.basename(cache.container_dir),
+                    "entries": exported_keys,
+                    }
+
+        manifest_data = json.dumps(manifest, indent=2).encode("utf-8")
+        info = tarfile.TarInfo(_BUNDLE_MANIFEST_NAME)
+        info.size = len(manifest_data)
+        info.mtime = time()
+        tar.addfile(info, BytesIO(manifest_data))
+    finally:
+        tar.close()
+
+    logger.info("exported %d cache entries to '%s'" % (len(exported), filename))
+
+    return exported
+
+
+def import_cache_bundle(filename, overwrite=False):
+    """Merge the entries of an archive written by :func:`export_cache_bundle`
+    into :mod:`loopy`'s on-disk caches.
+
+    Entries of caches whose version (or that of the Python interpreter)
+    differs from the one that wrote them are skipped, with a warning.
+
+    :arg overwrite: if *True*, replace entries that are already present.
+    :returns: a :class:`dict` mapping cache names to the number of entries
+        imported into that cache.
+    :raises loopy.LoopyError: if the archive was written by a version of
+        :mod:`loopy` with a different :data:`loopy.version.DATA_MODEL_VERSION`.
+    """
+    import tarfile
+    import json
+    import re
+    import shutil
+    from tempfile import mkdtemp
+    from warnings import warn
+    from loopy.diagnostic import LoopyError
+    from loopy.version import DATA_MODEL_VERSION
+
+    hexdigest_re = re.compile("^[0-9a-f]+$")
+
+    tar = tarfile.open(filename, "r:*")
+    try:
+        try:
+            manifest = json.loads(
+                    tar.extractfile(_BUNDLE_MANIFEST_NAME).read().decode("utf-8"))
+        except KeyError:
+            raise LoopyError("'%s' is not a loopy cache bundle" % filename)
+
+        if manifest.get("format_version") != CACHE_BUNDLE_FORMAT_VERSION:
+            raise LoopyError("cache bundle '%s' has unsupported format "
+                    "version '%s'" % (filename, manifest.get("format_version")))
+
+        if manifest["data_model_version"] != DATA_MODEL_VERSION:
+            raise LoopyError("cache bundle '%s' was written by loopy %s "
+                    "with data model version '%s', which is incompatible with "
+                    "this installation's data model version '%s'"
+                    % (filename, manifest["loopy_version"],
+                        manifest["data_model_version"], DATA_MODEL_VERSION))
+
+        members = dict((member.name, member) for member in tar.getmembers())
+
+        result = {}
+        for name, cache_info in sorted(six.iteritems(manifest["caches"])):
+            cache = _NAME_TO_CACHE.get(name)
+            if cache is None:
+                warn("cache bundle '%s': skipping entries of unknown cache "
+                        "'%s'" % (filename, name))
+                continue
+
+            if (cache_info["container_name"]
+                    != os.path.basename(cache.container_dir)):
+                warn("cache bundle '%s': skipping entries of cache '%s', "
+                        "which were written for '%s', not '%s'" % (
+                            filename, name, cache_info["container_name"],
+                            os.path.basename(cache.container_dir)))
+                continue
+
+            nimported = 0
+            for hexdigest_key in cache_info["entries"]:
+                if not hexdigest_re.match(hexdigest_key):
+                    raise LoopyError("cache bundle '%s': invalid entry '%s'"
+                            % (filename, hexdigest_key))
+
+                item_dir = cache._item_dir(hexdigest_key)
+                if os.path.exists(item_dir) and not overwrite:
+                    continue
+
+                # Assemble the entry in a temporary directory and then move
+                # it into place, so that it appears atomically.
+                tmp_dir = mkdtemp(prefix=".import-", dir=cache.container_dir)
+                try:
+                    for file_name in _BUNDLE_ENTRY_FILE_NAMES:
+                        inf = tar.extractfile(members[
+                            "/".join([name, hexdigest_key, file_name])])
+                        with open(os.path.join(tmp_dir, file_name), "wb") as outf:
+                            shutil.copyfileobj(inf, outf)
+
+                    lock_fd = cache._try_lock_entry(hexdigest_key)
+                    if lock_fd is None:
+                        # in use, leave it alone
+                        continue
+
+                    try:
+                        if os.path.exists(item_dir):
+                            shutil.rmtree(item_dir)
+                            cache._in_mem_cache.pop(hexdigest_key, None)
+
+                        os.rename(tmp_dir, item_dir)
+                    finally:
+                        cache._unlock_entry(hexdigest_key, lock_fd)
+
+                finally:
+                    if os.path.exists(tmp_dir):
+                        shutil.rmtree(tmp_dir)
+
+                nimported += 1
+
+            result[name] = nimported
+            logger.info("imported %d entries into cache '%s'"
+                    % (nimported, name))
+    finally:
+        tar.close()
+
+    return result
+
+# }}}
+
+# vim: foldmethod=marker
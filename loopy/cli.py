@@ -53,7 +53,134 @@ def defines_to_python_code(defines_str):
     return "\n".join(result)
 
 
+# {{{ cache management
+
+def cache_main(argv):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog="loopy cache",
+            description="Manage loopy's on-disk caches")
+    subparsers = parser.add_subparsers(dest="command")
+
+    prune_parser = subparsers.add_parser("prune",
+            help="Remove cache entries to bring the caches within budget")
+    prune_parser.add_argument("--max-bytes", metavar="SIZE",
+            help="Disk space budget, e.g. '500M' or '20G'")
+    prune_parser.add_argument("--max-entries", metavar="N", type=int)
+    prune_parser.add_argument("--strategy", choices=("lru", "lfu"),
+            default="lru")
+    prune_parser.add_argument("--cache", metavar="NAME",
+            help="Only prune the cache by this name, e.g. 'schedule'")
+    prune_parser.add_argument("--dry-run", action="store_true",
+            help="Only list the entries that would be removed")
+
+    export_parser = subparsers.add_parser("export",
+            help="Write cache entries to an archive for use on another machine")
+    export_parser.add_argument("filename", metavar="FILE")
+    export_parser.add_argument("--cache", metavar="NAME", action="append",
+            help="Only export from the cache by this name, e.g. 'schedule'. "
+            "May be given more than once.")
+    export_parser.add_argument("--accessed-since", metavar="TIMESTAMP",
+            type=float,
+            help="Only export entries accessed after this UNIX time stamp")
+
+    import_parser = subparsers.add_parser("import",
+            help="Merge the cache entries in an archive written by "
+            "'loopy cache export' into the caches")
+    import_parser.add_argument("filename", metavar="FILE")
+    import_parser.add_argument("--overwrite", action="store_true",
+            help="Replace entries that are already present")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "prune":
+        from loopy.caching import _parse_size
+        if args.max_bytes is None and args.max_entries is None:
+            # use the policies from the environment
+            policy = None
+        else:
+            policy = lp.CacheEvictionPolicy(
+                    max_bytes=(
+                        _parse_size(args.max_bytes)
+                        if args.max_bytes is not None else None),
+                    max_entries=args.max_entries,
+                    strategy=args.strategy)
+
+        removed = lp.prune_caches(policy, name=args.cache, dry_run=args.dry_run)
+
+        for entry in removed:
+            print("%s %s %s (%d bytes)" % (
+                "would remove" if args.dry_run else "removed",
+                entry.cache_name, entry.hexdigest_key, entry.size))
+
+        print("%d entries, %d bytes" % (
+            len(removed), sum(entry.size for entry in removed)))
+
+    elif args.command == "export":
+        exported = lp.export_cache_bundle(args.filename, names=args.cache,
+                accessed_since=args.accessed_since)
+        print("exported %d entries, %d bytes" % (
+            len(exported), sum(entry.size for entry in exported)))
+
+    elif args.command == "import":
+        imported = lp.import_cache_bundle(args.filename,
+                overwrite=args.overwrite)
+        for cache_name, count in sorted(imported.items()):
+            print("%s: imported %d entries" % (cache_name, count))
+
+    else:
+        parser.print_usage()
+
+
+def warm_main(argv):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog="loopy warm",
+            description="Fill loopy's on-disk caches by preprocessing, "
+            "scheduling and generating code for a batch of kernels")
+    parser.add_argument("sources", metavar="FILE", nargs="+",
+            help="Python scripts defining kernels (as 'lp_knl' or at module "
+            "level) or pickled kernels ('.pkl', '.pickle')")
+    parser.add_argument("-j", "--jobs", metavar="N", type=int,
+            help="Number of worker processes (default: number of CPUs)")
+
+    args = parser.parse_args(argv)
+
+    results = lp.warm_caches(args.sources, nprocs=args.jobs)
+
+    def format_time(t):
+        return "%.2f" % t if t is not None else "-"
+
+    print("%-30s %10s %10s %10s %5s  %s" % (
+        "kernel", "preprocess", "schedule", "codegen", "hits", "source"))
+
+    for result in sorted(results, key=lambda r: r.total_time, reverse=True):
+        print("%-30s %10s %10s %10s %5d  %s" % (
+            result.kernel_name,
+            format_time(result.preprocess_time),
+            format_time(result.schedule_time),
+            format_time(result.codegen_time),
+            result.cache_hits,
+            result.source))
+
+        if result.error is not None:
+            print("    error: %s" % result.error)
+
+    nerrors = sum(1 for result in results if result.error is not None)
+    print("%d kernels, %.2f s total, %d errors" % (
+        len(results), sum(result.total_time for result in results), nerrors))
+
+    return 1 if nerrors else 0
+
+# }}}
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "cache":
+        return cache_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "warm":
+        return warm_main(sys.argv[2:])
+
     from argparse import ArgumentParser
 
     parser = ArgumentParser(description="Stand-alone loopy frontend")
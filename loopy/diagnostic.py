@@ -107,6 +107,22 @@ class UnscheduledInstructionError(LoopyError):
 class ReductionIsNotTriangularError(LoopyError):
     pass
 
+
+class ScheduleBudgetExceededError(LoopyError):
+    """Raised if no loop schedule was found within the limits set by
+    :attr:`loopy.Options.schedule_time_limit` and
+    :attr:`loopy.Options.schedule_node_limit`.
+
+    .. attribute:: longest_partial_schedule
+
+        The longest partial schedule that was found to be a dead end, as a
+        tuple of :class:`loopy.schedule.ScheduleItem` instances.
+    """
+
+    def __init__(self, msg, longest_partial_schedule=()):
+        LoopyError.__init__(self, msg)
+        self.longest_partial_schedule = longest_partial_schedule
+
 # }}}
 
 
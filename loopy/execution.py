@@ -31,7 +31,7 @@ from loopy.diagnostic import LoopyError
 import logging
 logger = logging.getLogger(__name__)
 
-from pytools.persistent_dict import PersistentDict
+from loopy.caching import LoopyPersistentDict
 from loopy.tools import LoopyKeyBuilder
 from loopy.version import DATA_MODEL_VERSION
 
@@ -120,7 +120,7 @@ class SeparateArrayPackingController(object):
 
 # {{{ KernelExecutorBase
 
-typed_and_scheduled_cache = PersistentDict(
+typed_and_scheduled_cache = LoopyPersistentDict("typed-and-scheduled",
         "loopy-typed-and-scheduled-cache-v1-"+DATA_MODEL_VERSION,
         key_builder=LoopyKeyBuilder())
 
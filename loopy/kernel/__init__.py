@@ -1454,6 +1454,52 @@ class LoopKernel(ImmutableRecordWithoutPickling):
         self.cache_manager = SetOperationCacheManager()
         self._kernel_executor_cache = {}
 
+    # {{{ compact pickling
+
+    #: Fields that, in the compact format used for storage in :mod:`loopy`'s
+    #: caches, are pickled individually and only unpickled (and, for isl
+    #: objects, parsed) on first access.
+    lazily_unpickled_fields = (
+            "domains",
+            "instructions",
+            "args",
+            "schedule",
+            "assumptions",
+            "temporary_variables",
+            "substitutions",
+            "applied_iname_rewrites",
+            )
+
+    def _reduce_compactly(self):
+        """Return a :meth:`object.__reduce__`-style tuple for pickling *self*
+        in the compact format. See :attr:`lazily_unpickled_fields`.
+        """
+        attribs, p_hash_digest = self.__getstate__()
+
+        from loopy.tools import LazilyUnpicklingDict
+        lazy_attribs = LazilyUnpicklingDict(
+                (name, attribs.pop(name))
+                for name in self.lazily_unpickled_fields
+                if name in attribs)
+
+        return (_unpickle_compact_kernel,
+                (type(self), attribs, lazy_attribs, p_hash_digest))
+
+    def __getattr__(self, name):
+        # Only called if regular attribute lookup fails, i.e. for fields that
+        # have not yet been unpickled.
+        lazy_attribs = self.__dict__.get("_lazy_attribs")
+        if lazy_attribs is None or name not in lazy_attribs:
+            raise AttributeError("'%s' object has no attribute '%s'"
+                    % (type(self).__name__, name))
+
+        value = lazy_attribs[name]
+        setattr(self, name, value)
+        del lazy_attribs[name]
+        return value
+
+    # }}}
+
     # }}}
 
     # {{{ persistent hash key generation / comparison
@@ -1500,15 +1546,40 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         Only works in conjunction with :class:`loopy.tools.KeyBuilder`.
         """
-        for field_name in self.hash_fields:
-            key_builder.rec(key_hash, getattr(self, field_name))
+        from loopy.tools import update_persistent_hash_from_field_digests
+        update_persistent_hash_from_field_digests(
+                self, key_hash, key_builder, self.hash_fields,
+                self._update_persistent_hash_for_field)
+
+    def _update_persistent_hash_for_field(self, key_hash, key_builder,
+            field_name):
+        key_builder.rec(key_hash, getattr(self, field_name))
+
+    def copy(self, **kwargs):
+        result = super(LoopKernel, self).copy(**kwargs)
+
+        # Only the fields that changed need to be rehashed in the copy.
+        from loopy.tools import copy_field_hash_digests
+        copy_field_hash_digests(self, result, self.hash_fields)
+
+        return result
 
     def __hash__(self):
-        from loopy.tools import LoopyKeyBuilder
-        from pytools.persistent_dict import new_hash
-        key_hash = new_hash()
-        self.update_persistent_hash(key_hash, LoopyKeyBuilder())
-        return hash(key_hash.digest())
+        # Kernels are immutable, so the persistent hash digest is computed
+        # once and stored on the kernel by the key builder. copy() creates a
+        # new object, which will compute its own digest from those of its
+        # fields, most of which copy() carries over.
+        try:
+            digest = self._pytools_persistent_hash_digest
+        except AttributeError:
+            digest = None
+
+        if digest is None:
+            from loopy.tools import LoopyKeyBuilder
+            LoopyKeyBuilder()(self)
+            digest = self._pytools_persistent_hash_digest
+
+        return hash(digest)
 
     def __eq__(self, other):
         if not isinstance(other, LoopKernel):
@@ -1537,6 +1608,14 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # }}}
 
+
+def _unpickle_compact_kernel(cls, attribs, lazy_attribs, p_hash_digest):
+    kernel = cls.__new__(cls)
+    kernel.__setstate__((attribs, p_hash_digest))
+    kernel.register_fields(set(lazy_attribs))
+    kernel._lazy_attribs = lazy_attribs
+    return kernel
+
 # }}}
 
 # vim: foldmethod=marker
@@ -417,8 +417,18 @@ class InstructionBase(ImmutableRecord):
         """
 
         # Order matters for hash forming--sort the field names
-        for field_name in sorted(self.fields):
-            key_builder.rec(key_hash, getattr(self, field_name))
+        from loopy.tools import update_persistent_hash_from_field_digests
+        update_persistent_hash_from_field_digests(
+                self, key_hash, key_builder, sorted(self.fields),
+                self.update_persistent_hash_for_field)
+
+    def update_persistent_hash_for_field(self, key_hash, key_builder,
+            field_name):
+        """Update *key_hash* for the value of the field *field_name*.
+        Subclasses override this to hash fields that contain
+        :mod:`pymbolic` expressions.
+        """
+        key_builder.rec(key_hash, getattr(self, field_name))
 
     # }}}
 
@@ -435,7 +445,12 @@ class InstructionBase(ImmutableRecord):
 
             kwargs["depends_on_is_final"] = kwargs.pop("insn_deps_is_final")
 
-        return super(InstructionBase, self).copy(**kwargs)
+        result = super(InstructionBase, self).copy(**kwargs)
+
+        from loopy.tools import copy_field_hash_digests
+        copy_field_hash_digests(self, result, self.fields)
+
+        return result
 
     def __setstate__(self, val):
         super(InstructionBase, self).__setstate__(val)
@@ -818,25 +833,18 @@ class Assignment(MultiAssignmentBase):
             result += "\n" + 10*" " + "if (%s)" % " && ".join(self.predicates)
         return result
 
-    def update_persistent_hash(self, key_hash, key_builder):
-        """Custom hash computation function for use with
-        :class:`pytools.persistent_dict.PersistentDict`.
-
-        Only works in conjunction with :class:`loopy.tools.KeyBuilder`.
-        """
-
-        # Order matters for hash forming--sort the fields.
-        for field_name in sorted(self.fields):
-            if field_name in ["assignee", "expression"]:
+    def update_persistent_hash_for_field(self, key_hash, key_builder,
+            field_name):
+        if field_name in ["assignee", "expression"]:
+            key_builder.update_for_pymbolic_expression(
+                    key_hash, getattr(self, field_name))
+        elif field_name == "predicates":
+            preds = sorted(self.predicates, key=str)
+            for pred in preds:
                 key_builder.update_for_pymbolic_expression(
-                        key_hash, getattr(self, field_name))
-            elif field_name == "predicates":
-                preds = sorted(self.predicates, key=str)
-                for pred in preds:
-                    key_builder.update_for_pymbolic_expression(
-                            key_hash, pred)
-            else:
-                key_builder.rec(key_hash, getattr(self, field_name))
+                        key_hash, pred)
+        else:
+            key_builder.rec(key_hash, getattr(self, field_name))
 
     # {{{ for interface uniformity with CallInstruction
 
@@ -987,25 +995,18 @@ class CallInstruction(MultiAssignmentBase):
             result += "\n" + 10*" " + "if (%s)" % " && ".join(self.predicates)
         return result
 
-    def update_persistent_hash(self, key_hash, key_builder):
-        """Custom hash computation function for use with
-        :class:`pytools.persistent_dict.PersistentDict`.
-
-        Only works in conjunction with :class:`loopy.tools.KeyBuilder`.
-        """
-
-        # Order matters for hash forming--sort the fields.
-        for field_name in sorted(self.fields):
-            if field_name in ["assignees", "expression"]:
+    def update_persistent_hash_for_field(self, key_hash, key_builder,
+            field_name):
+        if field_name in ["assignees", "expression"]:
+            key_builder.update_for_pymbolic_expression(
+                    key_hash, getattr(self, field_name))
+        elif field_name == "predicates":
+            preds = sorted(self.predicates, key=str)
+            for pred in preds:
                 key_builder.update_for_pymbolic_expression(
-                        key_hash, getattr(self, field_name))
-            elif field_name == "predicates":
-                preds = sorted(self.predicates, key=str)
-                for pred in preds:
-                    key_builder.update_for_pymbolic_expression(
-                            key_hash, pred)
-            else:
-                key_builder.rec(key_hash, getattr(self, field_name))
+                        key_hash, pred)
+        else:
+            key_builder.rec(key_hash, getattr(self, field_name))
 
     @property
     def atomicity(self):
@@ -1210,24 +1211,17 @@ class CInstruction(InstructionBase):
         return first_line + "\n    " + "\n    ".join(
                 self.code.split("\n"))
 
-    def update_persistent_hash(self, key_hash, key_builder):
-        """Custom hash computation function for use with
-        :class:`pytools.persistent_dict.PersistentDict`.
-
-        Only works in conjunction with :class:`loopy.tools.KeyBuilder`.
-        """
-
-        # Order matters for hash forming--sort the fields.
-        for field_name in sorted(self.fields):
-            if field_name == "assignees":
-                for a in self.assignees:
-                    key_builder.update_for_pymbolic_expression(key_hash, a)
-            elif field_name == "iname_exprs":
-                for name, val in self.iname_exprs:
-                    key_builder.rec(key_hash, name)
-                    key_builder.update_for_pymbolic_expression(key_hash, val)
-            else:
-                key_builder.rec(key_hash, getattr(self, field_name))
+    def update_persistent_hash_for_field(self, key_hash, key_builder,
+            field_name):
+        if field_name == "assignees":
+            for a in self.assignees:
+                key_builder.update_for_pymbolic_expression(key_hash, a)
+        elif field_name == "iname_exprs":
+            for name, val in self.iname_exprs:
+                key_builder.rec(key_hash, name)
+                key_builder.update_for_pymbolic_expression(key_hash, val)
+        else:
+            key_builder.rec(key_hash, getattr(self, field_name))
 
 # }}}
 
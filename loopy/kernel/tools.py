@@ -26,6 +26,7 @@ THE SOFTWARE.
 """
 
 import sys
+import re
 
 import six
 from six.moves import intern
@@ -34,6 +35,7 @@ import numpy as np
 import islpy as isl
 from islpy import dim_type
 from loopy.diagnostic import LoopyError, warn_with_kernel
+from loopy.symbolic import SubstitutionMapper
 from pytools import memoize_on_first_arg
 
 
@@ -695,6 +697,69 @@ def is_domain_dependent_on_inames(kernel, domain_index, inames):
 
 # {{{ rank inames by stride
 
+def get_iname_aggregate_strides(kernel, ary_acc_exprs, inames,
+        approximate_arg_values):
+    """Return a :class:`dict` mapping those of *inames* occurring in the
+    indices of the array accesses *ary_acc_exprs* to their "aggregate
+    stride", i.e. the sum over all accesses of the (smallest) distance in
+    memory between the elements accessed in consecutive iterations of the
+    iname, in units of array elements. Kernel parameters in strides are
+    replaced by their values in *approximate_arg_values*.
+    """
+    # maps inames to "aggregate stride"
+    aggregate_strides = {}
+
+    from loopy.symbolic import CoefficientCollector
+    from pymbolic.primitives import Variable
+
+    for aae in ary_acc_exprs:
+        index_expr = aae.index
+        if not isinstance(index_expr, tuple):
+            index_expr = (index_expr,)
+
+        ary_name = aae.aggregate.name
+        ary = kernel.arg_dict.get(ary_name)
+        if ary is None:
+            ary = kernel.temporary_variables[ary_name]
+
+        if ary.dim_tags is None:
+            from warnings import warn
+            warn("Strides for '%s' are not known. Local axis assignment "
+                    "is likely suboptimal." % ary.name)
+            ary_strides = [1] * len(index_expr)
+        else:
+            ary_strides = []
+            from loopy.kernel.array import FixedStrideArrayDimTag
+            for dim_tag in ary.dim_tags:
+                if isinstance(dim_tag, FixedStrideArrayDimTag):
+                    ary_strides.append(dim_tag.stride)
+
+        # {{{ construct iname_to_stride_expr
+
+        iname_to_stride_expr = {}
+        for iexpr_i, stride in zip(index_expr, ary_strides):
+            if stride is None:
+                continue
+            coeffs = CoefficientCollector()(iexpr_i)
+            for var, coeff in six.iteritems(coeffs):
+                if (isinstance(var, Variable)
+                        and var.name in inames):
+                    # excludes '1', i.e.  the constant
+                    new_stride = coeff*stride
+                    old_stride = iname_to_stride_expr.get(var.name, None)
+                    if old_stride is None or new_stride < old_stride:
+                        iname_to_stride_expr[var.name] = new_stride
+
+        # }}}
+
+        from pymbolic import evaluate
+        for iname, stride_expr in six.iteritems(iname_to_stride_expr):
+            stride = evaluate(stride_expr, approximate_arg_values)
+            aggregate_strides[iname] = aggregate_strides.get(iname, 0) + stride
+
+    return aggregate_strides
+
+
 def get_auto_axis_iname_ranking_by_stride(kernel, insn):
     from loopy.kernel.data import ImageArg, ValueArg
 
@@ -750,54 +815,9 @@ def get_auto_axis_iname_ranking_by_stride(kernel, insn):
 
     # {{{ figure out which iname should get mapped to local axis 0
 
-    # maps inames to "aggregate stride"
-    aggregate_strides = {}
-
-    from loopy.symbolic import CoefficientCollector
-    from pymbolic.primitives import Variable
-
-    for aae in global_ary_acc_exprs:
-        index_expr = aae.index
-        if not isinstance(index_expr, tuple):
-            index_expr = (index_expr,)
-
-        ary_name = aae.aggregate.name
-        arg = kernel.arg_dict.get(ary_name)
-
-        if arg.dim_tags is None:
-            from warnings import warn
-            warn("Strides for '%s' are not known. Local axis assignment "
-                    "is likely suboptimal." % arg.name)
-            ary_strides = [1] * len(index_expr)
-        else:
-            ary_strides = []
-            from loopy.kernel.array import FixedStrideArrayDimTag
-            for dim_tag in arg.dim_tags:
-                if isinstance(dim_tag, FixedStrideArrayDimTag):
-                    ary_strides.append(dim_tag.stride)
-
-        # {{{ construct iname_to_stride_expr
-
-        iname_to_stride_expr = {}
-        for iexpr_i, stride in zip(index_expr, ary_strides):
-            if stride is None:
-                continue
-            coeffs = CoefficientCollector()(iexpr_i)
-            for var, coeff in six.iteritems(coeffs):
-                if (isinstance(var, Variable)
-                        and var.name in auto_axis_inames):
-                    # excludes '1', i.e.  the constant
-                    new_stride = coeff*stride
-                    old_stride = iname_to_stride_expr.get(var.name, None)
-                    if old_stride is None or new_stride < old_stride:
-                        iname_to_stride_expr[var.name] = new_stride
-
-        # }}}
-
-        from pymbolic import evaluate
-        for iname, stride_expr in six.iteritems(iname_to_stride_expr):
-            stride = evaluate(stride_expr, approximate_arg_values)
-            aggregate_strides[iname] = aggregate_strides.get(iname, 0) + stride
+    aggregate_strides = get_iname_aggregate_strides(
+            kernel, global_ary_acc_exprs, auto_axis_inames,
+            approximate_arg_values)
 
     if aggregate_strides:
         very_large_stride = int(np.iinfo(np.int32).max)
@@ -814,6 +834,89 @@ def get_auto_axis_iname_ranking_by_stride(kernel, insn):
 # }}}
 
 
+def infer_loop_priorities_by_stride(kernel):
+    """Return a :class:`frozenset` of loop priorities (in the format of
+    :attr:`loopy.LoopKernel.loop_priority`) that nest the sequential loops
+    around each instruction so that the loops whose iterations access
+    memory with the smallest strides (see
+    :func:`get_iname_aggregate_strides`) are innermost.
+
+    Strides are summed over all instructions to yield a consistent
+    order among all inames. Inames not used in array indices are placed
+    outermost. Inames mentioned in :attr:`loopy.LoopKernel.loop_priority`
+    are left out. Accesses to arrays whose strides depend on parameters
+    without approximate values (see :class:`loopy.ValueArg`) are ignored.
+    """
+    from loopy.kernel.data import ParallelTag, VectorizeTag, ValueArg
+    from loopy.kernel.instruction import MultiAssignmentBase
+
+    approximate_arg_values = dict(
+            (arg.name, arg.approximately)
+            for arg in kernel.args
+            if isinstance(arg, ValueArg) and arg.approximately is not None)
+
+    prioritized_inames = set(
+            iname
+            for priority in kernel.loop_priority
+            for iname in priority)
+
+    def is_sequential(iname):
+        return not isinstance(kernel.iname_to_tag.get(iname),
+                (ParallelTag, VectorizeTag))
+
+    from loopy.symbolic import ArrayAccessFinder
+    from pymbolic.primitives import Subscript
+    from pymbolic.mapper.evaluator import UnknownVariableError
+
+    aggregate_strides = {}
+    insn_to_seq_inames = {}
+
+    for insn in kernel.instructions:
+        seq_inames = frozenset(
+                iname for iname in kernel.insn_inames(insn)
+                if is_sequential(iname)
+                and iname not in prioritized_inames)
+
+        if len(seq_inames) < 2:
+            continue
+
+        insn_to_seq_inames[insn.id] = seq_inames
+
+        if not isinstance(insn, MultiAssignmentBase):
+            continue
+
+        ary_acc_exprs = list(ArrayAccessFinder()(insn.expression))
+        ary_acc_exprs.extend(
+                assignee for assignee in insn.assignees
+                if isinstance(assignee, Subscript))
+
+        for aae in ary_acc_exprs:
+            ary = kernel.arg_dict.get(aae.aggregate.name)
+            if ary is None:
+                ary = kernel.temporary_variables.get(aae.aggregate.name)
+            if ary is None or getattr(ary, "dim_tags", None) is None:
+                continue
+
+            try:
+                strides = get_iname_aggregate_strides(
+                        kernel, [aae], seq_inames, approximate_arg_values)
+            except UnknownVariableError:
+                continue
+
+            for iname, stride in six.iteritems(strides):
+                aggregate_strides[iname] = (
+                        aggregate_strides.get(iname, 0) + abs(stride))
+
+    very_large_stride = int(np.iinfo(np.int32).max)
+
+    return frozenset(
+            tuple(sorted(seq_inames,
+                key=lambda iname: (
+                    -aggregate_strides.get(iname, very_large_stride),
+                    iname)))
+            for seq_inames in six.itervalues(insn_to_seq_inames))
+
+
 def assign_automatic_axes(kernel, axis=0, local_size=None):
     logger.debug("%s: assign automatic axes" % kernel.name)
 
@@ -1566,4 +1669,219 @@ def get_subkernel_to_insn_id_map(kernel):
 # }}}
 
 
+# {{{ rename identifiers
+
+class _IdentifierRenamer(SubstitutionMapper):
+    def __init__(self, var_renames):
+        self.var_renames = var_renames
+
+        from pymbolic.primitives import Variable
+
+        def subst_func(expr):
+            if isinstance(expr, Variable) and expr.name in var_renames:
+                return Variable(var_renames[expr.name])
+            else:
+                return None
+
+        super(_IdentifierRenamer, self).__init__(subst_func)
+
+    def map_tagged_variable(self, expr, *args):
+        from loopy.symbolic import TaggedVariable
+        return TaggedVariable(
+                self.var_renames.get(expr.name, expr.name), expr.tag)
+
+
+def rename_identifiers(kernel, var_renames, insn_id_renames={}):
+    """Return a copy of *kernel* in which all occurrences of the inames and
+    temporary variables in the keys of *var_renames*, and of the instruction
+    ids in the keys of *insn_id_renames*, are simultaneously renamed to the
+    corresponding values.
+
+    Unlike :func:`loopy.rename_iname`, this performs no checks, conflicts
+    between new and existing names are the caller's responsibility.
+    Instructions containing verbatim code (:class:`loopy.CInstruction`)
+    are not supported.
+    """
+
+    import loopy as lp
+    from loopy.kernel.instruction import CInstruction, MultiAssignmentBase
+
+    def rename_var(name):
+        return var_renames.get(name, name)
+
+    def rename_id(insn_id):
+        return insn_id_renames.get(insn_id, insn_id)
+
+    def rename_var_set(names):
+        return type(names)(rename_var(name) for name in names)
+
+    def rename_in_comment(comment):
+        # Comments, such as those of barriers, mention variables and
+        # instruction ids.
+        def rename_word(match):
+            word = match.group(0)
+            if word in var_renames:
+                return var_renames[word]
+            else:
+                return rename_id(word)
+
+        return re.sub(r"\w+", rename_word, comment)
+
+    mapper = _IdentifierRenamer(var_renames)
+
+    # {{{ instructions
+
+    from copy import copy
+
+    new_insns = []
+    for insn in kernel.instructions:
+        if isinstance(insn, CInstruction):
+            raise LoopyError("cannot rename identifiers in instruction '%s'"
+                    % insn.id)
+
+        insn = insn.with_transformed_expressions(mapper)
+
+        insn_kwargs = dict(
+                id=rename_id(insn.id),
+                depends_on=frozenset(
+                    rename_id(dep) for dep in insn.depends_on),
+                no_sync_with=frozenset(
+                    (rename_id(other_id), scope)
+                    for other_id, scope in insn.no_sync_with),
+                within_inames=rename_var_set(insn.within_inames))
+
+        if insn.boostable_into is not None:
+            insn_kwargs["boostable_into"] = rename_var_set(insn.boostable_into)
+
+        if isinstance(insn, MultiAssignmentBase) and insn.atomicity:
+            new_atomicity = []
+            for atomicity in insn.atomicity:
+                atomicity = copy(atomicity)
+                atomicity.var_name = rename_var(atomicity.var_name)
+                new_atomicity.append(atomicity)
+
+            insn_kwargs["atomicity"] = tuple(new_atomicity)
+
+        new_insns.append(insn.copy(**insn_kwargs))
+
+    # }}}
+
+    def rename_dims(dom):
+        for dt in [dim_type.set, dim_type.param]:
+            for i in range(dom.dim(dt)):
+                name = dom.get_dim_name(dt, i)
+                if name in var_renames:
+                    dom = dom.set_dim_name(dt, i, var_renames[name])
+
+        return dom
+
+    # {{{ temporary variables
+
+    from loopy.symbolic import get_dependencies
+    renamed_vars = frozenset(var_renames)
+
+    new_temp_vars = {}
+    for tv in six.itervalues(kernel.temporary_variables):
+        tv = tv.copy(name=rename_var(tv.name))
+
+        if (tv.shape is not None and tv.shape is not lp.auto
+                and any(get_dependencies(s) & renamed_vars
+                    for s in tv.shape if s is not None)):
+            tv = tv.map_exprs(mapper)
+
+        new_temp_vars[tv.name] = tv
+
+    # }}}
+
+    # {{{ substitution rules
+
+    new_substs = {}
+    for subst_name, rule in six.iteritems(kernel.substitutions):
+        # Rule arguments shadow all other names.
+        rule_mapper = _IdentifierRenamer(dict(
+                (old_name, new_name)
+                for old_name, new_name in six.iteritems(var_renames)
+                if old_name not in rule.arguments))
+
+        new_substs[subst_name] = rule.copy(
+                expression=rule_mapper(rule.expression))
+
+    # }}}
+
+    # {{{ schedule
+
+    new_schedule = kernel.schedule
+    if new_schedule is not None:
+        from loopy.schedule import (
+                EnterLoop, LeaveLoop, RunInstruction, CallKernel, Barrier)
+
+        new_schedule = []
+        for sched_item in kernel.schedule:
+            if isinstance(sched_item, (EnterLoop, LeaveLoop)):
+                sched_item = sched_item.copy(iname=rename_var(sched_item.iname))
+            elif isinstance(sched_item, RunInstruction):
+                sched_item = sched_item.copy(
+                        insn_id=rename_id(sched_item.insn_id))
+            elif isinstance(sched_item, CallKernel):
+                sched_item = sched_item.copy(
+                        extra_args=[
+                            rename_var(arg_name)
+                            for arg_name in sched_item.extra_args],
+                        extra_inames=[
+                            rename_var(iname)
+                            for iname in sched_item.extra_inames])
+            elif isinstance(sched_item, Barrier):
+                sched_item = sched_item.copy(
+                        originating_insn_id=rename_id(
+                            sched_item.originating_insn_id),
+                        comment=(
+                            rename_in_comment(sched_item.comment)
+                            if sched_item.comment is not None
+                            else None))
+
+            new_schedule.append(sched_item)
+
+    # }}}
+
+    def rename_silenced_warning(warning):
+        # Warnings may be silenced for a single entity, as in "write_race(insn)".
+        match = re.match(r"^(\w+)\((\w+)\)$", warning)
+        if match is None:
+            return warning
+
+        kind, name = match.groups()
+        return "%s(%s)" % (kind, insn_id_renames.get(name, rename_var(name)))
+
+    return kernel.copy(
+            domains=[rename_dims(dom) for dom in kernel.domains],
+            instructions=new_insns,
+            assumptions=rename_dims(kernel.assumptions),
+            temporary_variables=new_temp_vars,
+            iname_to_tag=dict(
+                (rename_var(iname), tag)
+                for iname, tag in six.iteritems(kernel.iname_to_tag)),
+            substitutions=new_substs,
+            iname_slab_increments=dict(
+                (rename_var(iname), incr)
+                for iname, incr in six.iteritems(kernel.iname_slab_increments)),
+            loop_priority=frozenset(
+                tuple(rename_var(iname) for iname in prio)
+                for prio in kernel.loop_priority),
+            silenced_warnings=[
+                rename_silenced_warning(warning)
+                for warning in kernel.silenced_warnings],
+            applied_iname_rewrites=[
+                dict(
+                    (
+                        # may be a string or a variable
+                        rename_var(iname) if isinstance(iname, str)
+                        else mapper(iname),
+                        mapper(expr))
+                    for iname, expr in six.iteritems(rewrites))
+                for rewrites in kernel.applied_iname_rewrites],
+            schedule=new_schedule)
+
+# }}}
+
+
 # vim: foldmethod=marker
@@ -153,6 +153,63 @@ class Options(ImmutableRecord):
     .. rubric:: Features
 
     .. attribute:: disable_global_barriers
+
+    .. rubric:: Scheduling options
+
+    .. attribute:: schedule_time_limit
+
+        If not *None*, the number of seconds after which the search for a
+        loop schedule is abandoned if it has not found a schedule yet.
+        The scheduler then falls back to a greedy search that never
+        backtracks, which may fail to find a schedule.
+
+    .. attribute:: schedule_node_limit
+
+        Like :attr:`schedule_time_limit`, but limiting the number of
+        scheduler states examined.
+
+    .. attribute:: schedule_candidates
+
+        If greater than one, :func:`loopy.get_one_scheduled_kernel`
+        generates up to this many schedules and picks the cheapest one
+        according to :func:`loopy.schedule.tools.get_schedule_cost`,
+        instead of the first one found.
+
+    .. attribute:: schedule_parallel_workers
+
+        If greater than one, the number of processes among which the
+        search for a loop schedule is split, by searching different
+        branches of the search tree in each. The schedule found in the
+        first branch (in the order of the sequential search) that leads to
+        one is used. The branches share what remains of
+        :attr:`schedule_time_limit` and :attr:`schedule_node_limit`. If a
+        branch runs out of them before an earlier branch is found to lead
+        to a schedule, the whole search counts as having exceeded them.
+
+    .. attribute:: no_schedule_fallback
+
+        Instead of falling back to a greedy search once a limit set by
+        :attr:`schedule_time_limit` or :attr:`schedule_node_limit` is
+        reached, raise :exc:`loopy.diagnostic.ScheduleBudgetExceededError`.
+
+    .. attribute:: optimize_barrier_placement
+
+        In the bodies of innermost loops, place the fewest barriers that
+        separate all dependencies requiring them, including those between
+        consecutive loop iterations, instead of placing barriers greedily
+        within an iteration and between iterations separately.
+        See :func:`loopy.get_barrier_placement_stats`.
+
+    .. rubric:: Caching options
+
+    .. attribute:: canonicalize_cache_keys
+
+        Look up and store preprocessed and scheduled kernels in the
+        caches up to a consistent renaming of their inames, temporary
+        variables and instruction ids, so that kernels differing only in
+        these names share cache entries. Results are renamed back to the
+        kernel's names on retrieval.
+        See :func:`loopy.tools.get_canonical_names`.
     """
 
     _legacy_options_map = {
@@ -206,6 +263,18 @@ class Options(ImmutableRecord):
                 disable_global_barriers=kwargs.get("disable_global_barriers",
                     False),
                 check_dep_resolution=kwargs.get("check_dep_resolution", True),
+
+                schedule_time_limit=kwargs.get("schedule_time_limit", None),
+                schedule_node_limit=kwargs.get("schedule_node_limit", None),
+                no_schedule_fallback=kwargs.get("no_schedule_fallback", False),
+                schedule_candidates=kwargs.get("schedule_candidates", 0),
+                schedule_parallel_workers=kwargs.get(
+                    "schedule_parallel_workers", 0),
+                optimize_barrier_placement=kwargs.get(
+                    "optimize_barrier_placement", False),
+
+                canonicalize_cache_keys=kwargs.get("canonicalize_cache_keys",
+                    False),
                 )
 
     # {{{ legacy compatibility
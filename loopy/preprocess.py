@@ -30,7 +30,7 @@ from loopy.diagnostic import (
 
 import islpy as isl
 
-from pytools.persistent_dict import PersistentDict
+from loopy.caching import LoopyPersistentDict
 
 from loopy.tools import LoopyKeyBuilder
 from loopy.version import DATA_MODEL_VERSION
@@ -890,7 +890,8 @@ def _insert_subdomain_into_domain_tree(kernel, domains, subdomain):
 
 def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
                       automagic_scans_ok=False, force_scan=False,
-                      force_outer_iname_for_scan=None):
+                      force_outer_iname_for_scan=None,
+                      local_scan_algorithm="hillis_steele"):
     """Rewrites reductions into their imperative form. With *insn_id_filter*
     specified, operate only on the instruction with an instruction id matching
     *insn_id_filter*.
@@ -912,10 +913,29 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
     If *force_outer_iname_for_scan* is not *None*, this function will attempt
     to realize candidate reductions as scans using the specified iname as the
     outer (sweep) iname.
+
+    *local_scan_algorithm* selects how scans with a local-parallel sweep iname
+    are carried out within a work group. With ``"hillis_steele"``, each of
+    about ``log2(n)`` stages updates nearly all *n* elements, for a total of
+    ``O(n log(n))`` applications of the reduction operation. With
+    ``"work_efficient"``, an up-sweep and a down-sweep along a binary tree
+    (as described by Blelloch) perform fewer than ``2*n`` applications in
+    about ``2*log2(n)`` stages, each of which needs only one barrier.
+
+    Reductions over an iname tagged as a group index (``g.N``) are realized
+    in two stages separated by a global barrier: Each group first reduces its
+    share of the data (according to the remaining reduction inames, which may
+    be sequential or local-parallel) into a global temporary holding one
+    partial result per group, and the partial results are then combined
+    sequentially. Such reductions may not be nested in loops.
     """
 
     logger.debug("%s: realize reduction" % kernel.name)
 
+    if local_scan_algorithm not in ["hillis_steele", "work_efficient"]:
+        raise LoopyError("unknown local scan algorithm: '%s'"
+                % local_scan_algorithm)
+
     new_insns = []
     new_iname_tags = {}
 
@@ -1300,6 +1320,155 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
             return [acc_var[outer_local_iname_vars + (0,)] for acc_var in acc_vars]
     # }}}
 
+    # {{{ global-parallel
+
+    def map_reduction_global(expr, rec, nresults, arg_dtypes,
+            reduction_dtypes, group_iname):
+        outer_insn_inames = temp_kernel.insn_inames(insn)
+
+        if outer_insn_inames:
+            raise LoopyError("reduction over group-parallel iname '%s' in "
+                    "instruction '%s' may not be nested in loops over "
+                    "inames '%s'"
+                    % (group_iname, insn.id, ", ".join(sorted(outer_insn_inames))))
+
+        from loopy.isl_helpers import static_min_of_pw_aff, static_max_of_pw_aff
+        from loopy.symbolic import pw_aff_to_expr
+        bounds = temp_kernel.get_iname_bounds(group_iname)
+        group_lbound = pw_aff_to_expr(
+                static_min_of_pw_aff(bounds.lower_bound_pw_aff,
+                    constants_only=False))
+        ngroups = pw_aff_to_expr(
+                static_max_of_pw_aff(bounds.size, constants_only=False))
+
+        from pymbolic import var
+
+        def get_group_index(iname):
+            if group_lbound == 0:
+                return var(iname)
+            else:
+                return var(iname) - group_lbound
+
+        from loopy.kernel.data import temp_var_scope
+
+        partial_var_names = make_temporaries(
+                name_based_on="partial_"+group_iname,
+                nvars=nresults,
+                shape=(ngroups,),
+                dtypes=reduction_dtypes,
+                scope=temp_var_scope.GLOBAL)
+
+        partial_vars = tuple(var(n) for n in partial_var_names)
+
+        # {{{ stage 1: reduce within each group
+
+        # The reduction over the remaining inames is left in place, to be
+        # realized sequentially or group-locally once the partial-result
+        # instruction comes around in the queue.
+
+        rest_inames = tuple(
+                iname for iname in expr.inames if iname != group_iname)
+
+        if rest_inames:
+            from loopy.symbolic import Reduction
+            partial_expr = Reduction(expr.operation, rest_inames, expr.expr,
+                    expr.allow_simultaneous)
+        else:
+            partial_expr = expr.expr
+
+        partial_assignees = tuple(
+                partial_var[get_group_index(group_iname)]
+                for partial_var in partial_vars)
+
+        if nresults > 1 and isinstance(partial_expr, tuple):
+            partial_assignments = [
+                    ((assignee,), sub_expr)
+                    for assignee, sub_expr in zip(partial_assignees, partial_expr)]
+        else:
+            partial_assignments = [(partial_assignees, partial_expr)]
+
+        partial_ids = set()
+        for assignees, assignment_expr in partial_assignments:
+            partial_id = insn_id_gen("%s_%s_partial" % (insn.id, group_iname))
+            partial_insn = make_assignment(
+                    id=partial_id,
+                    assignees=assignees,
+                    expression=assignment_expr,
+                    within_inames=frozenset([group_iname]),
+                    within_inames_is_final=insn.within_inames_is_final,
+                    depends_on=insn.depends_on)
+            generated_insns.append(partial_insn)
+            partial_ids.add(partial_id)
+
+        # }}}
+
+        barrier_id = insn_id_gen("%s_%s_barrier" % (insn.id, group_iname))
+        from loopy.kernel.instruction import BarrierInstruction
+        barrier_insn = BarrierInstruction(
+                id=barrier_id,
+                depends_on=frozenset(partial_ids),
+                within_inames=frozenset(),
+                within_inames_is_final=insn.within_inames_is_final,
+                kind="global")
+        generated_insns.append(barrier_insn)
+
+        # {{{ stage 2: combine the partial results
+
+        # The combining iname takes on the same values as the group iname.
+
+        combine_iname = var_name_gen("red_%s_combine" % group_iname)
+        combine_domain = (
+                temp_kernel.get_inames_domain(frozenset([group_iname]))
+                .project_out_except([group_iname], [isl.dim_type.set])
+                .set_dim_name(isl.dim_type.set, 0, combine_iname))
+        domains.append(combine_domain)
+
+        acc_var_names = make_temporaries(
+                name_based_on="acc_"+group_iname,
+                nvars=nresults,
+                shape=(),
+                dtypes=reduction_dtypes,
+                scope=temp_var_scope.PRIVATE)
+
+        acc_vars = tuple(var(n) for n in acc_var_names)
+
+        init_id = insn_id_gen("%s_%s_init" % (insn.id, group_iname))
+        init_insn = make_assignment(
+                id=init_id,
+                assignees=acc_vars,
+                within_inames=frozenset(),
+                within_inames_is_final=insn.within_inames_is_final,
+                depends_on=frozenset([barrier_id]),
+                expression=expr.operation.neutral_element(*arg_dtypes))
+        generated_insns.append(init_insn)
+
+        combine_id = insn_id_gen("%s_%s_combine" % (insn.id, group_iname))
+        combine_insn = make_assignment(
+                id=combine_id,
+                assignees=acc_vars,
+                expression=expr.operation(
+                    arg_dtypes,
+                    _strip_if_scalar(acc_vars, acc_vars),
+                    _strip_if_scalar(acc_vars, tuple(
+                        partial_var[get_group_index(combine_iname)]
+                        for partial_var in partial_vars))),
+                within_inames=frozenset([combine_iname]),
+                within_inames_is_final=insn.within_inames_is_final,
+                depends_on=frozenset([init_id, barrier_id]))
+        generated_insns.append(combine_insn)
+
+        # }}}
+
+        new_insn_add_depends_on.add(combine_id)
+
+        if nresults == 1:
+            assert len(acc_vars) == 1
+            return acc_vars[0]
+        else:
+            return acc_vars
+
+    # }}}
+
     # {{{ utils (stateful)
 
     from pytools import memoize
@@ -1493,13 +1662,6 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
 
         from loopy.kernel.data import temp_var_scope
 
-        read_var_names = make_temporaries(
-                name_based_on="read_"+scan_iname+"_arg_{index}",
-                nvars=nresults,
-                shape=(),
-                dtypes=reduction_dtypes,
-                scope=temp_var_scope.PRIVATE)
-
         acc_var_names = make_temporaries(
                 name_based_on="acc_"+scan_iname,
                 nvars=nresults,
@@ -1508,7 +1670,6 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
                 scope=temp_var_scope.LOCAL)
 
         acc_vars = tuple(var(n) for n in acc_var_names)
-        read_vars = tuple(var(n) for n in read_var_names)
 
         base_iname_deps = (outer_insn_inames
                 - frozenset(expr.inames) - frozenset([sweep_iname]))
@@ -1567,69 +1728,89 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
 
         prev_id = transfer_id
 
-        istage = 0
-        cur_size = 1
-
-        while cur_size < scan_size:
-            stage_exec_iname = var_name_gen("%s__scan_s%d" % (sweep_iname, istage))
-            domains.append(
-                    _make_slab_set_from_range(stage_exec_iname, cur_size, scan_size))
-            new_iname_tags[stage_exec_iname] = kernel.iname_to_tag[sweep_iname]
-
-            for read_var, acc_var in zip(read_vars, acc_vars):
-                read_stage_id = insn_id_gen(
-                        "scan_%s_read_stage_%d" % (scan_iname, istage))
+        if local_scan_algorithm == "work_efficient":
+            prev_id = add_work_efficient_scan_stages(
+                    expr, arg_dtypes, acc_vars, sweep_iname, scan_iname,
+                    scan_size, outer_local_iname_vars, base_iname_deps, prev_id)
+        else:
+            read_var_names = make_temporaries(
+                    name_based_on="read_"+scan_iname+"_arg_{index}",
+                    nvars=nresults,
+                    shape=(),
+                    dtypes=reduction_dtypes,
+                    scope=temp_var_scope.PRIVATE)
 
-                read_stage_insn = make_assignment(
-                        id=read_stage_id,
-                        assignees=(read_var,),
-                        expression=(
+            read_vars = tuple(var(n) for n in read_var_names)
+
+            istage = 0
+            cur_size = 1
+
+            while cur_size < scan_size:
+                stage_exec_iname = var_name_gen(
+                        "%s__scan_s%d" % (sweep_iname, istage))
+                domains.append(
+                        _make_slab_set_from_range(
+                            stage_exec_iname, cur_size, scan_size))
+                new_iname_tags[stage_exec_iname] = \
+                        kernel.iname_to_tag[sweep_iname]
+
+                for read_var, acc_var in zip(read_vars, acc_vars):
+                    read_stage_id = insn_id_gen(
+                            "scan_%s_read_stage_%d" % (scan_iname, istage))
+
+                    read_stage_insn = make_assignment(
+                            id=read_stage_id,
+                            assignees=(read_var,),
+                            expression=(
+                                    acc_var[
+                                        outer_local_iname_vars
+                                        + (var(stage_exec_iname) - cur_size,)]),
+                            within_inames=(
+                                base_iname_deps | frozenset([stage_exec_iname])),
+                            within_inames_is_final=insn.within_inames_is_final,
+                            depends_on=frozenset([prev_id]))
+
+                    if cur_size == 1:
+                        # Performance hack: don't add a barrier here with
+                        # transfer_insn.
+                        # NOTE: This won't work if the way that local inames
+                        # are lowered changes.
+                        read_stage_insn = read_stage_insn.copy(
+                                no_sync_with=(
+                                    read_stage_insn.no_sync_with
+                                    | frozenset([(transfer_id, "any")])))
+
+                    generated_insns.append(read_stage_insn)
+                    prev_id = read_stage_id
+
+                write_stage_id = insn_id_gen(
+                        "scan_%s_write_stage_%d" % (scan_iname, istage))
+                write_stage_insn = make_assignment(
+                        id=write_stage_id,
+                        assignees=tuple(
+                            acc_var[
+                                outer_local_iname_vars + (var(stage_exec_iname),)]
+                            for acc_var in acc_vars),
+                        expression=expr.operation(
+                            arg_dtypes,
+                            _strip_if_scalar(acc_vars, read_vars),
+                            _strip_if_scalar(acc_vars, tuple(
                                 acc_var[
                                     outer_local_iname_vars
-                                    + (var(stage_exec_iname) - cur_size,)]),
+                                    + (var(stage_exec_iname),)]
+                                for acc_var in acc_vars))
+                            ),
                         within_inames=(
                             base_iname_deps | frozenset([stage_exec_iname])),
                         within_inames_is_final=insn.within_inames_is_final,
-                        depends_on=frozenset([prev_id]))
-
-                if cur_size == 1:
-                    # Performance hack: don't add a barrier here with transfer_insn.
-                    # NOTE: This won't work if the way that local inames
-                    # are lowered changes.
-                    read_stage_insn = read_stage_insn.copy(
-                            no_sync_with=(
-                                read_stage_insn.no_sync_with
-                                | frozenset([(transfer_id, "any")])))
-
-                generated_insns.append(read_stage_insn)
-                prev_id = read_stage_id
-
-            write_stage_id = insn_id_gen(
-                    "scan_%s_write_stage_%d" % (scan_iname, istage))
-            write_stage_insn = make_assignment(
-                    id=write_stage_id,
-                    assignees=tuple(
-                        acc_var[outer_local_iname_vars + (var(stage_exec_iname),)]
-                        for acc_var in acc_vars),
-                    expression=expr.operation(
-                        arg_dtypes,
-                        _strip_if_scalar(acc_vars, read_vars),
-                        _strip_if_scalar(acc_vars, tuple(
-                            acc_var[
-                                outer_local_iname_vars + (var(stage_exec_iname),)]
-                            for acc_var in acc_vars))
-                        ),
-                    within_inames=(
-                        base_iname_deps | frozenset([stage_exec_iname])),
-                    within_inames_is_final=insn.within_inames_is_final,
-                    depends_on=frozenset([prev_id]),
-                    )
+                        depends_on=frozenset([prev_id]),
+                        )
 
-            generated_insns.append(write_stage_insn)
-            prev_id = write_stage_id
+                generated_insns.append(write_stage_insn)
+                prev_id = write_stage_id
 
-            cur_size *= 2
-            istage += 1
+                cur_size *= 2
+                istage += 1
 
         new_insn_add_depends_on.add(prev_id)
         new_insn_add_within_inames.add(sweep_iname)
@@ -1643,6 +1824,71 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
             return [acc_var[outer_local_iname_vars + (output_idx,)]
                     for acc_var in acc_vars]
 
+    def add_work_efficient_scan_stages(expr, arg_dtypes, acc_vars, sweep_iname,
+            scan_iname, scan_size, outer_local_iname_vars, base_iname_deps,
+            prev_id):
+        """Add the stages of an in-place inclusive scan of the local
+        accumulators *acc_vars* that applies the reduction operation
+        ``O(scan_size)`` times, by first combining elements along a binary
+        tree ("up-sweep") and then propagating the results back down the
+        tree ("down-sweep"). Return the id of the last stage.
+        """
+        from pymbolic import var
+
+        # Element k is updated from element k - stride in each stage. In the
+        # up-sweep, k ranges over (2*stride)*m + 2*stride - 1, in the
+        # down-sweep over (2*stride)*m + 3*stride - 1. Within each stage, the
+        # elements read and written are disjoint.
+
+        strides = []
+        stride = 1
+        while 2*stride <= scan_size:
+            strides.append(stride)
+            stride *= 2
+
+        stages = (
+                [(stride, 2*stride - 1, scan_size // (2*stride))
+                    for stride in strides]
+                + [(stride, 3*stride - 1, (scan_size - stride) // (2*stride))
+                    for stride in strides[::-1]])
+
+        istage = 0
+        for stride, offset, nupdates in stages:
+            if not nupdates:
+                continue
+
+            stage_exec_iname = var_name_gen("%s__scan_s%d" % (sweep_iname, istage))
+            domains.append(_make_slab_set(stage_exec_iname, nupdates))
+            new_iname_tags[stage_exec_iname] = kernel.iname_to_tag[sweep_iname]
+
+            target_idx = 2*stride*var(stage_exec_iname) + offset
+
+            stage_id = insn_id_gen("scan_%s_stage_%d" % (scan_iname, istage))
+            stage_insn = make_assignment(
+                    id=stage_id,
+                    assignees=tuple(
+                        acc_var[outer_local_iname_vars + (target_idx,)]
+                        for acc_var in acc_vars),
+                    expression=expr.operation(
+                        arg_dtypes,
+                        _strip_if_scalar(acc_vars, tuple(
+                            acc_var[
+                                outer_local_iname_vars + (target_idx - stride,)]
+                            for acc_var in acc_vars)),
+                        _strip_if_scalar(acc_vars, tuple(
+                            acc_var[outer_local_iname_vars + (target_idx,)]
+                            for acc_var in acc_vars))),
+                    within_inames=(
+                        base_iname_deps | frozenset([stage_exec_iname])),
+                    within_inames_is_final=insn.within_inames_is_final,
+                    depends_on=frozenset([prev_id]))
+
+            generated_insns.append(stage_insn)
+            prev_id = stage_id
+            istage += 1
+
+        return prev_id
+
     # }}}
 
     # {{{ seq/par dispatch
@@ -1665,9 +1911,15 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
 
         iname_classes = _classify_reduction_inames(temp_kernel, expr.inames)
 
+        from loopy.kernel.data import GroupIndexTag
+        group_par_inames = tuple(
+                iname for iname in iname_classes.nonlocal_parallel
+                if isinstance(temp_kernel.iname_to_tag.get(iname), GroupIndexTag))
+
         n_sequential = len(iname_classes.sequential)
         n_local_par = len(iname_classes.local_parallel)
-        n_nonlocal_par = len(iname_classes.nonlocal_parallel)
+        n_group_par = len(group_par_inames)
+        n_nonlocal_par = len(iname_classes.nonlocal_parallel) - n_group_par
 
         really_force_scan = force_scan and (
                 len(expr.inames) != 1 or expr.inames[0] not in inames_added_for_scan)
@@ -1716,15 +1968,24 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
                     % ", ".join(expr.inames))
 
         if n_nonlocal_par:
-            bad_inames = iname_classes.nonlocal_parallel
-            raise LoopyError("the only form of parallelism supported "
-                    "by reductions is 'local'--found iname(s) '%s' "
+            bad_inames = tuple(
+                    iname for iname in iname_classes.nonlocal_parallel
+                    if iname not in group_par_inames)
+            raise LoopyError("the only forms of parallelism supported "
+                    "by reductions are 'local' and 'group'--found iname(s) '%s' "
                     "respectively tagged '%s'"
                     % (", ".join(bad_inames),
-                       ", ".join(kernel.iname_to_tag[iname]
+                       ", ".join(str(kernel.iname_to_tag[iname])
                                  for iname in bad_inames)))
 
-        if n_local_par == 0 and n_sequential == 0:
+        if n_group_par > 1:
+            raise LoopyError("Reduction over '%s' contains more than "
+                    "one group-parallel iname. All but one must be split "
+                    "off (using split_reduction_{in,out}ward) "
+                    "before code generation."
+                    % ", ".join(expr.inames))
+
+        if n_local_par == 0 and n_sequential == 0 and n_group_par == 0:
             from loopy.diagnostic import warn_with_kernel
             warn_with_kernel(kernel, "empty_reduction",
                     "Empty reduction found (no inames to reduce over). "
@@ -1739,6 +2000,18 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
 
         # }}}
 
+        if n_group_par:
+            if may_be_implemented_as_scan:
+                _error_if_force_scan_on(LoopyError,
+                        "Reduction over '%s' contains group-parallel iname "
+                        "'%s': this cannot be realized as a scan."
+                        % (", ".join(expr.inames), group_par_inames[0]))
+
+            group_iname, = group_par_inames
+            return map_reduction_global(
+                    expr, rec, nresults, arg_dtypes, reduction_dtypes,
+                    group_iname)
+
         if may_be_implemented_as_scan:
             assert force_scan or automagic_scans_ok
 
@@ -2020,11 +2293,88 @@ def limit_boostability(kernel):
 # }}}
 
 
-preprocess_cache = PersistentDict("loopy-preprocess-cache-v2-"+DATA_MODEL_VERSION,
+preprocess_cache = LoopyPersistentDict("preprocess",
+        "loopy-preprocess-cache-v2-"+DATA_MODEL_VERSION,
         key_builder=LoopyKeyBuilder())
 
 
-def preprocess_kernel(kernel, device=None):
+# {{{ preprocessing profile
+
+PreprocessPassInfo = namedtuple("PreprocessPassInfo",
+        "name time ninsns ntemporaries")
+
+
+class PreprocessProfile(object):
+    """A record of the time taken by each pass of :func:`preprocess_kernel`.
+    Pass an instance as *profile* to :func:`preprocess_kernel` to have it
+    filled in. ``str()`` of an instance gives a human-readable summary.
+
+    .. attribute:: from_cache
+
+        Whether the preprocessed kernel was retrieved from the cache, in
+        which case :attr:`passes` is empty.
+
+    .. attribute:: passes
+
+        A list of :class:`collections.namedtuple` instances with the
+        attributes *name*, *time* (wall time in seconds), and *ninsns* and
+        *ntemporaries* (the number of instructions and temporary variables
+        of the kernel after the pass), in the order in which the passes
+        ran.
+
+    .. attribute:: sink
+
+        If not *None*, a callable that is called with arguments
+        *kernel_name* and an entry of :attr:`passes` after each pass,
+        e.g. to send the timings to a log or a monitoring system.
+
+    .. automethod:: total_time
+    """
+
+    def __init__(self, sink=None):
+        self.from_cache = False
+        self.passes = []
+        self.sink = sink
+
+    def record_pass(self, kernel, name, time):
+        pass_info = PreprocessPassInfo(
+                name=name,
+                time=time,
+                ninsns=len(kernel.instructions),
+                ntemporaries=len(kernel.temporary_variables))
+
+        self.passes.append(pass_info)
+
+        if self.sink is not None:
+            self.sink(kernel.name, pass_info)
+
+    def total_time(self):
+        return sum(pass_info.time for pass_info in self.passes)
+
+    def __str__(self):
+        if self.from_cache:
+            return "preprocessed kernel retrieved from cache"
+
+        total_time = self.total_time()
+
+        lines = ["preprocessing: %.3f s" % total_time]
+        lines.extend(
+                "%8.3f s %5.1f%%  %-45s %6d insns %6d temporaries" % (
+                    pass_info.time,
+                    100*pass_info.time/total_time if total_time else 0,
+                    pass_info.name, pass_info.ninsns, pass_info.ntemporaries)
+                for pass_info in self.passes)
+
+        return "\n".join(lines)
+
+# }}}
+
+
+def preprocess_kernel(kernel, device=None, profile=None):
+    """
+    :arg profile: If not *None*, a :class:`PreprocessProfile` that is
+        filled in with the time taken by each pass.
+    """
     if device is not None:
         from warnings import warn
         warn("passing 'device' to preprocess_kernel() is deprecated",
@@ -2034,6 +2384,19 @@ def preprocess_kernel(kernel, device=None):
     if kernel.state >= kernel_state.PREPROCESSED:
         return kernel
 
+    from loopy import CACHING_ENABLED
+    if CACHING_ENABLED and kernel.options.canonicalize_cache_keys:
+        from loopy.tools import call_with_canonical_names
+        return call_with_canonical_names(
+                lambda knl: _preprocess_kernel_inner(knl, profile),
+                kernel)
+
+    return _preprocess_kernel_inner(kernel, profile)
+
+
+def _preprocess_kernel_inner(kernel, profile=None):
+    from loopy.kernel import kernel_state
+
     # {{{ cache retrieval
 
     from loopy import CACHING_ENABLED
@@ -2043,6 +2406,8 @@ def preprocess_kernel(kernel, device=None):
         try:
             result = preprocess_cache[kernel]
             logger.debug("%s: preprocess cache hit" % kernel.name)
+            if profile is not None:
+                profile.from_cache = True
             return result
         except KeyError:
             pass
@@ -2051,8 +2416,27 @@ def preprocess_kernel(kernel, device=None):
 
     logger.info("%s: preprocess start" % kernel.name)
 
+    from time import time
+
+    def run_pass(pass_func, kernel, *args, **kwargs):
+        start_time = time()
+        result = pass_func(kernel, *args, **kwargs)
+
+        if profile is not None:
+            name = pass_func.__name__
+            if getattr(pass_func, "__self__", None) is not None:
+                # e.g. the target's preprocess method
+                name = "%s.%s" % (type(pass_func.__self__).__name__, name)
+
+            profile.record_pass(
+                    # checks return None
+                    result if result is not None else kernel,
+                    name, time() - start_time)
+
+        return result
+
     from loopy.check import check_identifiers_in_subst_rules
-    check_identifiers_in_subst_rules(kernel)
+    run_pass(check_identifiers_in_subst_rules, kernel)
 
     # {{{ check that there are no l.auto-tagged inames
 
@@ -2066,19 +2450,19 @@ def preprocess_kernel(kernel, device=None):
     # }}}
 
     from loopy.transform.subst import expand_subst
-    kernel = expand_subst(kernel)
+    kernel = run_pass(expand_subst, kernel)
 
     # Ordering restriction:
     # Type inference and reduction iname uniqueness don't handle substitutions.
     # Get them out of the way.
 
-    kernel = infer_unknown_types(kernel, expect_completion=False)
+    kernel = run_pass(infer_unknown_types, kernel, expect_completion=False)
 
-    check_for_writes_to_predicates(kernel)
-    check_reduction_iname_uniqueness(kernel)
+    run_pass(check_for_writes_to_predicates, kernel)
+    run_pass(check_reduction_iname_uniqueness, kernel)
 
     from loopy.kernel.creation import apply_single_writer_depencency_heuristic
-    kernel = apply_single_writer_depencency_heuristic(kernel)
+    kernel = run_pass(apply_single_writer_depencency_heuristic, kernel)
 
     # Ordering restrictions:
     #
@@ -2089,22 +2473,22 @@ def preprocess_kernel(kernel, device=None):
     #   because it manipulates the depends_on field, which could prevent
     #   defaults from being applied.
 
-    kernel = realize_reduction(kernel, unknown_types_ok=False)
+    kernel = run_pass(realize_reduction, kernel, unknown_types_ok=False)
 
     # Ordering restriction:
     # add_axes_to_temporaries_for_ilp because reduction accumulators
     # need to be duplicated by this.
 
     from loopy.transform.ilp import add_axes_to_temporaries_for_ilp_and_vec
-    kernel = add_axes_to_temporaries_for_ilp_and_vec(kernel)
+    kernel = run_pass(add_axes_to_temporaries_for_ilp_and_vec, kernel)
 
-    kernel = find_temporary_scope(kernel)
+    kernel = run_pass(find_temporary_scope, kernel)
 
     # boostability should be removed in 2017.x.
-    kernel = find_idempotence(kernel)
-    kernel = limit_boostability(kernel)
+    kernel = run_pass(find_idempotence, kernel)
+    kernel = run_pass(limit_boostability, kernel)
 
-    kernel = kernel.target.preprocess(kernel)
+    kernel = run_pass(kernel.target.preprocess, kernel)
 
     logger.info("%s: preprocess done" % kernel.name)
 
@@ -2121,7 +2505,7 @@ def preprocess_kernel(kernel, device=None):
     if CACHING_ENABLED:
         input_kernel = prepare_for_caching(input_kernel)
 
-    kernel = prepare_for_caching(kernel)
+    kernel = run_pass(prepare_for_caching, kernel)
 
     # }}}
 
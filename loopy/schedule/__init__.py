@@ -24,12 +24,13 @@ THE SOFTWARE.
 
 
 import six
-from pytools import ImmutableRecord
+from pytools import ImmutableRecord, memoize_on_first_arg
 import sys
 import islpy as isl
-from loopy.diagnostic import warn_with_kernel, LoopyError  # noqa
+from loopy.diagnostic import (  # noqa
+        warn_with_kernel, LoopyError, ScheduleBudgetExceededError)
 
-from pytools.persistent_dict import PersistentDict
+from loopy.caching import LoopyPersistentDict
 from loopy.tools import LoopyKeyBuilder
 from loopy.version import DATA_MODEL_VERSION
 
@@ -403,6 +404,63 @@ def get_priority_tiers(wanted, priorities):
         yield tier
 
 
+def get_loop_entry_priority_tiers(kernel, useful_loops_set, ilp_inames,
+        vec_inames):
+    """Return a list of tiers (iterables) of the inames in *useful_loops_set*,
+    in the order in which the scheduler tries entering them. If a schedule is
+    found in the first tier, then loops in the second are not even tried (and
+    so on).
+    """
+    loop_priority_set = set().union(*[set(prio)
+                                      for prio in
+                                      kernel.loop_priority])
+    useful_and_desired = useful_loops_set & loop_priority_set
+
+    if useful_and_desired:
+        wanted = (
+            useful_and_desired
+            - ilp_inames
+            - vec_inames
+            )
+        priority_tiers = [t for t in
+                          get_priority_tiers(wanted,
+                                             kernel.loop_priority
+                                             )
+                          ]
+
+        # Update the loop priority set, because some constraints may have
+        # have been contradictary.
+        loop_priority_set = set().union(*[set(t) for t in priority_tiers])
+
+        priority_tiers.append(
+                useful_loops_set
+                - loop_priority_set
+                - ilp_inames
+                - vec_inames
+                )
+    else:
+        priority_tiers = [
+                useful_loops_set
+                - ilp_inames
+                - vec_inames
+                ]
+
+    # vectorization must be the absolute innermost loop
+    priority_tiers.extend([
+        [iname]
+        for iname in ilp_inames
+        if iname in useful_loops_set
+        ])
+
+    priority_tiers.extend([
+        [iname]
+        for iname in vec_inames
+        if iname in useful_loops_set
+        ])
+
+    return priority_tiers
+
+
 def sched_item_to_insn_id(sched_item):
     # Helper for use in generator expressions, i.e.
     # (... for insn_id in sched_item_to_insn_id(item) ...)
@@ -488,13 +546,202 @@ def dump_schedule(kernel, schedule):
             for i, line in enumerate(lines))
 
 
+class ScheduleProfile(object):
+    """A record of the work done by the scheduler in finding a schedule.
+    Pass an instance as *profile* to :func:`get_one_scheduled_kernel` or
+    as part of *debug_args* to :func:`generate_loop_schedules` to have it
+    filled in. ``str()`` of an instance gives a human-readable summary.
+
+    .. attribute:: from_cache
+
+        Whether the schedule was retrieved from the cache, in which case
+        all other attributes are zero.
+
+    .. attribute:: used_fast_path
+
+        Whether the schedule was found without a search because all
+        instructions lie in the same loops.
+
+    .. attribute:: reused_schedule_items
+
+        The number of schedule items kept from the schedule passed to
+        :func:`get_one_rescheduled_kernel`.
+
+    .. attribute:: parallel_branches
+
+        The number of branches of the search tree searched in separate
+        processes, see :attr:`loopy.Options.schedule_parallel_workers`.
+        The work done in these processes is not recorded in the other
+        attributes.
+
+    .. attribute:: nodes_visited
+
+        The number of scheduler states examined.
+
+    .. attribute:: successes
+    .. attribute:: dead_ends
+
+    .. attribute:: pruned_dead_ends
+
+        The number of scheduler states not examined because an equivalent
+        state had previously been found to be a dead end.
+
+    .. attribute:: backtracks
+
+        The number of times the search resumed after a dead end.
+
+    .. attribute:: max_backtrack_depth
+
+        The largest number of schedule items discarded in a single backtrack.
+
+    .. attribute:: total_backtrack_depth
+
+    .. attribute:: search_time
+
+        Time (in seconds) spent in the search itself.
+
+    .. attribute:: insert_barriers_time
+    .. attribute:: device_mapping_time
+
+        Time (in seconds) spent in :func:`insert_barriers` and
+        :func:`loopy.schedule.device_mapping.map_schedule_onto_host_or_device`.
+
+    .. attribute:: decision_point_visits
+
+        A :class:`dict` mapping each decision point, i.e. the
+        last item of a partial schedule, formatted as a string, to the number
+        of times the search started from a partial schedule ending in it.
+
+    .. automethod:: hottest_decision_points
+    """
+
+    def __init__(self):
+        self.from_cache = False
+        self.used_fast_path = False
+        self.reused_schedule_items = 0
+        self.parallel_branches = 0
+        self.nodes_visited = 0
+        self.successes = 0
+        self.dead_ends = 0
+        self.pruned_dead_ends = 0
+        self.backtracks = 0
+        self.max_backtrack_depth = 0
+        self.total_backtrack_depth = 0
+        self.search_time = 0
+        self.insert_barriers_time = 0
+        self.device_mapping_time = 0
+        self.decision_point_visits = {}
+
+        self._dead_end_length = None
+
+    def log_node(self, schedule):
+        self.nodes_visited += 1
+
+        if self._dead_end_length is not None:
+            # The parent of this node has a schedule one item shorter.
+            depth = self._dead_end_length - len(schedule) + 1
+            self.backtracks += 1
+            self.total_backtrack_depth += depth
+            self.max_backtrack_depth = max(self.max_backtrack_depth, depth)
+            self._dead_end_length = None
+
+        if schedule:
+            decision_point = _format_sched_item(schedule[-1])
+            self.decision_point_visits[decision_point] = (
+                    self.decision_point_visits.get(decision_point, 0) + 1)
+
+    def log_pruned_dead_end(self, schedule):
+        self.pruned_dead_ends += 1
+
+    def log_success(self, schedule):
+        self.successes += 1
+
+    def log_dead_end(self, schedule):
+        self.dead_ends += 1
+        self._dead_end_length = len(schedule)
+
+    def hottest_decision_points(self, count=10):
+        """Return a list of up to *count* tuples ``(decision_point, visits)``,
+        most visited first. See :attr:`decision_point_visits`.
+        """
+        return sorted(
+                six.iteritems(self.decision_point_visits),
+                key=lambda item: (-item[1], item[0]))[:count]
+
+    def __str__(self):
+        if self.from_cache:
+            return "schedule retrieved from cache"
+
+        lines = [
+                "scheduling: %d nodes visited, %d successes, %d dead ends "
+                "(%d more pruned)"
+                % (self.nodes_visited, self.successes, self.dead_ends,
+                    self.pruned_dead_ends),
+                "backtracks: %d (max depth %d, total depth %d)"
+                % (self.backtracks, self.max_backtrack_depth,
+                    self.total_backtrack_depth),
+                "time: search %.3f s, barrier insertion %.3f s, "
+                "device mapping %.3f s"
+                % (self.search_time, self.insert_barriers_time,
+                    self.device_mapping_time),
+                ]
+
+        if self.used_fast_path:
+            lines.insert(0, "schedule found without search (single loop nest)")
+
+        hottest = self.hottest_decision_points()
+        if hottest:
+            lines.append("hottest decision points:")
+            lines.extend(
+                    "% 8d: %s" % (visits, decision_point)
+                    for decision_point, visits in hottest)
+
+        return "\n".join(lines)
+
+
+def _format_sched_item(sched_item):
+    if isinstance(sched_item, EnterLoop):
+        return "FOR %s" % sched_item.iname
+    elif isinstance(sched_item, LeaveLoop):
+        return "END %s" % sched_item.iname
+    elif isinstance(sched_item, CallKernel):
+        return "CALL KERNEL %s" % sched_item.kernel_name
+    elif isinstance(sched_item, ReturnFromKernel):
+        return "RETURN FROM KERNEL %s" % sched_item.kernel_name
+    elif isinstance(sched_item, RunInstruction):
+        return sched_item.insn_id
+    elif isinstance(sched_item, Barrier):
+        return "---BARRIER:%s---" % sched_item.kind
+    else:
+        raise ValueError("unexpected schedule item type: %s"
+                % type(sched_item).__name__)
+
+
 class ScheduleDebugger:
-    def __init__(self, debug_length=None, interactive=True):
+    def __init__(self, debug_length=None, interactive=True, profile=None,
+            time_limit=None, node_limit=None):
         self.longest_rejected_schedule = []
         self.success_counter = 0
         self.dead_end_counter = 0
+        self.node_counter = 0
         self.debug_length = debug_length
         self.interactive = interactive
+        self.profile = profile
+
+        # See Options.schedule_time_limit and Options.schedule_node_limit.
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+
+        # If set, the search is abandoned at the first dead end.
+        self.greedy = False
+
+        # If set, the search yields a SearchBranch instead of continuing
+        # from states with schedules of this length.
+        self.split_length = None
+
+        # keys (see get_dead_end_key()) of scheduler states from which the
+        # search is known not to find a schedule
+        self.dead_end_keys = set()
 
         self.elapsed_store = 0
         self.start()
@@ -515,16 +762,39 @@ class ScheduleDebugger:
             sys.stdout.flush()
             self.wrote_status = 2
 
+    def log_node(self, schedule):
+        self.node_counter += 1
+        if self.profile is not None:
+            self.profile.log_node(schedule)
+
+        if (
+                (self.node_limit is not None
+                    and self.node_counter > self.node_limit)
+                or (self.time_limit is not None
+                    and self.elapsed_time() > self.time_limit)):
+            raise ScheduleSearchAborted()
+
+    def log_pruned_dead_end(self, schedule):
+        if self.profile is not None:
+            self.profile.log_pruned_dead_end(schedule)
+
     def log_success(self, schedule):
         self.success_counter += 1
+        if self.profile is not None:
+            self.profile.log_success(schedule)
         self.update()
 
     def log_dead_end(self, schedule):
         if len(schedule) > len(self.longest_rejected_schedule):
             self.longest_rejected_schedule = schedule
         self.dead_end_counter += 1
+        if self.profile is not None:
+            self.profile.log_dead_end(schedule)
         self.update()
 
+        if self.greedy:
+            raise ScheduleSearchAborted()
+
     def done_scheduling(self):
         if self.wrote_status:
             sys.stdout.write("\rscheduler finished"+40*" "+"\n")
@@ -550,6 +820,27 @@ class ScheduleDebugger:
 class ScheduleDebugInput(Exception):
     pass
 
+
+class ScheduleSearchAborted(Exception):
+    """Raised by :class:`ScheduleDebugger` to stop the search once it has
+    exceeded its budget or, in greedy mode, reached a dead end.
+    """
+
+
+class SearchBranch(object):
+    """Generated by :func:`generate_loop_schedules_internal` in place of
+    the schedules found from a state whose schedule has reached
+    :attr:`ScheduleDebugger.split_length`, to allow continuing the search
+    from that state elsewhere.
+
+    .. attribute:: sched_state
+    .. attribute:: allow_boost
+    """
+
+    def __init__(self, sched_state, allow_boost):
+        self.sched_state = sched_state
+        self.allow_boost = allow_boost
+
 # }}}
 
 
@@ -642,6 +933,42 @@ class SchedulerState(ImmutableRecord):
         else:
             return None
 
+    def ran_insn_in_last_entered_loop(self):
+        """Return whether an instruction has been scheduled since
+        :attr:`last_entered_loop` was entered.
+        """
+        ignore_count = 0
+        for sched_item in self.schedule[::-1]:
+            if isinstance(sched_item, RunInstruction):
+                return True
+            elif isinstance(sched_item, LeaveLoop):
+                ignore_count += 1
+            elif isinstance(sched_item, EnterLoop):
+                if ignore_count:
+                    ignore_count -= 1
+                else:
+                    return False
+
+        return False
+
+    def get_dead_end_key(self, allow_boost):
+        """Return a hashable key that determines the outcome of the search
+        from this state. If the search from one state does not find a
+        schedule, it will not find one from any state with the same key
+        either.
+        """
+        return (
+                allow_boost,
+                self.active_inames,
+                self.scheduled_insn_ids,
+                len(self.preschedule),
+                self.within_subkernel,
+                self.may_schedule_global_barriers,
+                self.enclosing_subkernel_inames,
+                frozenset(six.iteritems(self.active_group_counts)),
+                self.last_entered_loop is not None
+                and self.ran_insn_in_last_entered_loop())
+
 
 def generate_loop_schedules_internal(
         sched_state, allow_boost=False, debug=None):
@@ -673,6 +1000,41 @@ def generate_loop_schedules_internal(
                 and len(sched_state.schedule) >= debug.debug_length):
             debug_mode = True
 
+    # }}}
+
+    # {{{ skip states known to be dead ends
+
+    # States may be reached along several paths, e.g. by scheduling
+    # independent instructions in a different order. Only done when not
+    # interactively debugging, so that the debugger gets to see all states.
+
+    dead_end_key = None
+
+    if debug is not None and debug.debug_length is None:
+        dead_end_key = sched_state.get_dead_end_key(allow_boost)
+        if dead_end_key in debug.dead_end_keys:
+            debug.log_pruned_dead_end(sched_state.schedule)
+            return
+
+        success_counter_at_entry = debug.success_counter
+
+    def record_if_dead_end():
+        if (dead_end_key is not None
+                and debug.success_counter == success_counter_at_entry):
+            debug.dead_end_keys.add(dead_end_key)
+
+    if debug is not None:
+        debug.log_node(sched_state.schedule)
+
+        if (debug.split_length is not None
+                and len(sched_state.schedule) >= debug.split_length):
+            yield SearchBranch(sched_state, allow_boost)
+            return
+
+    # }}}
+
+    # {{{ print debug information
+
     if debug_mode:
         if debug.wrote_status == 2:
             print()
@@ -926,6 +1288,7 @@ def generate_loop_schedules_internal(
             if not sched_state.group_insn_counts:
                 # No groups: We won't need to backtrack on scheduling
                 # instructions.
+                record_if_dead_end()
                 return
 
     # }}}
@@ -992,26 +1355,10 @@ def generate_loop_schedules_internal(
                     break
 
         if can_leave:
-            can_leave = False
-
             # We may only leave this loop if we've scheduled an instruction
             # since entering it.
 
-            seen_an_insn = False
-            ignore_count = 0
-            for sched_item in sched_state.schedule[::-1]:
-                if isinstance(sched_item, RunInstruction):
-                    seen_an_insn = True
-                elif isinstance(sched_item, LeaveLoop):
-                    ignore_count += 1
-                elif isinstance(sched_item, EnterLoop):
-                    if ignore_count:
-                        ignore_count -= 1
-                    else:
-                        assert sched_item.iname == last_entered_loop
-                        if seen_an_insn:
-                            can_leave = True
-                        break
+            can_leave = sched_state.ran_insn_in_last_entered_loop()
 
             if can_leave and not debug_mode:
 
@@ -1030,6 +1377,7 @@ def generate_loop_schedules_internal(
                         allow_boost=rec_allow_boost, debug=debug):
                     yield sub_sched
 
+                record_if_dead_end()
                 return
 
     # }}}
@@ -1159,62 +1507,12 @@ def generate_loop_schedules_internal(
 
             # }}}
 
-        # {{{ tier building
-
-        # Build priority tiers. If a schedule is found in the first tier, then
-        # loops in the second are not even tried (and so on).
-        loop_priority_set = set().union(*[set(prio)
-                                          for prio in
-                                          sched_state.kernel.loop_priority])
-        useful_loops_set = set(six.iterkeys(iname_to_usefulness))
-        useful_and_desired = useful_loops_set & loop_priority_set
-
-        if useful_and_desired:
-            wanted = (
-                useful_and_desired
-                - sched_state.ilp_inames
-                - sched_state.vec_inames
-                )
-            priority_tiers = [t for t in
-                              get_priority_tiers(wanted,
-                                                 sched_state.kernel.loop_priority
-                                                 )
-                              ]
-
-            # Update the loop priority set, because some constraints may have
-            # have been contradictary.
-            loop_priority_set = set().union(*[set(t) for t in priority_tiers])
-
-            priority_tiers.append(
-                    useful_loops_set
-                    - loop_priority_set
-                    - sched_state.ilp_inames
-                    - sched_state.vec_inames
-                    )
-        else:
-            priority_tiers = [
-                    useful_loops_set
-                    - sched_state.ilp_inames
-                    - sched_state.vec_inames
-                    ]
-
-        # vectorization must be the absolute innermost loop
-        priority_tiers.extend([
-            [iname]
-            for iname in sched_state.ilp_inames
-            if iname in useful_loops_set
-            ])
-
-        priority_tiers.extend([
-            [iname]
-            for iname in sched_state.vec_inames
-            if iname in useful_loops_set
-            ])
-
-        # }}}
+        priority_tiers = get_loop_entry_priority_tiers(
+                sched_state.kernel, set(six.iterkeys(iname_to_usefulness)),
+                sched_state.ilp_inames, sched_state.vec_inames)
 
         if debug_mode:
-            print("useful inames: %s" % ",".join(useful_loops_set))
+            print("useful inames: %s" % ",".join(iname_to_usefulness))
         else:
             for tier in priority_tiers:
                 found_viable_schedule = False
@@ -1290,6 +1588,282 @@ def generate_loop_schedules_internal(
             if debug is not None:
                 debug.log_dead_end(sched_state.schedule)
 
+    record_if_dead_end()
+
+
+def find_single_nest_schedule(sched_state):
+    """If all instructions of the kernel lie within the same loops, return
+    the schedule that :func:`generate_loop_schedules_internal` would find
+    first, computed directly by entering the loops and then sorting the
+    instructions topologically. Otherwise, or if that is not possible (e.g.
+    because the search would fail), return *None*.
+
+    Only applicable to kernels without instruction groups and without a
+    preschedule, starting from an empty schedule.
+    """
+    kernel = sched_state.kernel
+
+    if (
+            sched_state.schedule
+            or sched_state.preschedule
+            or sched_state.group_insn_counts
+            or not kernel.instructions):
+        return None
+
+    loop_inames = None
+    for insn in kernel.instructions:
+        insn_loop_inames = (
+                kernel.insn_inames(insn) - sched_state.parallel_inames)
+        if loop_inames is None:
+            loop_inames = insn_loop_inames
+        elif insn_loop_inames != loop_inames:
+            return None
+
+    if any(sched_state.loop_insn_dep_map.get(iname)
+            for iname in loop_inames):
+        return None
+
+    from islpy import dim_type
+    for iname in loop_inames:
+        iname_home_domain = kernel.domains[kernel.get_home_domain_index(iname)]
+        if (set(iname_home_domain.get_var_names(dim_type.param))
+                & set(kernel.temporary_variables)):
+            return None
+
+    schedule = []
+
+    # {{{ enter loops
+
+    # All instructions use all loops, so all loops are equally useful, and
+    # the search enters the first viable iname in the first priority tier.
+
+    entered_inames = []
+    while len(entered_inames) < len(loop_inames):
+        currently_accessible_inames = (
+                set(entered_inames) | sched_state.parallel_inames)
+        enterable_inames = set(
+                iname
+                for iname in loop_inames - currently_accessible_inames
+                if sched_state.loop_nest_around_map[iname]
+                <= currently_accessible_inames)
+
+        tier = None
+        for tier in get_loop_entry_priority_tiers(
+                kernel, enterable_inames,
+                sched_state.ilp_inames, sched_state.vec_inames):
+            if tier:
+                break
+        else:
+            return None
+
+        iname = max(tier)
+        entered_inames.append(iname)
+        schedule.append(EnterLoop(iname=iname))
+
+    # }}}
+
+    # {{{ sort instructions topologically
+
+    # Among the instructions that are ready, the search schedules the first
+    # one in this order.
+    insn_order = sorted(
+            (insn.id for insn in kernel.instructions),
+            key=lambda insn_id: (kernel.id_to_insn[insn_id].priority, insn_id),
+            reverse=True)
+    insn_id_to_rank = dict(
+            (insn_id, rank) for rank, insn_id in enumerate(insn_order))
+
+    dependents = {}
+    missing_dep_counts = {}
+    ready_ranks = []
+    for insn in kernel.instructions:
+        missing_dep_counts[insn.id] = len(insn.depends_on)
+        for dep_id in insn.depends_on:
+            dependents.setdefault(dep_id, []).append(insn.id)
+        if not insn.depends_on:
+            ready_ranks.append(insn_id_to_rank[insn.id])
+
+    from heapq import heapify, heappop, heappush
+    heapify(ready_ranks)
+
+    while ready_ranks:
+        insn_id = insn_order[heappop(ready_ranks)]
+        schedule.append(RunInstruction(insn_id=insn_id))
+
+        for dependent_id in dependents.get(insn_id, ()):
+            missing_dep_counts[dependent_id] -= 1
+            if not missing_dep_counts[dependent_id]:
+                heappush(ready_ranks, insn_id_to_rank[dependent_id])
+
+    if len(schedule) != len(entered_inames) + len(kernel.instructions):
+        # unsatisfiable dependencies
+        return None
+
+    # }}}
+
+    schedule.extend(
+            LeaveLoop(iname=iname) for iname in reversed(entered_inames))
+
+    return tuple(schedule)
+
+
+def replay_schedule_prefix(sched_state, old_schedule):
+    """Return a copy of the initial scheduler state *sched_state* in which
+    the longest sequence of complete outermost blocks (loops and
+    instructions outside of loops) at the beginning of *old_schedule* that
+    is still a valid start of a schedule for the kernel has already been
+    scheduled.
+
+    *old_schedule* is meant to be the schedule of an earlier version of the
+    kernel, differing from it by a transformation that only affects part of
+    the schedule. Barriers and subkernel boundaries in *old_schedule* are
+    ignored, as they are determined after the search. Instructions that
+    are eliminated from schedules, such as no-ops, are added as needed.
+
+    Only applicable to kernels without instruction groups and without a
+    preschedule. Otherwise, *sched_state* is returned unchanged.
+    """
+    kernel = sched_state.kernel
+
+    if (
+            sched_state.schedule
+            or sched_state.preschedule
+            or sched_state.group_insn_counts):
+        return sched_state
+
+    from loopy.kernel.instruction import NoOpInstruction
+    nop_insn_ids = set(
+            insn.id for insn in kernel.instructions
+            if isinstance(insn, NoOpInstruction))
+
+    all_inames = kernel.all_inames()
+
+    schedule = []
+    scheduled_insn_ids = set()
+    entered_inames = set()
+    active_inames = []
+    # for each active loop, whether it contains an instruction
+    ran_insn_in_loop = []
+
+    def run_insn(insn_id):
+        insn = kernel.id_to_insn.get(insn_id)
+        if insn is None or insn_id in scheduled_insn_ids:
+            return False
+
+        for dep_id in sorted(insn.depends_on - scheduled_insn_ids):
+            if dep_id in nop_insn_ids and not run_insn(dep_id):
+                return False
+
+        if not insn.depends_on <= scheduled_insn_ids:
+            return False
+
+        if (kernel.insn_inames(insn) - sched_state.parallel_inames
+                != set(active_inames)):
+            return False
+
+        schedule.append(RunInstruction(insn_id=insn_id))
+        scheduled_insn_ids.add(insn_id)
+        if ran_insn_in_loop:
+            ran_insn_in_loop[-1] = True
+
+        return True
+
+    def enter_loop(iname):
+        if (
+                iname not in all_inames
+                or iname in sched_state.parallel_inames
+                or iname in active_inames):
+            return False
+
+        currently_accessible_inames = (
+                set(active_inames) | sched_state.parallel_inames)
+        if (
+                not sched_state.loop_nest_around_map[iname]
+                <= currently_accessible_inames):
+            return False
+
+        if (
+                not sched_state.loop_insn_dep_map.get(iname, set())
+                <= scheduled_insn_ids):
+            return False
+
+        from islpy import dim_type
+        iname_home_domain = kernel.domains[kernel.get_home_domain_index(iname)]
+        for domain_par in (
+                set(iname_home_domain.get_var_names(dim_type.param))
+                & set(kernel.temporary_variables)):
+            writer_insn, = kernel.writer_map()[domain_par]
+            if writer_insn not in scheduled_insn_ids:
+                return False
+
+        schedule.append(EnterLoop(iname=iname))
+        entered_inames.add(iname)
+        active_inames.append(iname)
+        ran_insn_in_loop.append(False)
+
+        return True
+
+    def leave_loop(iname):
+        if not active_inames or active_inames[-1] != iname:
+            return False
+
+        if not ran_insn_in_loop[-1]:
+            return False
+
+        if iname not in sched_state.breakable_inames:
+            for insn in kernel.instructions:
+                if (insn.id not in scheduled_insn_ids
+                        and iname in kernel.insn_inames(insn)):
+                    return False
+
+        schedule.append(LeaveLoop(iname=iname))
+        active_inames.pop()
+        ran_insn_in_loop.pop()
+        if ran_insn_in_loop:
+            # the enclosing loop contains the instructions of this one
+            ran_insn_in_loop[-1] = True
+
+        return True
+
+    result = sched_state
+
+    for sched_item in old_schedule:
+        if isinstance(sched_item, (CallKernel, ReturnFromKernel)):
+            continue
+
+        elif isinstance(sched_item, Barrier):
+            if sched_item.originating_insn_id is None:
+                continue
+
+            is_valid = run_insn(sched_item.originating_insn_id)
+
+        elif isinstance(sched_item, RunInstruction):
+            is_valid = run_insn(sched_item.insn_id)
+
+        elif isinstance(sched_item, EnterLoop):
+            is_valid = enter_loop(sched_item.iname)
+
+        elif isinstance(sched_item, LeaveLoop):
+            is_valid = leave_loop(sched_item.iname)
+
+        else:
+            raise ValueError("unexpected schedule item type '%s'"
+                    % type(sched_item).__name__)
+
+        if not is_valid:
+            break
+
+        if not active_inames:
+            # completed an outermost block
+            result = sched_state.copy(
+                    schedule=tuple(schedule),
+                    scheduled_insn_ids=frozenset(scheduled_insn_ids),
+                    unscheduled_insn_ids=(
+                        sched_state.unscheduled_insn_ids - scheduled_insn_ids),
+                    entered_inames=frozenset(entered_inames))
+
+    return result
+
 # }}}
 
 
@@ -1365,6 +1939,202 @@ class DependencyRecord(ImmutableRecord):
                 var_kind=var_kind)
 
 
+def _iter_bits(bitset):
+    """Iterate over the numbers of the set bits in the :class:`int` *bitset*,
+    in ascending order.
+    """
+    # Avoids int.bit_length, which needs Python 2.7.
+    bit_nr = 0
+    while bitset:
+        if not bitset & 0xff:
+            # skip a byte of unset bits at a time
+            bitset >>= 8
+            bit_nr += 8
+            continue
+
+        if bitset & 1:
+            yield bit_nr
+
+        bitset >>= 1
+        bit_nr += 1
+
+
+class _DependencyBitsets(object):
+    """Data about a kernel's instructions used by :class:`DependencyTracker`.
+    Instructions and variables are numbered in the sorted order of their
+    names, so that sets of them can be represented as bitsets (in the form of
+    :class:`int` instances) that are iterated over in sorted order.
+
+    .. attribute:: insn_ids
+    .. attribute:: insn_id_to_number
+    .. attribute:: var_names
+
+    .. attribute:: insn_read_vars
+    .. attribute:: insn_written_vars
+
+        For each instruction, a sorted tuple of the numbers of the relevant
+        variables (and their base storage) it reads/writes.
+
+    .. attribute:: nosync_bitsets
+
+        For each instruction, the set of instructions it need not be
+        synchronized with.
+
+    .. attribute:: reverse_nosync_bitsets
+
+        For each instruction, the set of instructions that need not be
+        synchronized with it.
+
+    .. attribute:: dep_bitsets
+
+        For each instruction, the set of instructions it directly or
+        indirectly depends on or conflicts with.
+
+    .. attribute:: reverse_dep_bitsets
+
+        For each instruction, the set of instructions that directly or
+        indirectly depend on or conflict with it.
+    """
+
+    def __init__(self, kernel, var_kind):
+        if var_kind == "local":
+            relevant_vars = kernel.local_var_names()
+        elif var_kind == "global":
+            relevant_vars = kernel.global_var_names()
+        else:
+            raise ValueError("unknown 'var_kind': %s" % var_kind)
+
+        temp_to_base_storage = kernel.get_temporary_to_base_storage_map()
+
+        def map_to_base_storage(var_names):
+            result = set(var_names)
+
+            for name in var_names:
+                bs = temp_to_base_storage.get(name)
+                if bs is not None:
+                    result.add(bs)
+
+            return result
+
+        self.insn_ids = insn_ids = sorted(kernel.id_to_insn)
+        self.insn_id_to_number = insn_id_to_number = dict(
+                (insn_id, i) for i, insn_id in enumerate(insn_ids))
+        insns = [kernel.id_to_insn[insn_id] for insn_id in insn_ids]
+
+        # {{{ variable accesses
+
+        read_vars = [
+                map_to_base_storage(insn.read_dependency_names() & relevant_vars)
+                for insn in insns]
+        written_vars = [
+                map_to_base_storage(
+                    set(insn.assignee_var_names()) & relevant_vars)
+                for insn in insns]
+
+        self.var_names = sorted(set().union(*(read_vars + written_vars)))
+        var_name_to_number = dict(
+                (var_name, i) for i, var_name in enumerate(self.var_names))
+
+        self.insn_read_vars = [
+                tuple(sorted(var_name_to_number[name] for name in names))
+                for names in read_vars]
+        self.insn_written_vars = [
+                tuple(sorted(var_name_to_number[name] for name in names))
+                for names in written_vars]
+
+        # }}}
+
+        # {{{ nosync sets
+
+        self.nosync_bitsets = [0] * len(insns)
+        self.reverse_nosync_bitsets = [0] * len(insns)
+
+        for i, insn_id in enumerate(insn_ids):
+            for nosync_id in kernel.get_nosync_set(insn_id, scope=var_kind):
+                j = insn_id_to_number.get(nosync_id)
+                if j is not None:
+                    self.nosync_bitsets[i] |= 1 << j
+                    self.reverse_nosync_bitsets[j] |= 1 << i
+
+        # }}}
+
+        # {{{ dependencies
+
+        # Direct dependencies on instructions not in the kernel are ignored.
+        direct_deps = [
+                [insn_id_to_number[dep_id]
+                    for dep_id in insn.depends_on
+                    if dep_id in insn_id_to_number]
+                for insn in insns]
+        direct_dependents = [[] for insn in insns]
+        for i, deps in enumerate(direct_deps):
+            for j in deps:
+                direct_dependents[j].append(i)
+
+        # Instructions in topological order (dependencies first)
+        missing_dep_counts = [len(deps) for deps in direct_deps]
+        topo_order = [i for i, count in enumerate(missing_dep_counts)
+                if not count]
+        for i in topo_order:
+            for j in direct_dependents[i]:
+                missing_dep_counts[j] -= 1
+                if not missing_dep_counts[j]:
+                    topo_order.append(j)
+
+        if len(topo_order) != len(insns):
+            from loopy.diagnostic import LoopyError
+            raise LoopyError("instruction dependencies are cyclic")
+
+        recursive_dep_bitsets = [0] * len(insns)
+        for i in topo_order:
+            for j in direct_deps[i]:
+                recursive_dep_bitsets[i] |= (1 << j) | recursive_dep_bitsets[j]
+
+        recursive_dependent_bitsets = [0] * len(insns)
+        for i in reversed(topo_order):
+            for j in direct_dependents[i]:
+                recursive_dependent_bitsets[i] |= (
+                        (1 << j) | recursive_dependent_bitsets[j])
+
+        # }}}
+
+        # {{{ group conflicts
+
+        group_to_members = {}
+        group_to_conflicting = {}
+        for i, insn in enumerate(insns):
+            for grp in insn.groups:
+                group_to_members[grp] = group_to_members.get(grp, 0) | (1 << i)
+            for grp in insn.conflicts_with_groups:
+                group_to_conflicting[grp] = (
+                        group_to_conflicting.get(grp, 0) | (1 << i))
+
+        conflict_bitsets = []
+        for insn in insns:
+            bitset = 0
+            for grp in insn.conflicts_with_groups:
+                bitset |= group_to_members.get(grp, 0)
+            for grp in insn.groups:
+                bitset |= group_to_conflicting.get(grp, 0)
+            conflict_bitsets.append(bitset)
+
+        # }}}
+
+        self.dep_bitsets = [
+                deps | conflicts
+                for deps, conflicts in zip(
+                    recursive_dep_bitsets, conflict_bitsets)]
+        self.reverse_dep_bitsets = [
+                dependents | conflicts
+                for dependents, conflicts in zip(
+                    recursive_dependent_bitsets, conflict_bitsets)]
+
+
+@memoize_on_first_arg
+def _get_dependency_bitsets(kernel, var_kind):
+    return _DependencyBitsets(kernel, var_kind)
+
+
 class DependencyTracker(object):
     """
     A utility to help track dependencies between originating from a set
@@ -1407,46 +2177,32 @@ class DependencyTracker(object):
         self.reverse = reverse
         self.var_kind = var_kind
 
-        if var_kind == "local":
-            self.relevant_vars = kernel.local_var_names()
-        elif var_kind == "global":
-            self.relevant_vars = kernel.global_var_names()
-        else:
-            raise ValueError("unknown 'var_kind': %s" % var_kind)
-
-        from collections import defaultdict
-        self.writer_map = defaultdict(lambda: set())
-        self.reader_map = defaultdict(lambda: set())
-        self.temp_to_base_storage = kernel.get_temporary_to_base_storage_map()
-
-    def map_to_base_storage(self, var_names):
-        result = set(var_names)
+        self.bitsets = _get_dependency_bitsets(kernel, var_kind)
 
-        for name in var_names:
-            bs = self.temp_to_base_storage.get(name)
-            if bs is not None:
-                result.add(bs)
-
-        return result
+        # map variable numbers to bitsets of source instructions
+        self.writer_map = {}
+        self.reader_map = {}
 
     def discard_all_sources(self):
         self.writer_map.clear()
         self.reader_map.clear()
 
+    def _get_insn_number(self, insn):
+        # *insn* may be an instruction or an instruction ID.
+        return self.bitsets.insn_id_to_number[getattr(insn, "id", insn)]
+
     def add_source(self, source):
         """
         Specify that an instruction may be used as the source of a dependency edge.
         """
-        # If source is an insn ID, look up the actual instruction.
-        source = self.kernel.id_to_insn.get(source, source)
+        i = self._get_insn_number(source)
+        source_bit = 1 << i
 
-        for written in self.map_to_base_storage(
-                set(source.assignee_var_names()) & self.relevant_vars):
-            self.writer_map[written].add(source.id)
+        for var in self.bitsets.insn_written_vars[i]:
+            self.writer_map[var] = self.writer_map.get(var, 0) | source_bit
 
-        for read in self.map_to_base_storage(
-                source.read_dependency_names() & self.relevant_vars):
-            self.reader_map[read].add(source.id)
+        for var in self.bitsets.insn_read_vars[i]:
+            self.reader_map[var] = self.reader_map.get(var, 0) | source_bit
 
     def gen_dependencies_with_target_at(self, target):
         """
@@ -1456,48 +2212,42 @@ class DependencyTracker(object):
         :arg target: The ID of the instruction for which dependencies
             with conflicting var access should be found.
         """
-        # If target is an insn ID, look up the actual instruction.
-        target = self.kernel.id_to_insn.get(target, target)
+        bitsets = self.bitsets
+        i = self._get_insn_number(target)
 
-        tgt_write = self.map_to_base_storage(
-            set(target.assignee_var_names()) & self.relevant_vars)
-        tgt_read = self.map_to_base_storage(
-            target.read_dependency_names() & self.relevant_vars)
+        # sources that may give rise to a dependency
+        if self.reverse:
+            candidates = (
+                    bitsets.reverse_dep_bitsets[i]
+                    & ~bitsets.reverse_nosync_bitsets[i])
+        else:
+            candidates = bitsets.dep_bitsets[i] & ~bitsets.nosync_bitsets[i]
+
+        if not candidates:
+            return
+
+        target_id = bitsets.insn_ids[i]
+        tgt_read = bitsets.insn_read_vars[i]
+        tgt_write = bitsets.insn_written_vars[i]
 
         for (accessed_vars, accessor_map) in [
                 (tgt_read, self.writer_map),
                 (tgt_write, self.reader_map),
                 (tgt_write, self.writer_map)]:
 
-            for dep in self.get_conflicting_accesses(
-                    accessed_vars, accessor_map, target.id):
-                yield dep
-
-    def get_conflicting_accesses(
-            self, accessed_vars, var_to_accessor_map, target):
+            for var in accessed_vars:
+                sources = accessor_map.get(var, 0) & candidates
 
-        def determine_conflict_nature(source, target):
-            if (not self.reverse and source in
-                    self.kernel.get_nosync_set(target, scope=self.var_kind)):
-                return None
-            if (self.reverse and target in
-                    self.kernel.get_nosync_set(source, scope=self.var_kind)):
-                return None
-            return self.describe_dependency(source, target)
+                for j in _iter_bits(sources):
+                    source_id = bitsets.insn_ids[j]
 
-        for var in sorted(accessed_vars):
-            for source in sorted(var_to_accessor_map[var]):
-                dep_descr = determine_conflict_nature(source, target)
-
-                if dep_descr is None:
-                    continue
-
-                yield DependencyRecord(
-                        source=self.kernel.id_to_insn[source],
-                        target=self.kernel.id_to_insn[target],
-                        dep_descr=dep_descr,
-                        variable=var,
-                        var_kind=self.var_kind)
+                    yield DependencyRecord(
+                            source=self.kernel.id_to_insn[source_id],
+                            target=self.kernel.id_to_insn[target_id],
+                            dep_descr=self.describe_dependency(
+                                source_id, target_id),
+                            variable=bitsets.var_names[var],
+                            var_kind=self.var_kind)
 
     def describe_dependency(self, source, target):
         dep_descr = None
@@ -1611,6 +2361,157 @@ def append_barrier_or_raise_error(schedule, dep, verify_only):
             originating_insn_id=None))
 
 
+# {{{ optimal barrier placement in loop bodies
+
+def _get_loop_body_dependency_arcs(kernel, schedule, kind):
+    """Return a list of tuples ``(start, end, dep)``, one for each
+    instruction in the straight-line loop body *schedule* that is the
+    target of a dependency requiring a barrier. *dep* is the
+    :class:`DependencyRecord` for the closest preceding source of such a
+    dependency, possibly in the previous loop iteration.
+
+    The barrier for *dep* may be placed in any of the 'gaps' *start*, ...,
+    *end* (counted modulo ``len(schedule)``), where gap *k* is in front of
+    ``schedule[k]``, and gap 0 also is at the end of the previous loop
+    iteration.
+    """
+    nitems = len(schedule)
+
+    insn_id_to_pos = dict(
+            (sched_item.insn_id, pos)
+            for pos, sched_item in enumerate(schedule)
+            if isinstance(sched_item, RunInstruction))
+
+    fwd_tracker = DependencyTracker(kernel, var_kind=kind, reverse=False)
+    rev_tracker = DependencyTracker(kernel, var_kind=kind, reverse=True)
+    for insn_id in insn_id_to_pos:
+        fwd_tracker.add_source(insn_id)
+        rev_tracker.add_source(insn_id)
+
+    arcs = []
+
+    for tgt_pos, sched_item in enumerate(schedule):
+        if not isinstance(sched_item, RunInstruction):
+            continue
+
+        # the closest sources in the same and in the previous iteration
+        same_iter_dep = None
+        same_iter_pos = -1
+        prev_iter_dep = None
+        prev_iter_pos = -1
+
+        for tracker in [fwd_tracker, rev_tracker]:
+            for dep in tracker.gen_dependencies_with_target_at(
+                    sched_item.insn_id):
+                src_pos = insn_id_to_pos[dep.source.id]
+
+                if src_pos < tgt_pos:
+                    if src_pos > same_iter_pos:
+                        same_iter_dep, same_iter_pos = dep, src_pos
+                elif tracker.reverse:
+                    if src_pos > prev_iter_pos:
+                        prev_iter_dep, prev_iter_pos = dep, src_pos
+
+        # A barrier between a source in the same iteration and the target
+        # also separates the target from all sources in the previous
+        # iteration.
+        if same_iter_dep is not None:
+            arcs.append((same_iter_pos + 1, tgt_pos, same_iter_dep))
+        elif prev_iter_dep is not None:
+            arcs.append(((prev_iter_pos + 1) % nitems, tgt_pos, prev_iter_dep))
+
+    return arcs
+
+
+def _stab_arcs(arcs, fixed_gaps, ngaps):
+    """Return a :class:`dict` mapping each of a minimal number of gaps
+    (in addition to *fixed_gaps*) to the arc (from *arcs*, see
+    :func:`_get_loop_body_dependency_arcs`) that caused a barrier to be
+    placed there, such that each arc contains at least one barrier.
+    """
+    def contains(arc, gap):
+        start, end, _ = arc
+        return (gap - start) % ngaps <= (end - start) % ngaps
+
+    arcs = [arc for arc in arcs
+            if not any(contains(arc, gap) for gap in fixed_gaps)]
+    if not arcs:
+        return {}
+
+    def stab_from(cut):
+        # All arcs not containing *cut* become intervals after cutting the
+        # circle of gaps open at *cut*. For these, placing a barrier at the
+        # end of the earliest-ending interval not yet stabbed is optimal.
+        intervals = sorted(
+                ((arc[0] - cut) % ngaps, (arc[1] - cut) % ngaps, arc)
+                for arc in arcs
+                if not contains(arc, cut))
+
+        result = {}
+        last_barrier = None
+        for start, end, arc in sorted(intervals, key=lambda iv: iv[1]):
+            if last_barrier is None or start > last_barrier:
+                last_barrier = end
+                result[(end + cut) % ngaps] = arc
+
+        return result
+
+    if fixed_gaps:
+        return stab_from(min(fixed_gaps))
+
+    # Some barrier must lie in the shortest arc, so try each of its gaps,
+    # starting from the latest.
+    shortest_arc = min(arcs, key=lambda arc: (arc[1] - arc[0]) % ngaps)
+    start, end, _ = shortest_arc
+
+    best = None
+    for offset in range((end - start) % ngaps + 1):
+        cut = (end - offset) % ngaps
+        candidate = stab_from(cut)
+        candidate[cut] = shortest_arc
+
+        if best is None or len(candidate) < len(best):
+            best = candidate
+
+    return best
+
+
+def insert_barriers_in_loop_body_optimally(kernel, schedule, kind):
+    """Insert the fewest barriers of kind *kind* into the straight-line loop
+    body *schedule* (consisting of :class:`RunInstruction` and
+    :class:`Barrier` items only) that separate all dependencies requiring
+    them, both within a loop iteration and between consecutive ones.
+
+    This places barriers by stabbing the circular arcs between the source
+    and the target of each dependency with the fewest points, whereas
+    :func:`insert_barriers` handles dependencies within an iteration and
+    those between iterations separately, which may lead to more barriers.
+    """
+    nitems = len(schedule)
+
+    fixed_gaps = set(
+            (pos + 1) % nitems
+            for pos, sched_item in enumerate(schedule)
+            if isinstance(sched_item, Barrier)
+            and barrier_kind_more_or_equally_global(sched_item.kind, kind))
+
+    gap_to_arc = _stab_arcs(
+            _get_loop_body_dependency_arcs(kernel, schedule, kind),
+            fixed_gaps, nitems)
+
+    result = []
+    for pos, sched_item in enumerate(schedule):
+        arc = gap_to_arc.get(pos)
+        if arc is not None:
+            append_barrier_or_raise_error(result, arc[2], verify_only=False)
+
+        result.append(sched_item)
+
+    return result
+
+# }}}
+
+
 def insert_barriers(kernel, schedule, kind, verify_only, level=0):
     """
     :arg kind: "local" or "global". The :attr:`Barrier.kind` to be inserted.
@@ -1714,6 +2615,15 @@ def insert_barriers(kernel, schedule, kind, verify_only, level=0):
 
     # }}}
 
+    if (
+            level != 0
+            and not verify_only
+            and kernel.options.optimize_barrier_placement
+            and schedule
+            and all(isinstance(sched_item, (RunInstruction, Barrier))
+                for sched_item in schedule)):
+        return insert_barriers_in_loop_body_optimally(kernel, schedule, kind)
+
     # {{{ recursively insert barriers in loops
 
     result = []
@@ -1754,15 +2664,175 @@ def insert_barriers(kernel, schedule, kind, verify_only, level=0):
 
 # {{{ main scheduling entrypoint
 
-def generate_loop_schedules(kernel, debug_args={}):
+# {{{ parallel schedule search
+
+MAX_SCHEDULE_SPLIT_DEPTH = 10
+
+
+def split_schedule_search(sched_state, allow_boost, nbranches):
+    """Return a list of :class:`SearchBranch` instances for the states at
+    the shallowest depth of the search tree from *sched_state* that has at
+    least *nbranches* of them (or a limited depth), in the order in which
+    the search would visit them. If a complete schedule is found on the
+    way, return a list containing just that schedule instead.
+
+    Only the first viable choice among loops to enter with different
+    priorities is considered, as the search does not consider the
+    others if that one leads to a schedule, so not finding a schedule from
+    any of the branches does not mean that no schedule exists.
+    """
+    branches = []
+
+    for split_length in range(
+            len(sched_state.schedule) + 1,
+            len(sched_state.schedule) + MAX_SCHEDULE_SPLIT_DEPTH + 1):
+        debug = ScheduleDebugger(interactive=False)
+        debug.split_length = split_length
+
+        branches = []
+        for result in generate_loop_schedules_internal(sched_state,
+                allow_boost=allow_boost, debug=debug):
+            if not isinstance(result, SearchBranch):
+                return [result]
+
+            branches.append(result)
+
+        if len(branches) >= nbranches or not branches:
+            break
+
+    return branches
+
+
+class _BranchSearchAborted(object):
+    """Returned by :func:`_search_branch` if the search ran out of budget
+    before finding a schedule or exhausting the branch.
+    """
+
+
+def _search_branch(args):
+    """Search for a schedule from a :class:`SearchBranch`, in a worker
+    process. Return the first schedule found, *None* if the branch does
+    not lead to one, or a :class:`_BranchSearchAborted` instance if the
+    search ran out of budget. *deadline* is an absolute time as returned
+    by :func:`time.time`.
+    """
+    branch, deadline, node_limit = args
+    kernel = branch.sched_state.kernel
+
+    time_limit = None
+    if deadline is not None:
+        from time import time
+        time_limit = deadline - time()
+        if time_limit <= 0:
+            return _BranchSearchAborted()
+
+    debug = ScheduleDebugger(interactive=False,
+            time_limit=time_limit, node_limit=node_limit)
+
+    from pytools import MinRecursionLimit
+    with MinRecursionLimit(max(len(kernel.instructions) * 2,
+                               len(kernel.all_inames()) * 4)):
+        try:
+            for gen_sched in generate_loop_schedules_internal(
+                    branch.sched_state, allow_boost=branch.allow_boost,
+                    debug=debug):
+                return gen_sched
+        except ScheduleSearchAborted:
+            return _BranchSearchAborted()
+
+    return None
+
+
+def search_schedule_in_parallel(sched_state, allow_boost, nworkers, debug):
+    """Split the search for a schedule starting at *sched_state* into
+    branches (see :func:`split_schedule_search`), search them in a pool of
+    *nworkers* processes, and return the schedule found from the first
+    branch (in search order) that leads to one, or *None*. Searches of
+    later branches are cancelled once that schedule is available.
+
+    The branches share what remains of the budget of the
+    :class:`ScheduleDebugger` *debug*. Raise :exc:`ScheduleSearchAborted`
+    if that runs out before the first branch that leads to a schedule is
+    known, including when an earlier branch is cut off by it.
+    """
+    branches = split_schedule_search(sched_state, allow_boost, nworkers)
+
+    if debug.profile is not None:
+        debug.profile.parallel_branches += len(branches)
+
+    if len(branches) == 1 and not isinstance(branches[0], SearchBranch):
+        return branches[0]
+
+    if not branches:
+        return None
+
+    from time import time
+
+    deadline = None
+    if debug.time_limit is not None:
+        deadline = time() + debug.time_limit - debug.elapsed_time()
+
+    node_limit = None
+    if debug.node_limit is not None:
+        node_limit = debug.node_limit - debug.node_counter
+
+    if ((deadline is not None and deadline <= time())
+            or (node_limit is not None and node_limit <= 0)):
+        raise ScheduleSearchAborted()
+
+    kernel = sched_state.kernel
+    logger.debug("%s: searching %d branches in %d processes"
+            % (kernel.name, len(branches), nworkers))
+
+    from multiprocessing import Pool, TimeoutError
+    pool = Pool(min(nworkers, len(branches)))
+
+    try:
+        results = pool.imap(_search_branch, [
+                (branch, deadline, node_limit)
+                for branch in branches])
+
+        for _ in branches:
+            if deadline is None:
+                gen_sched = results.next()
+            else:
+                try:
+                    gen_sched = results.next(max(deadline - time(), 0))
+                except TimeoutError:
+                    raise ScheduleSearchAborted()
+
+            if isinstance(gen_sched, _BranchSearchAborted):
+                # Taking a schedule from a later branch would make the
+                # result depend on timing.
+                raise ScheduleSearchAborted()
+
+            if gen_sched is not None:
+                return gen_sched
+
+    finally:
+        pool.terminate()
+
+    return None
+
+# }}}
+
+
+def generate_loop_schedules(kernel, debug_args={}, old_schedule=None):
+    """
+    :arg old_schedule: If not *None*, the schedule of an earlier version of
+        *kernel*. Complete outermost blocks at its beginning are kept as
+        long as they are still valid, and only the remainder of the
+        schedule is searched for. See :func:`replay_schedule_prefix`.
+    """
     from pytools import MinRecursionLimit
     with MinRecursionLimit(max(len(kernel.instructions) * 2,
                                len(kernel.all_inames()) * 4)):
-        for sched in generate_loop_schedules_inner(kernel, debug_args=debug_args):
+        for sched in generate_loop_schedules_inner(kernel, debug_args=debug_args,
+                old_schedule=old_schedule):
             yield sched
 
 
-def generate_loop_schedules_inner(kernel, debug_args={}):
+def generate_loop_schedules_inner(kernel, debug_args={}, old_schedule=None):
     from loopy.kernel import kernel_state
     if kernel.state not in (kernel_state.PREPROCESSED, kernel_state.SCHEDULED):
         raise LoopyError("cannot schedule a kernel that has not been "
@@ -1773,7 +2843,10 @@ def generate_loop_schedules_inner(kernel, debug_args={}):
 
     schedule_count = 0
 
-    debug = ScheduleDebugger(**debug_args)
+    debug = ScheduleDebugger(
+            time_limit=kernel.options.schedule_time_limit,
+            node_limit=kernel.options.schedule_node_limit,
+            **debug_args)
 
     preschedule = kernel.schedule if kernel.state == kernel_state.SCHEDULED else ()
 
@@ -1838,14 +2911,121 @@ def generate_loop_schedules_inner(kernel, debug_args={}):
 
             uses_of_boostability=[])
 
-    generators = []
-
+    allow_boost_modes = []
     if not kernel.options.ignore_boostable_into:
-        generators.append(generate_loop_schedules_internal(sched_state,
-                             debug=debug, allow_boost=None))
+        allow_boost_modes.append(None)
+    allow_boost_modes.append(False)
+
+    def budget_exceeded_error(msg):
+        longest_schedule = tuple(debug.longest_rejected_schedule)
+        return ScheduleBudgetExceededError(
+                "%s: %s; longest partial schedule:\n%s"
+                % (kernel.name, msg, dump_schedule(kernel, longest_schedule)),
+                longest_partial_schedule=longest_schedule)
+
+    def generate_greedy_schedules():
+        debug.time_limit = None
+        debug.node_limit = None
+        debug.greedy = True
+
+        for allow_boost in allow_boost_modes:
+            try:
+                for gen_sched in generate_loop_schedules_internal(sched_state,
+                        debug=debug, allow_boost=allow_boost):
+                    yield gen_sched
+                    return
+
+            except ScheduleSearchAborted:
+                pass
+
+        raise budget_exceeded_error("scheduling budget exceeded, "
+                "and greedy scheduling failed")
+
+    def search_from(start_sched_state, skip_schedule=None):
+        found_schedule = False
+
+        for allow_boost in allow_boost_modes:
+            for gen_sched in generate_loop_schedules_internal(start_sched_state,
+                    debug=debug, allow_boost=allow_boost):
+                if gen_sched == skip_schedule:
+                    continue
 
-    generators.append(generate_loop_schedules_internal(sched_state,
-                          debug=debug))
+                found_schedule = True
+                yield gen_sched
+
+            # if no-boost mode yielded a viable schedule, stop now
+            if found_schedule:
+                return
+
+    def generate_schedules():
+        found_schedule = False
+
+        try:
+            if old_schedule is not None:
+                resumed_sched_state = replay_schedule_prefix(
+                        sched_state, old_schedule)
+                nreused = len(resumed_sched_state.schedule)
+                logger.debug("%s: reusing %d schedule items"
+                        % (kernel.name, nreused))
+                if debug.profile is not None:
+                    debug.profile.reused_schedule_items = nreused
+
+                if nreused:
+                    for gen_sched in search_from(resumed_sched_state):
+                        found_schedule = True
+                        yield gen_sched
+
+                    if found_schedule:
+                        return
+
+                    logger.debug("%s: no schedule found after reused "
+                            "schedule items, starting over" % kernel.name)
+
+            first_schedule = find_single_nest_schedule(sched_state)
+            if first_schedule is not None:
+                logger.debug("%s: using single loop nest fast path"
+                        % kernel.name)
+                if debug.profile is not None:
+                    debug.profile.used_fast_path = True
+
+            elif (kernel.options.schedule_parallel_workers > 1
+                    and debug.debug_length is None):
+                for allow_boost in allow_boost_modes:
+                    first_schedule = search_schedule_in_parallel(
+                            sched_state, allow_boost,
+                            kernel.options.schedule_parallel_workers, debug)
+                    if first_schedule is not None:
+                        break
+
+                else:
+                    logger.debug("%s: parallel search found no schedule, "
+                            "searching sequentially" % kernel.name)
+
+            if first_schedule is not None:
+                found_schedule = True
+                yield first_schedule
+
+            # Further schedules, if requested, come from the full search.
+
+            for gen_sched in search_from(sched_state,
+                    skip_schedule=first_schedule):
+                found_schedule = True
+                yield gen_sched
+
+        except ScheduleSearchAborted:
+            if found_schedule:
+                # Ran out of budget while looking for further schedules.
+                return
+
+            if kernel.options.no_schedule_fallback:
+                raise budget_exceeded_error("scheduling budget exceeded")
+
+            warn_with_kernel(kernel, "schedule_budget_exceeded",
+                    "scheduling budget exceeded, falling back to "
+                    "greedy scheduling")
+
+            for gen_sched in generate_greedy_schedules():
+                yield gen_sched
 
     def print_longest_dead_end():
         if debug.interactive:
@@ -1863,6 +3043,9 @@ def generate_loop_schedules_inner(kernel, debug_args={}):
             print()
 
             debug.debug_length = len(debug.longest_rejected_schedule)
+            debug.time_limit = None
+            debug.node_limit = None
+            debug.greedy = False
             while True:
                 try:
                     for _ in generate_loop_schedules_internal(sched_state,
@@ -1876,48 +3059,54 @@ def generate_loop_schedules_inner(kernel, debug_args={}):
                 break
 
     try:
-        for gen in generators:
-            for gen_sched in gen:
-                debug.stop()
+        for gen_sched in generate_schedules():
+            debug.stop()
+            if debug.profile is not None:
+                debug.profile.search_time = debug.elapsed_store
 
-                gen_sched = filter_nops_from_schedule(kernel, gen_sched)
-                gen_sched = convert_barrier_instructions_to_barriers(
-                        kernel, gen_sched)
+            gen_sched = filter_nops_from_schedule(kernel, gen_sched)
+            gen_sched = convert_barrier_instructions_to_barriers(
+                    kernel, gen_sched)
 
-                gsize, lsize = kernel.get_grid_size_upper_bounds()
+            gsize, lsize = kernel.get_grid_size_upper_bounds()
 
-                if (gsize or lsize):
-                    if not kernel.options.disable_global_barriers:
-                        logger.debug("%s: barrier insertion: global" % kernel.name)
-                        gen_sched = insert_barriers(kernel, gen_sched,
-                                kind="global", verify_only=True)
+            from time import time
+            start_time = time()
 
-                    logger.debug("%s: barrier insertion: local" % kernel.name)
-                    gen_sched = insert_barriers(kernel, gen_sched, kind="local",
-                            verify_only=False)
-                    logger.debug("%s: barrier insertion: done" % kernel.name)
+            if (gsize or lsize):
+                if not kernel.options.disable_global_barriers:
+                    logger.debug("%s: barrier insertion: global" % kernel.name)
+                    gen_sched = insert_barriers(kernel, gen_sched,
+                            kind="global", verify_only=True)
 
-                new_kernel = kernel.copy(
-                        schedule=gen_sched,
-                        state=kernel_state.SCHEDULED)
+                logger.debug("%s: barrier insertion: local" % kernel.name)
+                gen_sched = insert_barriers(kernel, gen_sched, kind="local",
+                        verify_only=False)
+                logger.debug("%s: barrier insertion: done" % kernel.name)
 
-                from loopy.schedule.device_mapping import \
-                        map_schedule_onto_host_or_device
-                if kernel.state != kernel_state.SCHEDULED:
-                    # Device mapper only gets run once.
-                    new_kernel = map_schedule_onto_host_or_device(new_kernel)
+            if debug.profile is not None:
+                debug.profile.insert_barriers_time += time() - start_time
 
-                from loopy.schedule.tools import add_extra_args_to_schedule
-                new_kernel = add_extra_args_to_schedule(new_kernel)
-                yield new_kernel
+            new_kernel = kernel.copy(
+                    schedule=gen_sched,
+                    state=kernel_state.SCHEDULED)
 
-                debug.start()
+            from loopy.schedule.device_mapping import \
+                    map_schedule_onto_host_or_device
+            if kernel.state != kernel_state.SCHEDULED:
+                # Device mapper only gets run once.
+                start_time = time()
+                new_kernel = map_schedule_onto_host_or_device(new_kernel)
+                if debug.profile is not None:
+                    debug.profile.device_mapping_time += time() - start_time
 
-                schedule_count += 1
+            from loopy.schedule.tools import add_extra_args_to_schedule
+            new_kernel = add_extra_args_to_schedule(new_kernel)
+            yield new_kernel
 
-            # if no-boost mode yielded a viable schedule, stop now
-            if schedule_count:
-                break
+            debug.start()
+
+            schedule_count += 1
 
     except KeyboardInterrupt:
         print()
@@ -1940,11 +3129,72 @@ def generate_loop_schedules_inner(kernel, debug_args={}):
 # }}}
 
 
-schedule_cache = PersistentDict("loopy-schedule-cache-v4-"+DATA_MODEL_VERSION,
+schedule_cache = LoopyPersistentDict("schedule",
+        "loopy-schedule-cache-v4-"+DATA_MODEL_VERSION,
         key_builder=LoopyKeyBuilder())
 
 
-def get_one_scheduled_kernel(kernel):
+def get_one_scheduled_kernel(kernel, profile=None):
+    """
+    :arg profile: If not *None*, a :class:`ScheduleProfile` that is filled
+        in with a record of the work done by the scheduler.
+    """
+    from loopy import CACHING_ENABLED
+    if CACHING_ENABLED and kernel.options.canonicalize_cache_keys:
+        from loopy.tools import call_with_canonical_names
+        return call_with_canonical_names(
+                lambda knl: _get_one_scheduled_kernel_inner(knl, profile),
+                kernel)
+
+    return _get_one_scheduled_kernel_inner(kernel, profile)
+
+
+def get_one_rescheduled_kernel(kernel, old_schedule, profile=None):
+    """Like :func:`get_one_scheduled_kernel`, but reuse as much as possible
+    of *old_schedule*, the schedule of an earlier version of *kernel*,
+    and only search for the part of the schedule invalidated by the
+    changes to the kernel since. This is much cheaper than scheduling from
+    scratch if these changes (such as changing an iname tag or splitting an
+    iname) only affect a small part of the schedule, but may result in a
+    different schedule.
+
+    The result is taken from the schedule cache if present there, but not
+    stored in it.
+
+    :arg old_schedule: A sequence of schedule items, e.g. the
+        :attr:`loopy.LoopKernel.schedule` of a scheduled kernel.
+    :arg profile: If not *None*, a :class:`ScheduleProfile` that is filled
+        in with a record of the work done by the scheduler.
+    """
+    from loopy import CACHING_ENABLED
+
+    if CACHING_ENABLED:
+        try:
+            result = schedule_cache[kernel]
+        except KeyError:
+            pass
+        else:
+            logger.debug("%s: schedule cache hit" % kernel.name)
+            if profile is not None:
+                profile.from_cache = True
+            return result
+
+    from time import time
+    start_time = time()
+
+    logger.info("%s: rescheduling start" % kernel.name)
+
+    result = next(iter(generate_loop_schedules(kernel,
+            debug_args=dict(profile=profile),
+            old_schedule=old_schedule)))
+
+    logger.info("%s: rescheduling done after %.2f s" % (
+        kernel.name, time()-start_time))
+
+    return result
+
+
+def _get_one_scheduled_kernel_inner(kernel, profile=None):
     from loopy import CACHING_ENABLED
 
     sched_cache_key = kernel
@@ -1959,13 +3209,27 @@ def get_one_scheduled_kernel(kernel):
         except KeyError:
             pass
 
+    if profile is not None:
+        profile.from_cache = from_cache
+
     if not from_cache:
         from time import time
         start_time = time()
 
         logger.info("%s: schedule start" % kernel.name)
 
-        result = next(iter(generate_loop_schedules(kernel)))
+        schedules = generate_loop_schedules(kernel,
+                debug_args=dict(profile=profile))
+
+        if kernel.options.schedule_candidates > 1:
+            from itertools import islice
+            from loopy.schedule.tools import get_schedule_cost
+            # min() keeps the first of equally cheap schedules.
+            result = min(
+                    islice(schedules, kernel.options.schedule_candidates),
+                    key=get_schedule_cost)
+        else:
+            result = next(iter(schedules))
 
         logger.info("%s: scheduling done after %.2f s" % (
             kernel.name, time()-start_time))
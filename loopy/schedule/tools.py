@@ -48,6 +48,53 @@ def get_block_boundaries(schedule):
 # }}}
 
 
+# {{{ schedule cost estimate
+
+# The trip count assumed for every loop by get_schedule_cost().
+NOMINAL_LOOP_TRIP_COUNT = 64
+
+
+def get_schedule_cost(kernel):
+    """Return a rough estimate of the cost of executing the schedule of
+    *kernel*, for choosing between several schedules of the same kernel.
+    Smaller is better.
+
+    The estimate is a tuple of
+
+    * the number of synchronization events (barriers and kernel launches)
+      per thread, counted as by :func:`loopy.get_synchronization_map` but
+      assuming that each loop has :data:`NOMINAL_LOOP_TRIP_COUNT` iterations,
+    * the number of barriers in the schedule, and
+    * the number of loop entries, counted in the same way as the
+      synchronization events.
+    """
+    from loopy.schedule import (
+            EnterLoop, LeaveLoop, Barrier, CallKernel)
+
+    sync_events = 0
+    barriers = 0
+    loop_entries = 0
+
+    # the number of times the current schedule item is executed
+    multiplicity = 1
+
+    for sched_item in kernel.schedule:
+        if isinstance(sched_item, EnterLoop):
+            loop_entries += multiplicity
+            multiplicity *= NOMINAL_LOOP_TRIP_COUNT
+        elif isinstance(sched_item, LeaveLoop):
+            multiplicity //= NOMINAL_LOOP_TRIP_COUNT
+        elif isinstance(sched_item, Barrier):
+            barriers += 1
+            sync_events += multiplicity
+        elif isinstance(sched_item, CallKernel):
+            sync_events += multiplicity
+
+    return (sync_events, barriers, loop_entries)
+
+# }}}
+
+
 # {{{ subkernel tools
 
 def temporaries_read_in_subkernel(kernel, subkernel):
@@ -45,6 +45,7 @@ __doc__ = """
 .. autofunction:: get_op_map
 .. autofunction:: get_mem_access_map
 .. autofunction:: get_synchronization_map
+.. autofunction:: get_barrier_placement_stats
 
 .. autofunction:: gather_access_footprints
 .. autofunction:: gather_access_footprint_bytes
@@ -1433,6 +1434,46 @@ def get_synchronization_map(knl):
 # }}}
 
 
+# {{{ get_barrier_placement_stats
+
+def get_barrier_placement_stats(knl):
+    """Compare the number of barriers each thread encounters in *knl*
+    with and without :attr:`loopy.Options.optimize_barrier_placement`.
+
+    :arg knl: A :class:`loopy.LoopKernel` that has not been scheduled yet.
+
+    :return: A tuple ``(default_sync_map, optimized_sync_map)`` of
+            :class:`ToCountMap` instances as returned by
+            :func:`get_synchronization_map`, restricted to the keys
+            ``barrier_local`` and ``barrier_global``.
+
+    Example usage::
+
+        default_map, optimized_map = get_barrier_placement_stats(knl)
+        params = {'n': 512}
+        saved = (
+                default_map.eval_and_sum(params)
+                - optimized_map.eval_and_sum(params))
+
+    """
+
+    if knl.schedule is not None:
+        raise LoopyError("get_barrier_placement_stats requires an "
+                "unscheduled kernel")
+
+    def get_barrier_map(optimize_barrier_placement):
+        sync_map = get_synchronization_map(
+                knl.copy(options=knl.options.copy(
+                    optimize_barrier_placement=optimize_barrier_placement)))
+
+        return sync_map.filter_by_func(
+                lambda key: key.startswith("barrier_"))
+
+    return get_barrier_map(False), get_barrier_map(True)
+
+# }}}
+
+
 # {{{ gather_access_footprints
 
 def gather_access_footprints(kernel, ignore_uncountable=False):
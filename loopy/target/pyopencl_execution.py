@@ -33,6 +33,9 @@ from pytools.py_codegen import (
 from loopy.diagnostic import LoopyError
 from loopy.types import NumpyType
 from loopy.execution import KernelExecutorBase
+from loopy.caching import LoopyPersistentDict
+from loopy.tools import LoopyKeyBuilder
+from loopy.version import DATA_MODEL_VERSION
 
 import logging
 logger = logging.getLogger(__name__)
@@ -615,6 +618,73 @@ class _CLKernelInfo(ImmutableRecord):
     pass
 
 
+# {{{ program binary cache
+
+cl_program_binary_cache = LoopyPersistentDict("cl-program-binary",
+        "loopy-cl-program-binary-cache-v1-"+DATA_MODEL_VERSION,
+        key_builder=LoopyKeyBuilder())
+
+
+def _get_device_identity(device):
+    """Return a tuple identifying the implementation compiling code for
+    *device*, for use in the key of :data:`cl_program_binary_cache`.
+    """
+    platform = device.platform
+
+    return (
+            platform.name, platform.vendor, platform.version,
+            device.name, device.vendor, device.version, device.driver_version,
+            int(device.type))
+
+
+def build_cl_program(context, source, options=None):
+    """Return a built :class:`pyopencl.Program` for *source*. Program binaries
+    are stored in and, if possible, retrieved from :mod:`loopy`'s
+    ``"cl-program-binary"`` cache, keyed on *source*, the build *options*,
+    and the identity of the devices in *context*.
+    """
+    import pyopencl as cl
+    from loopy import CACHING_ENABLED
+
+    devices = context.devices
+
+    if options is None:
+        options = []
+    elif isinstance(options, six.string_types):
+        options = options.split()
+
+    cache_key = (source, tuple(options),
+            tuple(_get_device_identity(dev) for dev in devices))
+
+    if CACHING_ENABLED:
+        try:
+            binaries = cl_program_binary_cache[cache_key]
+        except KeyError:
+            pass
+        else:
+            try:
+                return (
+                        cl.Program(context, devices, binaries)
+                        .build(options=options))
+            except cl.Error as e:
+                # e.g. a driver update that the device identity does not
+                # capture
+                logger.warning("building from cached program binary failed, "
+                        "rebuilding from source: %s" % e)
+
+    program = cl.Program(context, source).build(options=options)
+
+    if CACHING_ENABLED:
+        binaries = program.get_info(cl.program_info.BINARIES)
+        if all(binaries):
+            cl_program_binary_cache[cache_key] = [
+                    bytes(binary) for binary in binaries]
+
+    return program
+
+# }}}
+
+
 class _CLKernels(object):
     pass
 
@@ -668,11 +738,8 @@ class PyOpenCLKernelExecutor(KernelExecutorBase):
             from pytools import invoke_editor
             dev_code = invoke_editor(dev_code, "code.cl")
 
-        import pyopencl as cl
-
-        cl_program = (
-                cl.Program(self.context, dev_code)
-                .build(options=kernel.options.cl_build_options))
+        cl_program = build_cl_program(self.context, dev_code,
+                options=kernel.options.cl_build_options)
 
         cl_kernels = _CLKernels()
         for dp in codegen_result.device_programs:
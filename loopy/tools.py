@@ -24,6 +24,7 @@ THE SOFTWARE.
 """
 
 import collections
+import re
 import numpy as np
 from pytools.persistent_dict import KeyBuilder as KeyBuilderBase
 from loopy.symbolic import WalkMapper as LoopyWalkMapper
@@ -32,6 +33,9 @@ from pymbolic.mapper.persistent_hash import (
 import six  # noqa
 from six.moves import intern
 
+import logging
+logger = logging.getLogger(__name__)
+
 
 if six.PY2:
     def is_integer(obj):
@@ -97,6 +101,66 @@ class LoopyKeyBuilder(KeyBuilderBase):
             PersistentHashWalkMapper(key_hash)(key)
 
 
+def update_persistent_hash_from_field_digests(obj, key_hash, key_builder,
+        field_names, update_for_field):
+    """Update *key_hash* with a digest for each of the fields *field_names* of
+    *obj*, in order. The digest of each field is computed by calling
+    ``update_for_field(field_hash, key_builder, field_name)`` and is cached
+    on *obj*, so that copies made by :func:`copy_field_hash_digests` only
+    need to hash the fields that changed.
+
+    This relies on *obj* being immutable.
+    """
+    try:
+        field_digests = obj._field_hash_digests
+    except AttributeError:
+        field_digests = obj._field_hash_digests = {}
+
+    from pytools.persistent_dict import new_hash
+    for field_name in field_names:
+        try:
+            digest = field_digests[field_name]
+        except KeyError:
+            field_hash = new_hash()
+            update_for_field(field_hash, key_builder, field_name)
+            digest = field_digests[field_name] = field_hash.digest()
+
+        key_hash.update(digest)
+
+
+def _is_same_field_value(a, b):
+    if a is b:
+        return True
+
+    # Lists are frequently rebuilt from the same elements, e.g. by
+    # LoopKernel.__init__ when uniquifying instruction ids.
+    return (
+            type(a) is type(b)
+            and isinstance(a, (list, tuple))
+            and len(a) == len(b)
+            and all(a_i is b_i for a_i, b_i in zip(a, b)))
+
+
+def copy_field_hash_digests(source, target, field_names):
+    """Transfer the field digests cached on *source* by
+    :func:`update_persistent_hash_from_field_digests` to *target*, for those
+    of *field_names* whose value is the identical object in both (or a list
+    or tuple of identical objects).
+    """
+    try:
+        field_digests = source._field_hash_digests
+    except AttributeError:
+        return
+
+    target._field_hash_digests = dict(
+            (field_name, digest)
+            for field_name, digest in six.iteritems(field_digests)
+            if field_name in field_names
+            and _is_same_field_value(
+                getattr(target, field_name, None),
+                getattr(source, field_name)))
+
+
 class PymbolicExpressionHashWrapper(object):
     def __init__(self, expression):
         self.expression = expression
@@ -114,6 +178,217 @@ class PymbolicExpressionHashWrapper(object):
 # }}}
 
 
+# {{{ canonical names
+
+_CANONICAL_NAME_PREFIX = "_lpy_c_"
+_CANONICAL_NAME_RE = re.compile(r"%s(?:insn|i|t)[0-9]+" % _CANONICAL_NAME_PREFIX)
+
+
+class _OrderedVariableCollector(LoopyWalkMapper):
+    def __init__(self):
+        self.names = []
+
+    def map_variable(self, expr, *args):
+        self.names.append(expr.name)
+
+    map_tagged_variable = map_variable
+
+    def map_reduction(self, expr, *args):
+        self.names.extend(expr.inames)
+        self.rec(expr.expr, *args)
+
+
+class CanonicalNames(object):
+    """The result of renaming the inames, temporary variables and
+    instruction ids of a kernel to names that only depend on the kernel's
+    structure. See :func:`get_canonical_names`.
+
+    .. attribute:: kernel
+
+        The renamed kernel.
+
+    .. attribute:: var_renames
+
+        A mapping from the original inames and temporary variable names
+        to their canonical counterparts.
+
+    .. attribute:: insn_id_renames
+
+        A mapping from the original instruction ids to their canonical
+        counterparts.
+
+    .. automethod:: restore
+    """
+
+    def __init__(self, kernel, var_renames, insn_id_renames):
+        self.kernel = kernel
+        self.var_renames = var_renames
+        self.insn_id_renames = insn_id_renames
+
+    def restore(self, kernel):
+        """Return a copy of *kernel*, which was derived from :attr:`kernel`,
+        in which the canonical names are replaced with the original ones.
+        Names introduced in the course of the derivation that were built from
+        canonical names (such as ``acc_<iname>``) are rebuilt from the
+        original names. Return *None* if this results in a name clash.
+        """
+        inverse_var_renames = dict(
+                (canonical_name, name)
+                for name, canonical_name in six.iteritems(self.var_renames))
+        inverse_insn_id_renames = dict(
+                (canonical_id, insn_id)
+                for insn_id, canonical_id in six.iteritems(self.insn_id_renames))
+
+        def restore_name(name):
+            def restore_canonical_name(match):
+                canonical_name = match.group(0)
+                return inverse_var_renames.get(canonical_name,
+                        inverse_insn_id_renames.get(
+                            canonical_name, canonical_name))
+
+            return _CANONICAL_NAME_RE.sub(restore_canonical_name, name)
+
+        var_names = kernel.all_inames() | set(kernel.temporary_variables)
+        var_restores = dict(inverse_var_renames)
+        for name in var_names:
+            if name not in var_restores and _CANONICAL_NAME_PREFIX in name:
+                var_restores[name] = restore_name(name)
+
+        insn_ids = [insn.id for insn in kernel.instructions]
+        insn_id_restores = dict(inverse_insn_id_renames)
+        for insn_id in insn_ids:
+            if (insn_id not in insn_id_restores
+                    and _CANONICAL_NAME_PREFIX in insn_id):
+                insn_id_restores[insn_id] = restore_name(insn_id)
+
+        # {{{ check for clashes
+
+        restored_var_names = set(
+                var_restores.get(name, name) for name in var_names)
+        if (len(restored_var_names) != len(var_names)
+                or restored_var_names & (
+                    kernel.all_variable_names() - var_names)):
+            return None
+
+        if len(set(
+                insn_id_restores.get(insn_id, insn_id)
+                for insn_id in insn_ids)) != len(insn_ids):
+            return None
+
+        # }}}
+
+        from loopy.kernel.tools import rename_identifiers
+        return rename_identifiers(kernel, var_restores, insn_id_restores)
+
+
+def _get_canonical_names_uncached(kernel):
+    from loopy.kernel.instruction import CInstruction, MultiAssignmentBase
+
+    if kernel.overridden_get_grid_sizes_for_insn_ids is not None:
+        return None
+
+    if any(isinstance(insn, CInstruction) for insn in kernel.instructions):
+        return None
+
+    # {{{ collect names in an order determined by the kernel's structure
+
+    from islpy import dim_type
+    inames = []
+    for dom in kernel.domains:
+        inames.extend(dom.get_var_names(dim_type.set))
+
+    # Inames that were rewritten by transformations are no longer in the
+    # domains, but remain in the record of applied rewrites.
+    for rewrites in kernel.applied_iname_rewrites:
+        for iname in sorted(str(iname) for iname in rewrites):
+            if iname not in inames:
+                inames.append(iname)
+
+    collector = _OrderedVariableCollector()
+    for insn in kernel.instructions:
+        if isinstance(insn, MultiAssignmentBase):
+            for assignee in insn.assignees:
+                collector(assignee)
+            collector(insn.expression)
+
+        for pred in sorted(insn.predicates, key=str):
+            collector(pred)
+
+    temp_var_names = []
+    seen_temp_var_names = set()
+    for name in collector.names:
+        if (name in kernel.temporary_variables
+                and name not in seen_temp_var_names):
+            temp_var_names.append(name)
+            seen_temp_var_names.add(name)
+
+    temp_var_names.extend(sorted(
+            set(kernel.temporary_variables) - seen_temp_var_names))
+
+    # }}}
+
+    var_renames = {}
+    for i, iname in enumerate(inames):
+        var_renames[iname] = "%si%d" % (_CANONICAL_NAME_PREFIX, i)
+    for i, name in enumerate(temp_var_names):
+        var_renames[name] = "%st%d" % (_CANONICAL_NAME_PREFIX, i)
+
+    insn_id_renames = dict(
+            (insn.id, "%sinsn%d" % (_CANONICAL_NAME_PREFIX, i))
+            for i, insn in enumerate(kernel.instructions))
+
+    if any(name.startswith(_CANONICAL_NAME_PREFIX)
+            for name in kernel.all_variable_names() - set(var_renames)):
+        return None
+
+    from loopy.kernel.tools import rename_identifiers
+    return CanonicalNames(
+            rename_identifiers(kernel, var_renames, insn_id_renames),
+            var_renames, insn_id_renames)
+
+
+def get_canonical_names(kernel):
+    """Return a :class:`CanonicalNames` instance for *kernel*, or *None* if
+    *kernel* cannot be canonicalized, e.g. because it contains a
+    :class:`loopy.CInstruction`.
+
+    Two kernels that only differ by a consistent renaming of their inames,
+    temporary variables and instruction ids have equal canonical kernels.
+    """
+    try:
+        return kernel._canonical_names
+    except AttributeError:
+        pass
+
+    result = _get_canonical_names_uncached(kernel)
+
+    # Kernels are immutable, so this may be stored on the kernel.
+    kernel._canonical_names = result
+    return result
+
+
+def call_with_canonical_names(func, kernel):
+    """Return the result of applying *func* to the canonical form of
+    *kernel* (see :func:`get_canonical_names`), with the original names
+    restored in it. Falls back to ``func(kernel)`` if that is not possible.
+
+    *func* must map a kernel to a kernel.
+    """
+    canonical_names = get_canonical_names(kernel)
+    if canonical_names is None:
+        return func(kernel)
+
+    result = canonical_names.restore(func(canonical_names.kernel))
+    if result is None:
+        logger.debug("%s: name clash while restoring names from "
+                "canonical form" % kernel.name)
+        return func(kernel)
+
+    return result
+
+# }}}
+
+
 # {{{ remove common indentation
 
 def remove_common_indentation(code, require_leading_newline=True,
@@ -34,6 +34,9 @@ from loopy.symbolic import (
         SubstitutionRuleMappingContext)
 from loopy.diagnostic import LoopyError
 
+import logging
+logger = logging.getLogger(__name__)
+
 
 __doc__ = """
 .. currentmodule:: loopy
@@ -54,6 +57,8 @@ __doc__ = """
 
 .. autofunction:: prioritize_loops
 
+.. autofunction:: prioritize_loops_by_stride
+
 .. autofunction:: rename_iname
 
 .. autofunction:: remove_unused_inames
@@ -112,6 +117,28 @@ def prioritize_loops(kernel, loop_priority):
 
     return kernel.copy(loop_priority=kernel.loop_priority.union([loop_priority]))
 
+
+def prioritize_loops_by_stride(kernel):
+    """Add loop priorities that nest the sequential loops around each
+    instruction such that loops accessing memory with smaller strides are
+    further inside, as found by
+    :func:`loopy.kernel.tools.infer_loop_priorities_by_stride`. Inames
+    that already have a priority are not affected.
+
+    The priorities are logged at level :data:`logging.INFO`. To inspect
+    them, compare the :attr:`loopy.LoopKernel.loop_priority` of the result
+    with that of *kernel*.
+    """
+    from loopy.kernel.tools import infer_loop_priorities_by_stride
+    loop_priority = infer_loop_priorities_by_stride(kernel)
+
+    logger.info("%s: inferred loop priorities: %s" % (
+        kernel.name,
+        "; ".join(sorted(", ".join(priority) for priority in loop_priority))
+        or "(none)"))
+
+    return kernel.copy(loop_priority=kernel.loop_priority | loop_priority)
+
 # }}}
 
 
@@ -405,7 +405,16 @@ class TypeInferenceMapper(CombineMapper):
 
 # {{{ infer single variable
 
-def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander):
+def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander,
+        insn_type_cache=None):
+    """
+    :arg insn_type_cache: If not *None*, a :class:`dict` mapping instruction
+        ids to the types of their right-hand sides, along with the symbols
+        with unknown types encountered in determining them. Types for
+        instructions not in the mapping are determined and added. Entries
+        must be removed once the type of any variable read by the
+        instruction changes.
+    """
     if var_name in kernel.all_params():
         return [kernel.index_dtype], []
 
@@ -413,24 +422,42 @@ def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander):
     debug = partial(_debug, kernel)
 
     dtype_sets = []
+    symbols_with_unknown_types = set()
 
     import loopy as lp
 
-    type_inf_mapper = type_inf_mapper.copy()
+    def get_expr_type(writer_insn, **kwargs):
+        if insn_type_cache is not None:
+            try:
+                return insn_type_cache[writer_insn.id]
+            except KeyError:
+                pass
+
+        expr = subst_expander(writer_insn.expression)
+        debug("             via expr %s", expr)
+
+        insn_type_inf_mapper = type_inf_mapper.copy()
+        result = (
+                insn_type_inf_mapper(expr, return_dtype_set=True, **kwargs),
+                insn_type_inf_mapper.symbols_with_unknown_types)
+
+        if insn_type_cache is not None:
+            insn_type_cache[writer_insn.id] = result
+
+        return result
 
     for writer_insn_id in kernel.writer_map().get(var_name, []):
         writer_insn = kernel.id_to_insn[writer_insn_id]
         if not isinstance(writer_insn, lp.MultiAssignmentBase):
             continue
 
-        expr = subst_expander(writer_insn.expression)
-
-        debug("             via expr %s", expr)
         if isinstance(writer_insn, lp.Assignment):
-            result = type_inf_mapper(expr, return_dtype_set=True)
+            result, insn_symbols_with_unknown_types = get_expr_type(writer_insn)
+            symbols_with_unknown_types.update(insn_symbols_with_unknown_types)
         elif isinstance(writer_insn, lp.CallInstruction):
-            return_dtype_set = type_inf_mapper(expr, return_tuple=True,
-                    return_dtype_set=True)
+            return_dtype_set, insn_symbols_with_unknown_types = get_expr_type(
+                    writer_insn, return_tuple=True)
+            symbols_with_unknown_types.update(insn_symbols_with_unknown_types)
 
             result = []
             for return_dtype_set in return_dtype_set:
@@ -452,11 +479,11 @@ def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander):
         dtype_sets.append(result)
 
     if not dtype_sets:
-        return None, type_inf_mapper.symbols_with_unknown_types
+        return None, symbols_with_unknown_types
 
     result = type_inf_mapper.combine(dtype_sets)
 
-    return result, type_inf_mapper.symbols_with_unknown_types
+    return result, symbols_with_unknown_types
 
 # }}}
 
@@ -523,12 +550,14 @@ def infer_unknown_types(kernel, expect_completion=False):
 
     writer_map = kernel.writer_map()
 
+    names_for_type_inference_set = frozenset(names_for_type_inference)
+
     dep_graph = dict(
             (written_var, set(
                 read_var
                 for insn_id in writer_map.get(written_var, [])
                 for read_var in kernel.id_to_insn[insn_id].read_dependency_names()
-                if read_var in names_for_type_inference))
+                if read_var in names_for_type_inference_set))
             for written_var in names_for_type_inference)
 
     from loopy.tools import compute_sccs
@@ -550,84 +579,90 @@ def infer_unknown_types(kernel, expect_completion=False):
 
     # {{{ work on type inference queue
 
+    from collections import deque
     from loopy.kernel.data import TemporaryVariable, KernelArgument
 
+    # maps variables to the variables whose type depends on them
+    type_dependents = dict((name, set()) for name in names_for_type_inference)
+    for written_var, read_vars in six.iteritems(dep_graph):
+        for read_var in read_vars:
+            type_dependents[read_var].add(written_var)
+
+    reader_map = kernel.reader_map()
+    insn_type_cache = {}
+
     for var_chain in sccs:
-        changed_during_last_queue_run = False
-        queue = var_chain[:]
-        failed_names = set()
-
-        while queue or changed_during_last_queue_run:
-            if not queue and changed_during_last_queue_run:
-                changed_during_last_queue_run = False
-                # Optimization: If there's a single variable in the SCC without
-                # a self-referential dependency, then the type is known after a
-                # single iteration (we don't need to look at the expressions
-                # again).
-                if len(var_chain) == 1:
-                    single_var, = var_chain
-                    if single_var not in dep_graph[single_var]:
-                        break
-                queue = var_chain[:]
+        scc = set(var_chain)
+
+        # A worklist: Variables only need to be (re)visited if the types of
+        # variables they depend on have changed since they were last
+        # visited.
+        queue = deque(var_chain)
+        queued = set(var_chain)
+
+        # maps names whose types could not be determined on their last
+        # visit to the symbols with unknown types encountered
+        failed_names = {}
 
-            name = queue.pop(0)
+        while queue:
+            name = queue.popleft()
+            queued.remove(name)
             item = item_lookup[name]
 
             debug("inferring type for %s %s", type(item).__name__, item.name)
 
             result, symbols_with_unavailable_types = (
                     _infer_var_type(
-                            kernel, item.name, type_inf_mapper, subst_expander))
-
-            failed = not result
-            if not failed:
-                new_dtype, = result
-                debug("     success: %s", new_dtype)
-                if new_dtype != item.dtype:
-                    debug("     changed from: %s", item.dtype)
-                    changed_during_last_queue_run = True
-
-                    if isinstance(item, TemporaryVariable):
-                        new_temp_vars[name] = item.copy(dtype=new_dtype)
-                    elif isinstance(item, KernelArgument):
-                        new_arg_dict[name] = item.copy(dtype=new_dtype)
-                    else:
-                        raise LoopyError("unexpected item type in type inference")
-            else:
+                            kernel, item.name, type_inf_mapper, subst_expander,
+                            insn_type_cache))
+
+            if not result:
                 debug("     failure")
+                # Will be revisited once the types it depends on change.
+                failed_names[name] = symbols_with_unavailable_types
+                continue
 
-            if failed:
-                if item.name in failed_names:
-                    # this item has failed before, give up.
-                    advice = ""
-                    if symbols_with_unavailable_types:
-                        advice += (
-                                " (need type of '%s'--check for missing arguments)"
-                                % ", ".join(symbols_with_unavailable_types))
-
-                    if expect_completion:
-                        raise LoopyError(
-                                "could not determine type of '%s'%s"
-                                % (item.name, advice))
-
-                    else:
-                        # We're done here.
-                        break
+            failed_names.pop(name, None)
 
-                # remember that this item failed
-                failed_names.add(item.name)
+            new_dtype, = result
+            debug("     success: %s", new_dtype)
+            if new_dtype == item.dtype:
+                continue
 
-                if set(queue) == failed_names:
-                    # We did what we could...
-                    print(queue, failed_names, item.name)
-                    assert not expect_completion
-                    break
+            debug("     changed from: %s", item.dtype)
 
-                # can't infer type yet, put back into queue
-                queue.append(name)
+            if isinstance(item, TemporaryVariable):
+                new_temp_vars[name] = item.copy(dtype=new_dtype)
+            elif isinstance(item, KernelArgument):
+                new_arg_dict[name] = item.copy(dtype=new_dtype)
             else:
-                # we've made progress, reset failure markers
-                failed_names = set()
+                raise LoopyError("unexpected item type in type inference")
+
+            # Types of expressions reading this variable are now outdated.
+            for insn_id in reader_map.get(name, ()):
+                insn_type_cache.pop(insn_id, None)
+
+            for dependent in type_dependents[name] & scc:
+                if dependent not in queued:
+                    queue.append(dependent)
+                    queued.add(dependent)
+
+        if failed_names:
+            if expect_completion:
+                name, symbols_with_unavailable_types = min(
+                        six.iteritems(failed_names))
+
+                advice = ""
+                if symbols_with_unavailable_types:
+                    advice += (
+                            " (need type of '%s'--check for missing arguments)"
+                            % ", ".join(symbols_with_unavailable_types))
+
+                raise LoopyError(
+                        "could not determine type of '%s'%s"
+                        % (name, advice))
+
+            # We did what we could...
 
     # }}}
 
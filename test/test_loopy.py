@@ -124,6 +124,23 @@ def test_type_inference_with_type_dependencies():
     assert knl.temporary_variables["d"].dtype == to_loopy_type(np.complex128)
 
 
+def test_type_inference_along_cyclic_chain():
+    # The type of t0 changes only after the type has been propagated along
+    # the whole chain, which then needs to be updated.
+    n = 50
+    insns = ["<>t0 = 0"]
+    insns.extend("<>t%d = t%d" % (k, k-1) for k in range(1, n))
+    insns.append("t0 = t0 + t%d + 1.0" % (n-1))
+
+    knl = lp.make_kernel("{[i]: i=0}", "\n".join(insns), "...")
+    knl = lp.infer_unknown_types(knl, expect_completion=True)
+
+    from loopy.types import to_loopy_type
+    for k in range(n):
+        assert (knl.temporary_variables["t%d" % k].dtype
+                == to_loopy_type(np.float32))
+
+
 def test_sized_and_complex_literals(ctx_factory):
     ctx = ctx_factory()
 
@@ -2446,6 +2463,331 @@ def test_execution_backend_can_cache_dtypes(ctx_factory):
     knl(queue)
 
 
+def test_kernel_hash_is_memoized():
+    knl = lp.make_kernel("{[i]: 0 <= i < 10}", "out[i] = 2*i")
+
+    h = hash(knl)
+    assert knl._pytools_persistent_hash_digest is not None
+    assert hash(knl) == h
+
+    from loopy.tools import LoopyKeyBuilder
+    from pytools.persistent_dict import new_hash
+    key_hash = new_hash()
+    knl.update_persistent_hash(key_hash, LoopyKeyBuilder())
+    assert h == hash(key_hash.digest())
+
+    # copies compute their own hash
+    assert hash(knl.copy()) == h
+    assert hash(knl.copy(name="other")) != h
+
+
+def test_incremental_hash_after_copy():
+    def make_knl(name, factor):
+        return lp.make_kernel(
+                "{[i]: 0 <= i < 10}",
+                """
+                <> tmp = 2*i {id=tmp}
+                out[i] = %d*tmp {id=out}
+                """ % factor,
+                name=name)
+
+    knl = make_knl("incr_hash", 3)
+    hash(knl)
+    hash(knl.id_to_insn["out"])
+
+    # Digests of unchanged fields and instructions are carried over by
+    # copy(), yet must result in the same hash as hashing from scratch.
+    renamed = knl.copy(name="incr_hash_2")
+    assert "temporary_variables" in renamed._field_hash_digests
+    assert "name" not in renamed._field_hash_digests
+    assert hash(renamed) == hash(make_knl("incr_hash_2", 3))
+
+    from pymbolic import parse
+    out_insn = knl.id_to_insn["out"]
+    new_out_insn = out_insn.copy(expression=parse("5*tmp"))
+    assert "assignee" in new_out_insn._field_hash_digests
+    assert "expression" not in new_out_insn._field_hash_digests
+
+    changed = knl.copy(instructions=[
+        new_out_insn if insn.id == "out" else insn
+        for insn in knl.instructions])
+    assert "instructions" not in changed._field_hash_digests
+    assert hash(changed) != hash(knl)
+    assert hash(changed) == hash(make_knl("incr_hash", 5))
+
+
+def test_schedule_profile():
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i,j<n}",
+            """
+            <> tmp = 2*a[i] {id=tmp}
+            out[i, j] = tmp*b[j] {dep=tmp}
+            """,
+            name="sched_prof")
+    knl = lp.add_and_infer_dtypes(knl, {"a,b": np.float32})
+    knl = lp.split_iname(knl, "i", 16, outer_tag="g.0", inner_tag="l.0")
+    knl = lp.preprocess_kernel(knl)
+
+    profile = lp.ScheduleProfile()
+    with lp.CacheMode(False):
+        lp.get_one_scheduled_kernel(knl, profile=profile)
+
+    assert not profile.from_cache
+    assert profile.successes == 1
+    assert profile.nodes_visited >= len(knl.instructions)
+    assert profile.search_time > 0
+    assert profile.hottest_decision_points()
+    assert "nodes visited" in str(profile)
+
+
+def test_preprocess_profile():
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i,j<n}",
+            "out[i] = sum(j, a[i, j])",
+            name="preproc_prof")
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float32})
+
+    sink_calls = []
+    profile = lp.PreprocessProfile(
+            sink=lambda name, pass_info: sink_calls.append((name, pass_info)))
+    with lp.CacheMode(False):
+        lp.preprocess_kernel(knl, profile=profile)
+
+    print(profile)
+
+    pass_names = [pass_info.name for pass_info in profile.passes]
+    assert "infer_unknown_types" in pass_names
+    assert "realize_reduction" in pass_names
+
+    # realize_reduction adds the accumulator
+    red_info, = [pass_info for pass_info in profile.passes
+            if pass_info.name == "realize_reduction"]
+    assert red_info.ntemporaries == 1
+
+    assert sink_calls == [("preproc_prof", pass_info)
+            for pass_info in profile.passes]
+
+
+def test_schedule_dead_end_memoization():
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            """
+            out0[i] = 1 {id=a0, groups=ga, conflicts=gb}
+            out1[i] = 2 {id=a1, groups=ga, conflicts=gb}
+            out2[i] = 3 {id=b0, groups=gb, conflicts=ga}
+            out3[i] = 4 {id=b1, groups=gb, conflicts=ga}
+            """,
+            name="dead_end_memo")
+    knl = lp.add_and_infer_dtypes(knl, {"out0,out1,out2,out3": np.float32})
+    knl = lp.preprocess_kernel(knl)
+
+    # Pruning dead ends must not lose any schedules.
+    profile = lp.ScheduleProfile()
+    schedules = [
+            tuple(sched_knl.schedule)
+            for sched_knl in lp.generate_loop_schedules(
+                knl, debug_args=dict(profile=profile))]
+
+    assert len(set(schedules)) == len(schedules) == profile.successes
+    assert len(schedules) >= 4
+
+
+def test_schedule_budget():
+    from loopy.diagnostic import ScheduleBudgetExceededError
+
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i,j<n}",
+            """
+            <> tmp = 2*a[i] {id=tmp}
+            out[i, j] = tmp*b[j] {dep=tmp}
+            """,
+            name="sched_budget")
+    knl = lp.add_and_infer_dtypes(knl, {"a,b": np.float32})
+    knl = lp.preprocess_kernel(knl)
+
+    with lp.CacheMode(False):
+        ref_knl = lp.get_one_scheduled_kernel(knl)
+
+        with pytest.warns(lp.LoopyWarning):
+            budget_knl = lp.get_one_scheduled_kernel(knl.copy(
+                options=lp.Options(schedule_node_limit=1)))
+
+        assert budget_knl.schedule == ref_knl.schedule
+
+        with pytest.raises(ScheduleBudgetExceededError):
+            lp.get_one_scheduled_kernel(knl.copy(
+                options=lp.Options(schedule_node_limit=1,
+                    no_schedule_fallback=True)))
+
+
+@pytest.mark.parametrize("loop_priority", [None, "j,i", "i,k"])
+def test_single_nest_schedule_fast_path(monkeypatch, loop_priority):
+    import loopy.schedule
+
+    knl = lp.make_kernel(
+            "{[i,j,k]: 0<=i,j,k<n}",
+            """
+            <> a = i + j + k {id=a}
+            <> b = 2*a {id=b, priority=1}
+            <> c = 3*a {id=c}
+            out[i, j, k] = b + c {dep=b:c}
+            """,
+            name="fast_path")
+    knl = lp.add_and_infer_dtypes(knl, {"out": np.float32})
+    knl = lp.tag_inames(knl, {"k": "l.0"})
+    if loop_priority is not None:
+        knl = lp.prioritize_loops(knl, loop_priority)
+    knl = lp.preprocess_kernel(knl)
+
+    profile = lp.ScheduleProfile()
+    fast_knl = next(iter(lp.generate_loop_schedules(
+        knl, debug_args=dict(profile=profile))))
+    assert profile.used_fast_path
+
+    # The fast path finds the same schedule as the search.
+    monkeypatch.setattr(loopy.schedule, "find_single_nest_schedule",
+            lambda sched_state: None)
+
+    profile = lp.ScheduleProfile()
+    search_knl = next(iter(lp.generate_loop_schedules(
+        knl, debug_args=dict(profile=profile))))
+    assert not profile.used_fast_path
+
+    assert fast_knl.schedule == search_knl.schedule
+
+
+def test_schedule_candidates():
+    from loopy.schedule.tools import get_schedule_cost
+
+    # The groups make the scheduler backtrack over instruction orders. The
+    # first schedule it finds runs each write directly before its read and
+    # so needs two local barriers, whereas running both writes first only
+    # needs one.
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<16}",
+            """
+            <> t0[i] = a[i] {id=s0_write, groups=g}
+            <> t1[i] = b[i] {id=s1_write, groups=g}
+            out0[i] = t0[15-i] {id=s0_read, dep=s0_write, groups=g}
+            out1[i] = t1[15-i] {id=s1_read, dep=s1_write, groups=g}
+            """,
+            name="sched_candidates")
+    knl = lp.add_and_infer_dtypes(knl, {"a,b": np.float32})
+    knl = lp.tag_inames(knl, {"i": "l.0"})
+    knl = lp.set_temporary_scope(knl, "t0,t1", "local")
+    knl = lp.preprocess_kernel(knl)
+
+    with lp.CacheMode(False):
+        all_costs = [
+                get_schedule_cost(sched_knl)
+                for sched_knl in lp.generate_loop_schedules(knl)]
+        first_knl = lp.get_one_scheduled_kernel(knl)
+        best_knl = lp.get_one_scheduled_kernel(
+                knl.copy(options=lp.Options(schedule_candidates=10)))
+
+    assert min(all_costs) < all_costs[0]
+    assert get_schedule_cost(first_knl) == all_costs[0]
+    assert get_schedule_cost(best_knl) == min(all_costs)
+
+
+def test_incremental_rescheduling():
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i,j<n}",
+            """
+            a[i] = i {id=a}
+            c[i] = 2*a[i] {id=c, dep=a}
+            b[j] = a[j] {id=b, dep=a}
+            """,
+            name="resched")
+    knl = lp.add_and_infer_dtypes(knl, {"a,b,c": np.float32})
+
+    with lp.CacheMode(False):
+        old_knl = lp.get_one_scheduled_kernel(lp.preprocess_kernel(knl))
+
+        new_knl = lp.preprocess_kernel(lp.split_iname(knl, "j", 4))
+
+        profile = lp.ScheduleProfile()
+        resched_knl = lp.get_one_rescheduled_kernel(
+                new_knl, old_knl.schedule, profile=profile)
+        sched_knl = lp.get_one_scheduled_kernel(new_knl)
+
+    print(profile)
+
+    # The loop over i is kept.
+    assert profile.reused_schedule_items == 4
+    assert resched_knl.schedule == sched_knl.schedule
+
+
+def test_incremental_rescheduling_nested_prefix():
+    knl = lp.make_kernel(
+            "{[i,k,j]: 0<=i,k,j<n}",
+            """
+            a[i,k] = i + k {id=a}
+            c[i,k] = 2*a[i,k] {id=c, dep=a}
+            b[j] = a[j,j] {id=b, dep=a}
+            """,
+            name="resched_nested")
+    knl = lp.add_and_infer_dtypes(knl, {"a,b,c": np.float32})
+
+    with lp.CacheMode(False):
+        old_knl = lp.get_one_scheduled_kernel(lp.preprocess_kernel(knl))
+
+        new_knl = lp.preprocess_kernel(lp.split_iname(knl, "j", 4))
+
+        profile = lp.ScheduleProfile()
+        resched_knl = lp.get_one_rescheduled_kernel(
+                new_knl, old_knl.schedule, profile=profile)
+        sched_knl = lp.get_one_scheduled_kernel(new_knl)
+
+    print(profile)
+
+    # The loop nest over i and k is kept.
+    assert profile.reused_schedule_items == 6
+    assert resched_knl.schedule == sched_knl.schedule
+
+
+def test_parallel_schedule_search():
+    knl = lp.make_kernel(
+            "{[i,j,k]: 0<=i,j,k<n}",
+            """
+            a[i] = i {id=a}
+            b[j] = j {id=b}
+            c[k] = a[k] + b[k] {id=c, dep=a:b}
+            """,
+            name="parallel_sched")
+    knl = lp.add_and_infer_dtypes(knl, {"a,b,c": np.float32})
+    knl = lp.preprocess_kernel(knl)
+
+    profile = lp.ScheduleProfile()
+    with lp.CacheMode(False):
+        sched_knl = lp.get_one_scheduled_kernel(knl)
+        par_sched_knl = lp.get_one_scheduled_kernel(
+                knl.copy(options=lp.Options(schedule_parallel_workers=2)),
+                profile=profile)
+
+    print(profile)
+
+    assert profile.parallel_branches >= 2
+    assert par_sched_knl.schedule == sched_knl.schedule
+
+    # The branches share the search budget, and the first branch running
+    # out of it means that the budget is exceeded.
+    from loopy.diagnostic import ScheduleBudgetExceededError
+
+    with lp.CacheMode(False):
+        with pytest.warns(lp.LoopyWarning):
+            budget_knl = lp.get_one_scheduled_kernel(knl.copy(
+                options=lp.Options(schedule_parallel_workers=2,
+                    schedule_node_limit=1)))
+
+        assert budget_knl.schedule == sched_knl.schedule
+
+        with pytest.raises(ScheduleBudgetExceededError):
+            lp.get_one_scheduled_kernel(knl.copy(
+                options=lp.Options(schedule_parallel_workers=2,
+                    schedule_node_limit=1, no_schedule_fallback=True)))
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
@@ -284,6 +284,359 @@ def test_LazilyUnpicklingListWithEqAndPersistentHashing():
     # }}}
 
 
+def test_cache_statistics():
+    import loopy as lp
+    from uuid import uuid4
+
+    def make_knl():
+        # Use a fresh kernel name to guarantee a miss on first preprocessing.
+        return lp.make_kernel(
+                "{[i]: 0<=i<n}",
+                "out[i] = 2*a[i]",
+                name="stats_%s" % uuid4().hex[:8])
+
+    knl = make_knl()
+
+    with lp.CacheMode(True):
+        lp.reset_cache_statistics()
+
+        lp.preprocess_kernel(knl)
+        stats = lp.get_cache_statistics("preprocess")
+        assert stats.misses == 1
+        assert stats.hits == 0
+        assert stats.stores == 1
+        assert stats.bytes_written > 0
+
+        # an equal, but separately constructed kernel
+        lp.preprocess_kernel(knl.copy())
+        stats = lp.get_cache_statistics("preprocess")
+        assert stats.hits == 1
+        assert stats.memory_hits == 1
+        assert stats.bytes_read == 0
+        assert stats.key_hashing_time >= 0
+        assert stats.hit_rate == 0.5
+
+        from loopy.preprocess import preprocess_cache
+        preprocess_cache.clear_in_memory_tier()
+
+        lp.preprocess_kernel(knl.copy())
+        stats = lp.get_cache_statistics("preprocess")
+        assert stats.hits == 2
+        assert stats.memory_hits == 1
+        assert stats.bytes_read > 0
+
+        assert "preprocess" in lp.get_cache_statistics()
+
+        lp.reset_cache_statistics("preprocess")
+        assert lp.get_cache_statistics("preprocess").lookups == 0
+
+    with pytest.raises(ValueError):
+        lp.get_cache_statistics("no-such-cache")
+
+
+def test_cache_eviction(tmpdir):
+    import os
+    import loopy as lp
+    from loopy.caching import LoopyPersistentDict, _NAME_TO_CACHE
+    from loopy.tools import LoopyKeyBuilder
+
+    # Accesses served from memory do not count towards usage on disk,
+    # so disable the in-memory tier.
+    pdict = LoopyPersistentDict("test-eviction", "test-eviction",
+            key_builder=LoopyKeyBuilder(), container_dir=str(tmpdir),
+            in_mem_cache_size=0)
+
+    try:
+        kb = LoopyKeyBuilder()
+        for i in range(5):
+            pdict[i] = "value %d" % i
+            os.utime(pdict._item_dir(kb(i)), (1000 + i, 1000 + i))
+
+        assert len(pdict.get_entries()) == 5
+
+        # make 1 the most recently used entry
+        assert pdict[1] == "value 1"
+
+        lru_policy = lp.CacheEvictionPolicy(max_entries=2)
+        removed = lp.prune_caches(lru_policy, name="test-eviction", dry_run=True)
+        assert len(removed) == 3
+        assert len(pdict.get_entries()) == 5
+
+        lp.prune_caches(lru_policy, name="test-eviction")
+        assert len(pdict.get_entries()) == 2
+        with pytest.raises(KeyError):
+            pdict[0]
+        assert pdict[4] == "value 4"
+        assert pdict[1] == "value 1"
+        assert pdict[1] == "value 1"
+
+        # 4 is now more recently used, but less frequently.
+        lfu_policy = lp.CacheEvictionPolicy(max_entries=1, strategy="lfu")
+        lp.prune_caches(lfu_policy, name="test-eviction")
+        assert pdict[1] == "value 1"
+        with pytest.raises(KeyError):
+            pdict[4]
+
+        entry, = pdict.get_entries()
+        lp.prune_caches(lp.CacheEvictionPolicy(max_bytes=entry.size - 1),
+                name="test-eviction")
+        assert not pdict.get_entries()
+
+    finally:
+        del _NAME_TO_CACHE["test-eviction"]
+
+
+def test_in_memory_cache_tier(tmpdir):
+    from loopy.caching import LoopyPersistentDict, _NAME_TO_CACHE
+    from loopy.tools import LoopyKeyBuilder
+
+    pdict = LoopyPersistentDict("test-in-mem", "test-in-mem",
+            key_builder=LoopyKeyBuilder(), container_dir=str(tmpdir),
+            in_mem_cache_size=2)
+
+    try:
+        values = [[i] for i in range(3)]
+        for i, value in enumerate(values):
+            pdict[i] = value
+
+        # 0 was pushed out of memory by 1 and 2.
+        assert pdict[2] is values[2]
+        assert pdict[1] is values[1]
+        assert pdict[0] is not values[0]
+        assert pdict[0] == values[0]
+        assert pdict.statistics.memory_hits == 3
+
+        pdict.clear_in_memory_tier()
+        assert pdict[1] is not values[1]
+
+        del pdict[1]
+        with pytest.raises(KeyError):
+            pdict[1]
+
+    finally:
+        del _NAME_TO_CACHE["test-in-mem"]
+
+
+def test_canonicalized_cache_keys():
+    import numpy as np
+    import loopy as lp
+    from uuid import uuid4
+
+    name = "canon_%s" % uuid4().hex[:8]
+
+    def make_knl(suffix, canonicalize=True):
+        knl = lp.make_kernel(
+                "{[i%(s)s,j%(s)s]: 0<=i%(s)s,j%(s)s<n}" % {"s": suffix},
+                """
+                <> acc_%(s)s = sum(j%(s)s, a[i%(s)s, j%(s)s])  {id=red_%(s)s}
+                out[i%(s)s] = 2*acc_%(s)s {id=write_%(s)s, dep=red_%(s)s}
+                """ % {"s": suffix},
+                [
+                    lp.GlobalArg("a", np.float64, shape=("n", "n")),
+                    lp.GlobalArg("out", np.float64, shape="n"),
+                    lp.ValueArg("n", np.int32),
+                    ],
+                name=name,
+                options=lp.Options(canonicalize_cache_keys=canonicalize))
+        return lp.split_iname(knl, "i"+suffix, 4,
+                inner_tag="l.0", outer_tag="g.0")
+
+    knl0 = make_knl("0")
+    knl3 = make_knl("3")
+
+    from loopy.tools import LoopyKeyBuilder, get_canonical_names
+    kb = LoopyKeyBuilder()
+    assert kb(knl0) != kb(knl3)
+    assert (
+            kb(get_canonical_names(knl0).kernel)
+            == kb(get_canonical_names(knl3).kernel))
+
+    # Barrier comments mention temporaries and instruction ids.
+
+    def make_barrier_knl(suffix, canonicalize=True):
+        knl = lp.make_kernel(
+                "{[i%(s)s]: 0<=i%(s)s<16}" % {"s": suffix},
+                """
+                <> tmp_%(s)s[i%(s)s] = a[i%(s)s]  {id=write_%(s)s}
+                out[i%(s)s] = tmp_%(s)s[15-i%(s)s]  {id=read_%(s)s, dep=write_%(s)s}
+                """ % {"s": suffix},
+                [
+                    lp.GlobalArg("a", np.float64, shape=16),
+                    lp.GlobalArg("out", np.float64, shape=16),
+                    ],
+                name=name + "_barrier",
+                options=lp.Options(canonicalize_cache_keys=canonicalize))
+        knl = lp.tag_inames(knl, {"i"+suffix: "l.0"})
+        return lp.set_temporary_scope(knl, "tmp_"+suffix, "local")
+
+    for make in [make_knl, make_barrier_knl]:
+        knl0 = make("0")
+        knl3 = make("3")
+
+        with lp.CacheMode(True):
+            lp.reset_cache_statistics()
+
+            code0 = lp.generate_code_v2(knl0).device_code()
+            code3 = lp.generate_code_v2(knl3).device_code()
+
+            assert lp.get_cache_statistics("preprocess").hits == 1
+            assert lp.get_cache_statistics("schedule").hits == 1
+
+        # The cached results are translated back into each kernel's names.
+        with lp.CacheMode(False):
+            assert code0 == lp.generate_code_v2(make("0", False)).device_code()
+            assert code3 == lp.generate_code_v2(make("3", False)).device_code()
+
+    assert "barrier" in code3
+    assert "_lpy_c_" not in code3
+
+
+def test_warm_caches(tmpdir):
+    import numpy as np
+    import loopy as lp
+    from uuid import uuid4
+    from pickle import dump
+
+    prefix = "warm_%s" % uuid4().hex[:8]
+
+    script = tmpdir.join("kernels.py")
+    script.write("\n".join([
+        "knl = lp.make_kernel('{[i]: 0<=i<n}', 'out[i] = 2*a[i]',",
+        "    name='%s_script')" % prefix,
+        "knl = lp.add_and_infer_dtypes(knl, {'a': np.float32})",
+        ]))
+
+    def make_knl(name):
+        knl = lp.make_kernel("{[i]: 0<=i<n}", "out[i] = a[i] + 1",
+                name="%s_%s" % (prefix, name))
+        return lp.add_and_infer_dtypes(knl, {"a": np.float64})
+
+    pickled = tmpdir.join("kernel.pkl")
+    with open(str(pickled), "wb") as outf:
+        dump(make_knl("pickled"), outf)
+
+    with lp.CacheMode(True):
+        sources = [str(script), str(pickled), make_knl("object")]
+
+        results = lp.warm_caches(sources, nprocs=2)
+        assert [result.kernel_name for result in results] == [
+                prefix + "_script", prefix + "_pickled", prefix + "_object"]
+
+        for result in results:
+            assert result.error is None
+            assert result.cache_hits == 0
+            assert result.total_time > 0
+
+        # The worker processes have filled the on-disk caches.
+        for result in lp.warm_caches(sources, nprocs=1):
+            assert result.cache_hits == 3
+
+    # Failures are reported per kernel.
+    untyped_knl = lp.make_kernel("{[i]: 0<=i<n}", "out[i] = 2*a[i]",
+            name=prefix + "_untyped")
+    with lp.CacheMode(True):
+        result, = lp.warm_caches([untyped_knl], nprocs=1)
+    assert result.error is not None
+    assert result.codegen_time is None
+
+
+def test_cache_bundles(tmpdir):
+    import json
+    import tarfile
+    import loopy as lp
+    from loopy.caching import LoopyPersistentDict, _NAME_TO_CACHE
+    from loopy.tools import LoopyKeyBuilder
+
+    pdict = LoopyPersistentDict("test-bundle", "test-bundle",
+            key_builder=LoopyKeyBuilder(),
+            container_dir=str(tmpdir.mkdir("cache")),
+            in_mem_cache_size=0)
+
+    try:
+        for i in range(3):
+            pdict[i] = "value %d" % i
+
+        bundle = str(tmpdir.join("bundle.tar.gz"))
+        exported = lp.export_cache_bundle(bundle, names=["test-bundle"])
+        assert len(exported) == 3
+
+        pdict.clear()
+        pdict[0] = "local value"
+
+        assert lp.import_cache_bundle(bundle) == {"test-bundle": 2}
+        assert pdict[0] == "local value"
+        assert pdict[1] == "value 1"
+        assert pdict[2] == "value 2"
+
+        assert lp.import_cache_bundle(bundle, overwrite=True) == {
+                "test-bundle": 3}
+        assert pdict[0] == "value 0"
+        assert len(pdict.get_entries()) == 3
+
+        # Bundles from a different data model version are rejected.
+        tar = tarfile.open(bundle)
+        try:
+            manifest = json.loads(
+                    tar.extractfile("manifest.json").read().decode("utf-8"))
+        finally:
+            tar.close()
+
+        manifest["data_model_version"] = "v0-outdated"
+        manifest_file = tmpdir.join("manifest.json")
+        manifest_file.write(json.dumps(manifest))
+
+        outdated_bundle = str(tmpdir.join("outdated.tar.gz"))
+        tar = tarfile.open(outdated_bundle, "w:gz")
+        try:
+            tar.add(str(manifest_file), arcname="manifest.json")
+        finally:
+            tar.close()
+
+        with pytest.raises(lp.LoopyError):
+            lp.import_cache_bundle(outdated_bundle)
+
+    finally:
+        del _NAME_TO_CACHE["test-bundle"]
+
+
+@pytest.mark.skipif(six.PY2, reason="compact kernel pickling requires Python 3")
+@pytest.mark.parametrize("compression", ["none", "zlib", "lzma"])
+def test_compact_cache_serialization(compression):
+    import numpy as np
+    import loopy as lp
+    from loopy.caching import (
+            _CacheSerializationSettings, _serialize_cache_entry,
+            _deserialize_cache_entry)
+    from six.moves.cPickle import dumps
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            """
+            <> t = 2*a[i]
+            out[i] = t + 1
+            """,
+            name="compact_ser")
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float64})
+
+    settings = _CacheSerializationSettings(compression=compression, compact=True)
+    loaded = _deserialize_cache_entry(
+            _serialize_cache_entry((knl, 1), settings, compact=True))[0]
+
+    # Hashing uses the stored digest and does not unpickle any fields.
+    assert hash(loaded) == hash(knl)
+    assert "instructions" in loaded._lazy_attribs
+
+    assert loaded == knl
+    assert "instructions" not in loaded._lazy_attribs
+    assert loaded.copy(name="other").name == "other"
+
+    # Entries written in the plain format remain readable.
+    assert _deserialize_cache_entry(dumps(knl)) == knl
+
+    with pytest.raises(ValueError):
+        _CacheSerializationSettings(compression="gzip", compact=False)
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
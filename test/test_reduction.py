@@ -285,6 +285,47 @@ def test_global_mc_parallel_reduction(ctx_factory, size):
             ref_knl, ctx, knl, parameters={"n": size})
 
 
+@pytest.mark.parametrize("size", [1000, 1])
+@pytest.mark.parametrize("inner_tag", [None, "l.0"])
+def test_group_parallel_reduction(ctx_factory, size, inner_tag):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+            "{[i]: 0 <= i < n }",
+            """
+            z[0] = sum(i, i/13)
+            """)
+
+    ref_knl = knl
+
+    knl = lp.split_iname(knl, "i", 128, outer_tag="g.0", inner_tag=inner_tag)
+
+    lp.auto_test_vs_ref(
+            ref_knl, ctx, knl, parameters={"n": size})
+
+
+def test_group_parallel_argmax(ctx_factory):
+    dtype = np.dtype(np.float32)
+    ctx = ctx_factory()
+    queue = cl.CommandQueue(ctx)
+
+    n = 10000
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<%d}" % n,
+            """
+            max_val, max_idx = argmax(i, fabs(a[i]), i)
+            """)
+
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float32})
+    knl = lp.split_iname(knl, "i", 256, outer_tag="g.0", inner_tag="l.0")
+
+    a = np.random.randn(n).astype(dtype)
+    evt, (max_idx, max_val) = knl(queue, a=a, out_host=True)
+    assert max_val == np.max(np.abs(a))
+    assert max_idx == np.where(np.abs(a) == max_val)[-1]
+
+
 def test_argmax(ctx_factory):
     logging.basicConfig(level=logging.INFO)
 
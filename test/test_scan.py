@@ -204,7 +204,9 @@ def test_scan_not_triangular():
 
 
 @pytest.mark.parametrize("n", [1, 2, 3, 16, 17])
-def test_local_parallel_scan(ctx_factory, n):
+@pytest.mark.parametrize("local_scan_algorithm", [
+    "hillis_steele", "work_efficient"])
+def test_local_parallel_scan(ctx_factory, n, local_scan_algorithm):
     ctx = ctx_factory()
     queue = cl.CommandQueue(ctx)
 
@@ -218,7 +220,8 @@ def test_local_parallel_scan(ctx_factory, n):
 
     knl = lp.fix_parameters(knl, n=n)
     knl = lp.tag_inames(knl, dict(i="l.0"))
-    knl = lp.realize_reduction(knl, force_scan=True)
+    knl = lp.realize_reduction(knl, force_scan=True,
+            local_scan_algorithm=local_scan_algorithm)
 
     knl = lp.realize_reduction(knl)
 
@@ -253,6 +256,43 @@ def test_local_parallel_scan_with_nonzero_lower_bounds(ctx_factory):
     assert (out == np.cumsum(np.arange(1, 17)**2)).all()
 
 
+def test_local_scan_algorithm_counts():
+    n = 64
+
+    knl = lp.make_kernel(
+        "{[i,j]: 0<=i<n and 0<=j<=i}",
+        "out[i] = sum(j, a[j])")
+
+    knl = lp.fix_parameters(knl, n=n)
+    knl = lp.tag_inames(knl, dict(i="l.0"))
+    knl = lp.add_dtypes(knl, dict(a=np.float32))
+
+    from loopy.statistics import Op
+
+    add_counts = {}
+    barrier_counts = {}
+    for local_scan_algorithm in ["hillis_steele", "work_efficient"]:
+        scan_knl = lp.realize_reduction(knl, force_scan=True,
+                local_scan_algorithm=local_scan_algorithm)
+
+        op_map = lp.get_op_map(scan_knl, count_redundant_work=True)
+        add_counts[local_scan_algorithm] = (
+                op_map[Op(np.float32, "add")].eval_with_dict({}))
+
+        sync_map = lp.get_synchronization_map(scan_knl)
+        barrier_counts[local_scan_algorithm] = (
+                sync_map["barrier_local"].eval_with_dict({}))
+
+    print(add_counts, barrier_counts)
+
+    # n additions to transfer the data, plus 321 for the stages of the
+    # Hillis-Steele scan and 120 for the up- and down-sweep.
+    assert add_counts["hillis_steele"] == n + 321
+    assert add_counts["work_efficient"] == n + 120
+
+    assert barrier_counts["work_efficient"] <= barrier_counts["hillis_steele"]
+
+
 def test_scan_extra_constraints_on_domain():
     knl = lp.make_kernel(
         "{[i,j,k]: 0<=i<n and 0<=j<=i and i=k}",
@@ -395,8 +435,12 @@ def check_segmented_scan_output(arr, segment_boundaries_indices, out):
     (3, (0, 2)),
     (3, (0, 1, 2)),
     (16, (0, 4, 8, 12))])
-@pytest.mark.parametrize("iname_tag", ("for", "l.0"))
-def test_segmented_scan(ctx_factory, n, segment_boundaries_indices, iname_tag):
+@pytest.mark.parametrize("iname_tag, local_scan_algorithm", [
+    ("for", "hillis_steele"),
+    ("l.0", "hillis_steele"),
+    ("l.0", "work_efficient")])
+def test_segmented_scan(ctx_factory, n, segment_boundaries_indices, iname_tag,
+        local_scan_algorithm):
     ctx = ctx_factory()
     queue = cl.CommandQueue(ctx)
 
@@ -415,7 +459,8 @@ def test_segmented_scan(ctx_factory, n, segment_boundaries_indices, iname_tag):
 
     knl = lp.fix_parameters(knl, n=n)
     knl = lp.tag_inames(knl, dict(i=iname_tag))
-    knl = lp.realize_reduction(knl, force_scan=True)
+    knl = lp.realize_reduction(knl, force_scan=True,
+            local_scan_algorithm=local_scan_algorithm)
 
     (evt, (out,)) = knl(queue, arr=arr, segflag=segment_boundaries)
 
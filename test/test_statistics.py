@@ -626,6 +626,41 @@ def test_barrier_counter_barriers():
     assert barrier_count == 50*10*2
 
 
+def test_barrier_placement_stats():
+    # Placing the barrier needed between 'a0' and 'a3' in front of 'a3'
+    # (as the greedy forward pass does) requires another barrier separating
+    # 'b6' from 'b2' in the next iteration. Placing it in front of 'b2'
+    # avoids that.
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i<16 and 0<=j<n}",
+            """
+            for j
+                <>a[i] = j  {id=a0}
+                out1[i, j] = j  {id=o1}
+                <>b[i] = j  {id=b2}
+                <>c[i] = a[(i+1) % 16]  {id=a3}
+                out2[i, j] = j  {id=o4}
+                out3[i, j] = c[(i+1) % 16]  {id=c5}
+                out4[i, j] = b[(i+1) % 16]  {id=b6}
+            end
+            """,
+            seq_dependencies=True,
+            name="barrier_placement")
+    knl = lp.add_and_infer_dtypes(knl, dict(out1=np.int32, out2=np.int32,
+        out3=np.int32, out4=np.int32))
+    knl = lp.tag_inames(knl, dict(i="l.0"))
+    for tv in ["a", "b", "c"]:
+        knl = lp.set_temporary_scope(knl, tv, "local")
+
+    default_map, optimized_map = lp.get_barrier_placement_stats(knl)
+    print(default_map)
+    print(optimized_map)
+
+    params = {"n": 10}
+    assert default_map["barrier_local"].eval_with_dict(params) == 3*10
+    assert optimized_map["barrier_local"].eval_with_dict(params) == 2*10
+
+
 def test_all_counters_parallel_matmul():
 
     bsize = 16
@@ -240,6 +240,39 @@ def test_numba_cuda_target():
     print(lp.generate_code_v2(knl).all_code())
 
 
+def test_cl_program_binary_cache(ctx_factory):
+    from uuid import uuid4
+    from loopy.target.pyopencl_execution import (
+            build_cl_program, cl_program_binary_cache)
+
+    ctx = ctx_factory()
+
+    # A unique comment guarantees a miss on the first build.
+    source = """
+        // %s
+        __kernel void twice(__global float *a)
+        { a[get_global_id(0)] *= 2; }
+        """ % uuid4().hex
+
+    with lp.CacheMode(True):
+        lp.reset_cache_statistics("cl-program-binary")
+
+        build_cl_program(ctx, source)
+        stats = lp.get_cache_statistics("cl-program-binary")
+        assert stats.misses == 1
+        assert stats.stores == 1
+
+        cl_program_binary_cache.clear_in_memory_tier()
+
+        prg = build_cl_program(ctx, source, options=[])
+        assert lp.get_cache_statistics("cl-program-binary").hits == 1
+
+        queue = cl.CommandQueue(ctx)
+        a = cl.array.arange(queue, 10, dtype=np.float32)
+        prg.twice(queue, a.shape, None, a.data)
+        assert (a.get() == 2*np.arange(10, dtype=np.float32)).all()
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
@@ -438,6 +438,27 @@ def test_add_nosync():
     assert frozenset([("insn5", "local")]) == knl.id_to_insn["insn6"].no_sync_with
 
 
+@pytest.mark.parametrize("order", ["C", "F"])
+def test_prioritize_loops_by_stride(order):
+    knl = lp.make_kernel(
+            "{[i,j]: 0<=i,j<n}",
+            "b[i, j] = 2*a[i, j]",
+            [lp.GlobalArg("a,b", np.float32, shape="n,n", order=order),
+                "..."])
+
+    knl = lp.prioritize_loops_by_stride(knl)
+
+    expected_priority = ("i", "j") if order == "C" else ("j", "i")
+    assert knl.loop_priority == frozenset([expected_priority])
+
+    knl = lp.get_one_scheduled_kernel(lp.preprocess_kernel(knl))
+
+    from loopy.schedule import EnterLoop
+    assert tuple(
+            sched_item.iname for sched_item in knl.schedule
+            if isinstance(sched_item, EnterLoop)) == expected_priority
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])